@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
-from ._cp import is_valid_category, is_valid_package_name
-from ._cpv import is_valid_package_version, is_valid_package_revision
-from ._pkg_atom import is_valid_prefix_op, is_valid_repository, is_valid_slot, is_valid_subslot, is_valid_use_flag
+from .pkg._cp import is_valid_category, is_valid_package_name
+from .pkg._cpv import is_valid_package_version, is_valid_package_revision
+from .pkg._atom import is_valid_prefix_op, is_valid_repository, is_valid_slot, is_valid_subslot, is_valid_use_flag
 
-from ._eapi import get_eapi
+from .pkg._intern import enable_interning, disable_interning, get_interning_stats
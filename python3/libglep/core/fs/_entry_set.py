@@ -137,8 +137,8 @@ class EntrySet(set):
                 start_point = start_point.target
             else:
                 start_point = start_point.location
+        cn_path = normpath(start_point).rstrip(os.path.sep) + os.path.sep
         for x in self:
-            cn_path = normpath(start_point).rstrip(os.path.sep) + os.path.sep
             # what about sym targets?
             if x.location.startswith(cn_path):
                 yield x
@@ -1,5 +1,8 @@
 
 from ._cp import CP
-from ._cpv import CPV
-from ._pkg_wildcard import PkgWildcard
-from ._pkg_atom import PkgAtom
+from ._cpv import CPV, package_version_glob_match
+from ._wildcard import Wildcard as PkgWildcard
+from ._atom import Atom as PkgAtom
+from ._batch import parse_atoms, ParsedAtoms
+
+from ._intern import enable_interning, disable_interning, get_interning_stats
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+from . import _parser
+from ._cpv import package_version_key
+from ._atom import Atom, InvalidPkgAtom
+from ._wildcard import Wildcard, InvalidPkgWildcard
+
+
+def parse_atoms(iterable, wildcard=False):
+    """Parse many atom strings (or package wildcard strings if wildcard is True) in one call.
+
+    Invalid strings don't raise, they are recorded in ParsedAtoms.errors and all their columns
+    are None, so that the errors of a whole file can be reported at once.
+    """
+
+    if wildcard:
+        regex, groups, exc_type = _parser.wildcard_re, _parser.WILDCARD_GROUPS, InvalidPkgWildcard
+    else:
+        regex, groups, exc_type = _parser.atom_re, _parser.ATOM_GROUPS, InvalidPkgAtom
+
+    ret = ParsedAtoms(wildcard)
+    memo = dict()
+    for s in iterable:
+        row = len(ret.strings)
+        ret.strings.append(s)
+
+        try:
+            item = memo[s]
+        except KeyError:
+            m = regex.fullmatch(s)
+            if m is None:
+                if wildcard:
+                    err = _parser.explain_error(s, allow_blocks=False, allow_use=False, allow_slot_operator=False)
+                else:
+                    err = _parser.explain_error(s)
+                item = exc_type(s, err)
+            else:
+                d = dict(zip(groups, m.groups()))
+                err = _parser.check_combination(d["op"], d["ver"], d["rev"], d["post_wildcard"] is not None) \
+                    or _parser.check_package_name(d["package"])
+                item = exc_type(s, err) if err is not None else (m.groups(), d)
+            memo[s] = item
+
+        if isinstance(item, exc_type):
+            ret.errors.append((row, item))
+            ret._groups.append(None)
+            for name in ParsedAtoms.COLUMNS:
+                getattr(ret, name).append(None)
+            continue
+
+        ret._groups.append(item[0])
+        d = item[1]
+        ret.category.append(d["category"])
+        ret.package.append(d["package"])
+        ret.op.append(d["op"])
+        ret.ver.append(d["ver"])
+        ret.rev.append(d["rev"])
+        ret.version_key.append(package_version_key(d["ver"], d["rev"]) if d["ver"] is not None else None)
+        ret.post_wildcard.append(d["post_wildcard"] is not None)
+        ret.slot.append(d["slot"])
+        ret.subslot.append(d["subslot"])
+        ret.repo_id.append(d["repo_id"])
+        if wildcard:
+            ret.blocks.append(None)
+            ret.slot_operator.append(None)
+            ret.use.append(None)
+        else:
+            ret.blocks.append(d["blocks"])
+            ret.slot_operator.append(d["slot_eq"] if d["slot_eq"] is not None else d["slot_operator"])
+            ret.use.append(tuple(sorted(d["use"].split(","))) if d["use"] is not None else None)
+
+    return ret
+
+
+class ParsedAtoms:
+    """Columnar result of parse_atoms().
+
+    Every column is a list with one item per input string, row N of each column belongs to the Nth input string.
+
+    :ivar strings: the input strings
+    :ivar errors: list of (row, InvalidPkgAtom or InvalidPkgWildcard) for the invalid strings
+    :ivar version_key: package_version_key() of the version and revision, or None if the atom has no version
+    :ivar blocks: "!" or "!!", or None if the atom is not a blocker
+    """
+
+    COLUMNS = ("blocks", "op", "category", "package", "ver", "rev", "version_key", "post_wildcard",
+               "slot", "subslot", "slot_operator", "repo_id", "use")
+
+    def __init__(self, wildcard):
+        self.wildcard = wildcard
+        self.strings = []
+        self.errors = []
+        for name in self.COLUMNS:
+            setattr(self, name, [])
+        self._groups = []
+
+    def __len__(self):
+        return len(self.strings)
+
+    def is_valid(self, row):
+        return self._groups[row] is not None
+
+    def objects(self):
+        """Returns a list of Atom (or Wildcard) objects, with None for invalid rows.
+
+        The objects are created from the already parsed components, strings are not parsed again.
+        """
+
+        kls = Wildcard if self.wildcard else Atom
+        ret = []
+        for groups in self._groups:
+            if groups is None:
+                ret.append(None)
+            else:
+                obj = object.__new__(kls)
+                obj._set_groups(groups)
+                ret.append(obj)
+        return ret
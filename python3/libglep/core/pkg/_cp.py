@@ -1,6 +1,8 @@
 
 import re
+import sys
 from snakeoil import klass
+from ._intern import interned_instance
 
 
 def is_valid_category(s):
@@ -13,7 +15,7 @@ def is_valid_package_name(s):
     return _package_name_re.fullmatch(s)
 
 
-class CP(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
+class CP(klass.SlotsPicklingMixin, metaclass=interned_instance):
     """category/package, which represents a specific Gentoo package
 
     :ivar category: str category name
@@ -57,8 +59,8 @@ class CP(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
             raise TypeError(f"CP takes category/package string or separate components as arguments: got {args!r}")
 
         sf = object.__setattr__
-        sf(self, 'category', category)
-        sf(self, 'package', pkgname)
+        sf(self, 'category', sys.intern(category))
+        sf(self, 'package', sys.intern(pkgname))
 
     @property
     def cp_str(self):
@@ -74,6 +76,8 @@ class CP(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
         return self.cp_str
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, CP) and self._all_attrs() == other._all_attrs()
 
     def __ne__(self, other):
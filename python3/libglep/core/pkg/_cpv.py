@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 
 import re
+import sys
 from snakeoil import klass
+from ._intern import interned_instance
+from . import _parser
 from ._cp import is_valid_category, is_valid_package_name
 
 
 def is_valid_package_version(s):
     assert isinstance(s, str)
-    return _package_version_re.fullmatch(s)
+    return _parser.package_version_re.fullmatch(s)
 
 
 def is_valid_package_revision(s):
@@ -24,7 +27,7 @@ def is_valid_package_revision(s):
     return True
 
 
-class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
+class CPV(klass.SlotsPicklingMixin, metaclass=interned_instance):
     """category/package-version or category/package-version-revision, which represents one version of a specific Gentoo package
 
     :ivar category: str category name
@@ -34,9 +37,10 @@ class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
     :ivar fullver: str version-revision
     :ivar cp_str: str category/package
     :ivar cpv_str: str category/package-version-revision
+    :ivar version_key: tuple which sorts the same way as version-revision
     """
 
-    __slots__ = ("category", "package", "ver", "rev")
+    __slots__ = ("category", "package", "ver", "rev", "_version_key")
 
     def __init__(self, *args, _do_check=True):
         """
@@ -51,20 +55,13 @@ class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
 
         if len(args) == 1:
             assert _do_check
-            try:
-                category, pkg_name_ver = args[0].rsplit("/", 1)
-            except ValueError:
-                raise TypeError("no category component")     # occurs if the rsplit yields only one item
-            pkg_chunks = pkg_name_ver.split("-")
-            if len(pkg_chunks) < 2:
-                raise TypeError("missing package name, version, and/or revision")
-            pkgname = pkg_chunks[0]
-            if is_valid_package_revision(pkg_chunks[-1]):
-                ver = "-".join(pkg_chunks[1:-1])
-                rev = pkg_chunks[-1]
-            else:
-                ver = pkg_chunks[1:]
-                rev = None
+            m = _parser.cpv_re.fullmatch(args[0])
+            if m is None:
+                raise TypeError(_parser.explain_error(args[0], allow_blocks=False, allow_use=False, allow_slot_operator=False))
+            category, pkgname, ver, rev = m.groups()
+            err = _parser.check_package_name(pkgname)
+            if err is not None:
+                raise TypeError(err)
         elif len(args) == 3 or len(args) == 4:
             if _do_check:
                 if any([not isinstance(x, str) for x in args]):
@@ -89,8 +86,8 @@ class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
             raise TypeError(f"CPV takes cpv string or separate components as arguments: got {args!r}")
 
         sf = object.__setattr__
-        sf(self, 'category', category)
-        sf(self, 'package', pkgname)
+        sf(self, 'category', sys.intern(category))
+        sf(self, 'package', sys.intern(pkgname))
         sf(self, 'ver', ver)
         sf(self, 'rev', rev)
 
@@ -109,6 +106,11 @@ class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
     def cpv_str(self):
         return self.cp_str + "-" + self.fullver
 
+    @klass.jit_attr
+    def version_key(self):
+        # computed on first use and kept, all the comparisons between CPV objects use it
+        return package_version_key(self.ver, self.rev)
+
     def __hash__(self):
         return hash(self._all_attrs())
 
@@ -119,6 +121,8 @@ class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
         return self.cpv_str
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return isinstance(other, CPV) and self._all_attrs() == other._all_attrs()
 
     def __ne__(self, other):
@@ -129,28 +133,28 @@ class CPV(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
             raise TypeError(f"'<' not supported between instances of {self.__class__.__name__!r} and {other.__class__.__name__!r}")
         if self._cp_attrs() != other._cp_attrs():
             raise TypeError(f"'<' not supported between {self.cpv_str!r} and {other.cpv_str!r}")
-        return package_fullver_cmp(self.version, self.revision, other.version, other.revision) < 0
+        return self.version_key < other.version_key
 
     def __le__(self, other):
         if not isinstance(other, CPV):
             raise TypeError(f"'<=' not supported between instances of {self.__class__.__name__!r} and {other.__class__.__name__!r}")
         if self._cp_attrs() != other._cp_attrs():
             raise TypeError(f"'<=' not supported between {self.cpv_str!r} and {other.cpv_str!r}")
-        return package_fullver_cmp(self.version, self.revision, other.version, other.revision) <= 0
+        return self.version_key <= other.version_key
 
     def __gt__(self, other):
         if not isinstance(other, CPV):
             raise TypeError(f"'>' not supported between instances of {self.__class__.__name__!r} and {other.__class__.__name__!r}")
         if self._cp_attrs() != other._cp_attrs():
             raise TypeError(f"'>' not supported between {self.cpv_str!r} and {other.cpv_str!r}")
-        return package_fullver_cmp(self.version, self.revision, other.version, other.revision) > 0
+        return self.version_key > other.version_key
 
     def __ge__(self, other):
         if not isinstance(other, CPV):
             raise TypeError(f"'>=' not supported between instances of {self.__class__.__name__!r} and {other.__class__.__name__!r}")
         if self._cp_attrs() != other._cp_attrs():
             raise TypeError(f"'>=' not supported between {self.cpv_str!r} and {other.cpv_str!r}")
-        return package_fullver_cmp(self.version, self.revision, other.version, other.revision) >= 0
+        return self.version_key >= other.version_key
 
     def _cp_attrs(self):
         return (self.category, self.package)
@@ -174,133 +178,80 @@ class InvalidCPV(ValueError):
         return msg
 
 
-def package_fullver_cmp(ver1, rev1, ver2, rev2):
-    def cmp(a, b):
-        return a > b
+def package_version_key(ver, rev=None):
+    """Return a tuple which sorts the same way as the given version and revision.
+
+    The tuple only contains ints, strs and nested tuples, so that comparing two
+    of them is done natively by python, without re-parsing the version strings.
+    """
+
+    # Split up the version into dotted string and list of suffixes.
+    parts = ver.split("_")
+    ver_parts = parts[0].split(".")
+
+    # Pull out any letter suffix on the final component.
+    if ver_parts[-1][-1].isalpha():
+        letter = ord(ver_parts[-1][-1])
+        ver_parts[-1] = ver_parts[-1][:-1]
+    else:
+        letter = 0
+
+    # The first component is always compared as an int. If one of the other
+    # components begins with a "0" then they are compared as decimal fractions
+    # so that 1.1 > 1.02, else ints. Any fraction is lower than any int, so
+    # the leading 1/0 keeps the two kinds apart and the fraction compares as
+    # the string without trailing zeros. Missing components sort first, so
+    # that 1.0.0 > 1.0, which is what tuple comparison does by itself.
+    components = [(1, int(ver_parts[0]), "")]
+    for v in ver_parts[1:]:
+        if v[0] != "0":
+            components.append((1, int(v), ""))
+        else:
+            components.append((0, 0, v.rstrip("0")))
+
+    # Suffixes are (value, number) pairs, terminated by (0, 0), which sorts
+    # between the negative suffixes (alpha, beta, pre, rc) and the positive one (p).
+    suffixes = []
+    for x in parts[1:]:
+        match = _suffix_regexp.match(x)
+        suffixes.append((_suffix_value[match.group(1)], int("0" + match.group(2))))
+    suffixes.append((0, 0))
+
+    return (tuple(components), letter, tuple(suffixes), _revision_number(rev))
 
-    # If the versions are the same, comparing revisions will suffice.
+
+def package_fullver_cmp(ver1, rev1, ver2, rev2):
     if ver1 == ver2:
         return package_revision_cmp(rev1, rev2)
-
-    # Split up the versions into dotted strings and lists of suffixes.
-    parts1 = ver1.split("_")
-    parts2 = ver2.split("_")
-
-    # If the dotted strings are equal, we can skip doing a detailed comparison.
-    if parts1[0] != parts2[0]:
-
-        # First split up the dotted strings into their components.
-        ver_parts1 = parts1[0].split(".")
-        ver_parts2 = parts2[0].split(".")
-
-        # Pull out any letter suffix on the final components and keep
-        # them for later.
-        letters = []
-        for ver_parts in (ver_parts1, ver_parts2):
-            if ver_parts[-1][-1].isalpha():
-                letters.append(ord(ver_parts[-1][-1]))
-                ver_parts[-1] = ver_parts[-1][:-1]
-            else:
-                # Using -1 simplifies comparisons later
-                letters.append(-1)
-
-        # OPT: Pull length calculation out of the loop
-        ver_parts1_len = len(ver_parts1)
-        ver_parts2_len = len(ver_parts2)
-
-        # Iterate through the components
-        for v1, v2 in zip(ver_parts1, ver_parts2):
-
-            # If the string components are equal, the numerical
-            # components will be equal too.
-            if v1 == v2:
-                continue
-
-            # If one of the components begins with a "0" then they
-            # are compared as floats so that 1.1 > 1.02; else ints.
-            if v1[0] != "0" and v2[0] != "0":
-                v1 = int(v1)
-                v2 = int(v2)
-            else:
-                # handle the 0.060 == 0.060 case.
-                v1 = v1.rstrip("0")
-                v2 = v2.rstrip("0")
-
-            # If they are not equal, the higher value wins.
-            c = cmp(v1, v2)
-            if c:
-                return c
-
-        if ver_parts1_len > ver_parts2_len:
-            return 1
-        elif ver_parts2_len > ver_parts1_len:
-            return -1
-
-        # The dotted components were equal. Let's compare any single
-        # letter suffixes.
-        if letters[0] != letters[1]:
-            return cmp(letters[0], letters[1])
-
-    # The dotted components were equal, so remove them from our lists
-    # leaving only suffixes.
-    del parts1[0]
-    del parts2[0]
-
-    # OPT: Pull length calculation out of the loop
-    parts1_len = len(parts1)
-    parts2_len = len(parts2)
-
-    # Iterate through the suffixes
-    for x in range(max(parts1_len, parts2_len)):
-
-        # If we're at the end of one of our lists, we need to use
-        # the next suffix from the other list to decide who wins.
-        if x == parts1_len:
-            match = _suffix_regexp.match(parts2[x])
-            val = _suffix_value[match.group(1)]
-            if val:
-                return cmp(0, val)
-            return cmp(0, int("0"+match.group(2)))
-        if x == parts2_len:
-            match = _suffix_regexp.match(parts1[x])
-            val = _suffix_value[match.group(1)]
-            if val:
-                return cmp(val, 0)
-            return cmp(int("0"+match.group(2)), 0)
-
-        # If the string values are equal, no need to parse them.
-        # Continue on to the next.
-        if parts1[x] == parts2[x]:
-            continue
-
-        # Match against our regular expression to make a split between
-        # "beta" and "1" in "beta1"
-        match1 = _suffix_regexp.match(parts1[x])
-        match2 = _suffix_regexp.match(parts2[x])
-
-        # If our int'ified suffix names are different, use that as the basis
-        # for comparison.
-        c = cmp(_suffix_value[match1.group(1)], _suffix_value[match2.group(1)])
-        if c:
-            return c
-
-        # Otherwise use the digit as the basis for comparison.
-        c = cmp(int("0"+match1.group(2)), int("0"+match2.group(2)))
-        if c:
-            return c
-
-    # Our versions had different strings but ended up being equal.
-    # The revision holds the final difference.
-    return package_revision_cmp(rev1, rev2)
+    return _cmp(package_version_key(ver1, rev1), package_version_key(ver2, rev2))
 
 
 def package_revision_cmp(rev1, rev2):
-    rev1 = int(rev1[1:]) if rev1 is not None else 0
-    rev2 = int(rev2[1:]) if rev2 is not None else 0
-    return cmp(rev1, rev2)
+    return _cmp(_revision_number(rev1), _revision_number(rev2))
+
+
+def package_version_glob_match(prefix, fullver):
+    """Return True if version-revision fullver is matched by the "=<prefix>*" wildcard.
+
+    The prefix must end on a version component boundary of fullver, so that 1.2* matches
+    1.2, 1.2.3, 1.2a, 1.2_rc1 and 1.2-r1, but not 1.20.
+    """
+
+    if not fullver.startswith(prefix):
+        return False
+    if len(fullver) == len(prefix):
+        return True
+    # a digit following a digit continues the same number
+    return not (fullver[len(prefix)].isdigit() and prefix[-1].isdigit())
+
+
+def _revision_number(rev):
+    return int(rev[1:]) if rev is not None else 0
+
 
+def _cmp(a, b):
+    return (a > b) - (a < b)
 
-_package_version_re = re.compile(r"^(?:\d+)(?:\.\d+)*[a-zA-Z]?(?:_(p(?:re)?|beta|alpha|rc)\d*)*$")     # FIXME: change to lazy+compile + weak-ref? test performance first
 
 _suffix_regexp = re.compile('^(alpha|beta|rc|pre|p)(\\d*)$')
 _suffix_value = {"pre": -2, "p": 1, "alpha": -4, "beta": -3, "rc": -1}
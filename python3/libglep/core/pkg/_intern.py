@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import sys
+import threading
+from collections import OrderedDict
+from snakeoil import klass
+
+
+def enable_interning(maxsize=65536):
+    """Make CP, CPV, Atom and PkgWildcard return the same instance when constructed from the same arguments.
+
+    Interning is off by default. The cache keeps at most maxsize instances, the least recently used ones are dropped first.
+    Calling this function again resets the cache and its statistics.
+    """
+    assert maxsize > 0
+
+    global _cache
+    _cache = _InternCache(maxsize)
+
+
+def disable_interning():
+    global _cache
+    _cache = None
+
+
+def get_interning_stats():
+    """Returns an InterningStats object, or None if interning is not enabled."""
+    cache = _cache
+    if cache is None:
+        return None
+    with cache.lock:
+        return InterningStats(cache)
+
+
+class InterningStats:
+
+    def __init__(self, cache):
+        self.hits = cache.hits
+        self.misses = cache.misses
+        self.size = len(cache.lru)
+        self.maxsize = cache.maxsize
+        self.bytes_saved = cache.bytes_saved        # estimated, shallow size of the instances that were not created
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+
+class interned_instance(type):
+    """Metaclass for immutable classes whose instances can be shared.
+
+    Classes using it can set __inst_interning__ to False to opt out.
+    """
+
+    __inst_interning__ = True
+
+    def __new__(mcs, name, bases, scope):
+        klass.inject_immutable_instance(scope)
+        return super().__new__(mcs, name, bases, scope)
+
+    def __call__(cls, *args, **kwargs):
+        cache = _cache
+        if cache is None or not cls.__inst_interning__:
+            return super().__call__(*args, **kwargs)
+
+        # _do_check only skips validation, it doesn't change the instance
+        kwargs_key = tuple(sorted(x for x in kwargs.items() if x[0] != "_do_check"))
+        if kwargs_key:
+            key = (cls, args, kwargs_key)
+        else:
+            key = (cls, args)
+
+        # instances are created by several threads (repository and vdb thread pools)
+        with cache.lock:
+            try:
+                obj = cache.lru[key]
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable arguments, can't be interned
+                key = None
+            else:
+                cache.lru.move_to_end(key)
+                cache.hits += 1
+                cache.bytes_saved += sys.getsizeof(obj)
+                return obj
+
+        # constructed outside of the lock, it may raise
+        obj = super().__call__(*args, **kwargs)
+        if key is None:
+            return obj
+
+        with cache.lock:
+            # another thread may have constructed the same instance meanwhile, keep the first one
+            other = cache.lru.get(key)
+            if other is not None:
+                cache.lru.move_to_end(key)
+                cache.hits += 1
+                return other
+            cache.misses += 1
+            cache.lru[key] = obj
+            if len(cache.lru) > cache.maxsize:
+                cache.lru.popitem(last=False)
+        return obj
+
+
+class _InternCache:
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+
+_cache = None
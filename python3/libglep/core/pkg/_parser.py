@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+import re
+
+
+# Atom, PkgWildcard and CPV strings are all parsed by one compiled regular expression each,
+# built from the same component patterns below, so that a single match call splits and
+# validates every component at once. The groups are positional, in the order given by
+# the *_GROUPS tuples, so that callers can unpack match.groups() directly.
+
+_category_pattern = r"[A-Za-z0-9_][A-Za-z0-9+_.-]*"
+_package_pattern = r"[A-Za-z0-9_][A-Za-z0-9+_-]*?"                # non-greedy, names ending in "-<version>" are rejected by check_package_name()
+_version_pattern = r"\d+(?:\.\d+)*[a-zA-Z]?(?:_(?:alpha|beta|pre|rc|p)\d*)*"
+_revision_pattern = r"r[1-9]\d*"
+_slot_pattern = r"[A-Za-z0-9_][A-Za-z0-9+_.-]*"
+_repository_pattern = r"[A-Za-z0-9_][A-Za-z0-9_-]*"
+_use_flag_pattern = r"[A-Za-z0-9][A-Za-z0-9+_@-]*"
+
+_wildcard_category_pattern = r"[A-Za-z0-9_*][A-Za-z0-9+_.*-]*"
+_wildcard_package_pattern = r"[A-Za-z0-9_*][A-Za-z0-9+_*-]*?"
+
+_use_dep_pattern = r"(?:!?{flag}(?:\([+-]\))?[=?]|-?{flag}(?:\([+-]\))?)".format(flag=_use_flag_pattern)
+
+CPV_GROUPS = ("category", "package", "ver", "rev")
+
+ATOM_GROUPS = ("blocks", "op", "category", "package", "ver", "rev", "post_wildcard",
+               "slot", "subslot", "slot_eq", "slot_operator", "repo_id", "use")
+
+WILDCARD_GROUPS = ("op", "category", "package", "ver", "rev", "post_wildcard",
+                   "slot", "subslot", "repo_id")
+
+cpv_re = re.compile(r"""
+    ({category})/({package})
+    -({version})(?:-({revision}))?
+""".format(category=_category_pattern, package=_package_pattern,
+           version=_version_pattern, revision=_revision_pattern), re.X)
+
+atom_re = re.compile(r"""
+    (!!?)?
+    (<=|>=|[<>=~])?
+    ({category})/({package})
+    (?:-({version})(?:-({revision}))?(\*)?)?
+    (?::(?:({slot})(?:/({slot}))?(=)?|([*=])))?
+    (?:::({repository}))?
+    (?:\[({use_dep}(?:,{use_dep})*)\])?
+""".format(category=_category_pattern, package=_package_pattern,
+           version=_version_pattern, revision=_revision_pattern,
+           slot=_slot_pattern, repository=_repository_pattern, use_dep=_use_dep_pattern), re.X)
+
+wildcard_re = re.compile(r"""
+    (<=|>=|[<>=~])?
+    ({category})/({package})
+    (?:-({version})(?:-({revision}))?(\*)?)?
+    (?::({slot})(?:/({slot}))?)?
+    (?:::({repository}))?
+""".format(category=_wildcard_category_pattern, package=_wildcard_package_pattern,
+           version=_version_pattern, revision=_revision_pattern,
+           slot=_slot_pattern, repository=_repository_pattern), re.X)
+
+package_version_re = re.compile(_version_pattern)
+
+package_name_end_re = re.compile(r"-{version}(?:-{revision})?$".format(version=_version_pattern, revision=_revision_pattern))
+
+use_flag_re = re.compile(_use_flag_pattern)
+
+
+def check_combination(op, ver, rev, post_wildcard):
+    """Return why the components of a matched atom (or wildcard) can't be combined, or None."""
+
+    if op is not None:
+        if ver is None:
+            return f"'{op}' operator requires a version"
+        if op == '~' and rev is not None:
+            return "'~' operator cannot be combined with a revision"
+    else:
+        if ver is not None:
+            return 'versioned atom requires an operator'
+    if post_wildcard and op != "=":
+        return "'*' postfix requires '=' operator"
+    return None
+
+
+def check_package_name(package):
+    """Return why the package name of a matched atom (or wildcard, or CPV) is invalid, or None.
+
+    PMS forbids names ending in a hyphen followed by something valid as a version, "foo-1" in "a/foo-1-1".
+    """
+
+    if "-" in package and package_name_end_re.search(package) is not None:
+        return "package name must not end in a hyphen followed by a version"
+    return None
+
+
+def explain_error(s, allow_blocks=True, allow_use=True, allow_slot_operator=True):
+    """Return why s doesn't match the atom (or wildcard) syntax.
+
+    Only called after the master regex failed, so it may be slow, its only purpose
+    is to produce a useful error message.
+    """
+
+    # use dependencies
+    use_start = s.find("[")
+    if use_start != -1:
+        if not allow_use:
+            return "use dependencies aren't allowed"
+        use_end = s.find("]", use_start)
+        if use_end == -1:
+            return "use restriction isn't completed"
+        if use_end != len(s) - 1:
+            return "trailing garbage after use dep"
+        for x in s[use_start + 1:use_end].split(","):
+            if not re.fullmatch(_use_dep_pattern, x):
+                return f"invalid use dep: {x!r}"
+        s = s[:use_start]
+
+    # repository
+    repo_id_start = s.find("::")
+    if repo_id_start != -1:
+        repo_id = s[repo_id_start + 2:]
+        if repo_id == "":
+            return "repo_id must not be empty"
+        if not re.fullmatch(_repository_pattern, repo_id):
+            return f"invalid repo_id component: {repo_id!r}"
+        s = s[:repo_id_start]
+
+    # slot, subslot and slot operator
+    slot_start = s.find(":")
+    if slot_start != -1:
+        slot = s[slot_start + 1:]
+        if slot == "":
+            return "empty slot targets aren't allowed"
+        if allow_slot_operator:
+            if slot in ("*", "="):
+                slot = ""
+            elif slot.endswith("="):
+                slot = slot[:-1]
+        if slot != "":
+            slots = slot.split("/")
+            if len(slots) > 2:
+                return f"redundant character in slot/subslot component: {slot!r}"
+            for x in slots:
+                if not re.fullmatch(_slot_pattern, x):
+                    return f"invalid slot/subslot targets: {slot!r}"
+        s = s[:slot_start]
+
+    # blockers and prefix operator
+    if s.startswith("!"):
+        if not allow_blocks:
+            return "blockers aren't allowed"
+        s = s[2:] if s.startswith("!!") else s[1:]
+    for op in ("<=", ">=", "<", ">", "=", "~"):
+        if s.startswith(op):
+            s = s[len(op):]
+            break
+
+    # category, package, version and revision
+    if "/" not in s:
+        return "no category component"
+    category, pkg_name_ver = s.split("/", 1)
+    if category == "" or "/" in pkg_name_ver:
+        return "invalid category component"
+    if pkg_name_ver == "":
+        return "invalid package component"
+    return "invalid package, version or revision component"
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
 import re
+import sys
 import string
 from snakeoil import klass
-from ... import errors
-from ._cpv import is_valid_category, is_valid_package_name, is_valid_package_version, is_valid_package_revision, CP, CPV
+from ._intern import interned_instance
+from . import _parser
 
 
 def is_valid_prefix_op(s):
@@ -41,7 +42,7 @@ def is_valid_use_flag(s):
     return _valid_use_flag_re.fullmatch(s)
 
 
-class Wildcard(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
+class Wildcard(klass.SlotsPicklingMixin, metaclass=interned_instance):
     """Currently implements gentoo package wildcard.
 
     :ivar op: str prefix operator, optional
@@ -49,128 +50,43 @@ class Wildcard(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
     :ivar package: str package name, may contain wildcard
     :ivar slot: str slot, optional
     :ivar subslot: str subslot, optional
-    :ivar ver: str version, optional, may contain wildcard
-    :ivar rev: str revision, optional, may contain wildcard
+    :ivar ver: str version, optional, a trailing wildcard is in post_wildcard
+    :ivar rev: str revision, optional
     :ivar fullver: str version-revision
+    :ivar post_wildcard: bool has * postfix
     :ivar repo_id: str repository name, optional
     :ivar key: str (category/package-version-revision)
     """
 
+    __slots__ = ("op", "category", "package", "ver", "rev", "post_wildcard", "slot", "subslot", "repo_id")
+
     def __init__(self, wildcard):
         """
         :param wildcard: string, see gentoo wildcard syntax
         """
 
+        m = _parser.wildcard_re.fullmatch(wildcard)
+        if m is None:
+            raise InvalidPkgWildcard(wildcard, _parser.explain_error(wildcard, allow_blocks=False, allow_use=False, allow_slot_operator=False))
+        self._set_groups(m.groups())
+
+        err = _parser.check_combination(self.op, self.ver, self.rev, self.post_wildcard) or _parser.check_package_name(self.package)
+        if err is not None:
+            raise InvalidPkgWildcard(wildcard, err)
+
+    def _set_groups(self, groups):
+        op, category, pkgname, ver, rev, post_wildcard, slot, subslot, repo_id = groups
+
         sf = object.__setattr__
-        orig_wildcard = wildcard
-
-        # self.repo_id
-        repo_id_start = wildcard.find("::")
-        if repo_id_start != -1:
-            repo_id = wildcard[repo_id_start+2:]
-            if repo_id == "":
-                raise errors.InvalidAtom(orig_wildcard, "repo_id must not be empty")
-            if not is_valid_repository(repo_id):
-                raise errors.InvalidAtom(orig_wildcard, f"invalid repo_id component: {repo_id!r}")
-            wildcard = wildcard[:repo_id_start]
-            sf(self, "repo_id", repo_id)
-        else:
-            sf(self, "repo_id", None)
-
-        # self.slot, self.subslot
-        slot_start = wildcard.find(":")
-        if slot_start != -1:
-            # slot dep.
-            slot = wildcard[slot_start+1:]
-            if slot == "":
-                raise errors.InvalidAtom(orig_wildcard, "empty slot targets aren't allowed")        # FIXME: targets->target?
-
-            slots = slot.split('/')
-            if len(slots) == 1:
-                subslot = None
-            elif len(slots) == 2:
-                slot = slots[0]
-                subslot = slots[1]
-                if slot == "":
-                    raise errors.InvalidAtom(orig_wildcard, "empty slot targets aren't allowed")
-                if subslot == "":
-                    raise errors.InvalidAtom(orig_wildcard, "empty subslot targets aren't allowed")
-            else:
-                raise errors.InvalidAtom(orig_wildcard, f"redundant character in slot/subslot component: {slot!r}")
-
-            if slot is not None and not is_valid_slot(slot):
-                raise errors.InvalidAtom(orig_wildcard, "invalid slot targets")
-            if subslot is not None and not is_valid_subslot(slot):
-                raise errors.InvalidAtom(orig_wildcard, "invalid subslot targets")
-
-            sf(self, "slot", slot)
-            sf(self, "subslot", subslot)
-            wildcard = wildcard[:slot_start]
-        else:
-            sf(self, "slot", None)
-            sf(self, "subslot", None)
-
-        # self.op
-        if wildcard[0] in ('<', '>'):
-            if wildcard[1] == '=':
-                sf(self, 'op', wildcard[:2])
-                wildcard = wildcard[2:]
-            else:
-                sf(self, 'op', wildcard[0])
-                wildcard = wildcard[1:]
-        elif wildcard[0] == '=':
-            wildcard = wildcard[1:]
-            sf(self, 'op', '=')
-        elif wildcard[0] == '~':
-            sf(self, 'op', '~')
-            wildcard = wildcard[1:]
-        else:
-            sf(self, 'op', None)
-
-        # self.category, self.package, self.ver, self.rev
-        if True:
-            try:
-                category, pkg_name_ver = wildcard.rsplit("/", 1)
-            except ValueError:
-                raise errors.InvalidAtom(orig_wildcard, "no category component")     # occurs if the rsplit yields only one item
-            pkg_chunks = pkg_name_ver.split("-")
-            pkgname = pkg_chunks[0]
-            if len(pkg_chunks) == 1:
-                ver = None
-                rev = None
-            else:
-                if is_valid_package_revision(pkg_chunks[-1]):
-                    ver = "-".join(pkg_chunks[1:-1])
-                    rev = pkg_chunks[-1]
-                else:
-                    ver = pkg_chunks[1:]
-                    rev = None
-
-            if not is_valid_category(category):
-                raise errors.InvalidAtom(orig_wildcard, "invalid category component")
-            if not is_valid_package_name(pkgname):
-                raise errors.InvalidAtom(orig_wildcard, "invalid package component")
-            if not is_valid_package_version(ver):
-                raise errors.InvalidAtom(orig_wildcard, "invalid version component")
-            if rev is not None and not is_valid_package_revision(rev):
-                raise errors.InvalidAtom(orig_wildcard, "invalid revision component")
-
-            sf(self, 'category', category)
-            sf(self, 'package', pkgname)
-            sf(self, 'ver', ver)
-            sf(self, 'rev', rev)
-
-        # check for invalid combinations
-        if self.op is not None:
-            if self.ver is None:
-                raise errors.InvalidAtom(orig_wildcard, "'{self.op}' operator requires a version")
-            if self.op == '~' and self.revision is not None:
-                raise errors.InvalidAtom(orig_wildcard, "'~' operator cannot be combined with a revision")
-        else:
-            if self.ver is not None:
-                raise errors.InvalidAtom(orig_wildcard, 'versioned atom requires an operator')
-        if self.post_wildcard and self.op != "=":
-            raise errors.InvalidAtom(orig_wildcard, "'*' postfix requires '=' operator")
+        sf(self, "op", op)
+        sf(self, "category", sys.intern(category))
+        sf(self, "package", sys.intern(pkgname))
+        sf(self, "ver", ver)
+        sf(self, "rev", rev)
+        sf(self, "post_wildcard", post_wildcard is not None)
+        sf(self, "slot", slot)
+        sf(self, "subslot", subslot)
+        sf(self, "repo_id", repo_id)
 
     def match(self):
         pass
@@ -180,8 +96,6 @@ class Wildcard(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
 
     def __repr__(self):
         attrs = [self._core_str()]
-        if self.use is not None:
-            attrs.append(f'use={self.use!r}')
         if self.slot is not None:
             attrs.append(f'slot={self.slot!r}')
         if self.subslot is not None:
@@ -196,24 +110,21 @@ class Wildcard(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
             s += f":{self.slot}"
             if self.subslot is not None:
                 s += f"/{self.subslot}"
-            if self.slot_operator is not None:
-                s += self.slot_operator
-        else:
-            if self.slot_operator is not None:
-                s += self.slot_operator
         if self.repo_id is not None:
             s += f"::{self.repo_id}"
-        if self.use is not None:
-            s += ",".join(self.use)
         return s
 
     def __eq__(self, other):
+        if self is other:
+            return True
         try:
             return self._all_attrs() == other._all_attrs()
         except AttributeError:
             raise TypeError(f"'==' not supported between instances of {self.__class__.__name__!r} and {other.__class__.__name__!r}")
 
     def __ne__(self, other):
+        if self is other:
+            return False
         try:
             return self._all_attrs() != other._all_attrs()
         except AttributeError:
@@ -221,8 +132,7 @@ class Wildcard(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
 
     def _all_attrs(self):
         return (self.category, self.package, self.ver, self.rev, self.post_wildcard, self.op,
-                self.blocks, self.blocks_strongly, self.slot, self.slot_operator, self.subslot,
-                self.repo_id, self.use)
+                self.slot, self.subslot, self.repo_id)
 
     def _core_str(self):
         s = self.category + "/" + self.package
@@ -231,19 +141,26 @@ class Wildcard(klass.SlotsPicklingMixin, metaclass=klass.immutable_instance):
                 s += f"-{self.ver}"
             else:
                 s += f"-{self.ver}-{self.rev}"
+        if self.post_wildcard:
+            s += "*"
         if self.op is not None:
             s = self.op + s
-        if self.blocks:
-            if self.blocks_strongly:
-                s = '!!' + s
-            else:
-                s = '!' + s
         return s
 
 
 class InvalidPkgWildcard(ValueError):
-    # FIXME
-    pass
+    """Package wildcard doesn't follow required specifications."""
+
+    def __init__(self, wildcard, err=None):
+        self.wildcard = wildcard
+        self.err = err
+        super().__init__(str(self))
+
+    def __str__(self):
+        msg = f'invalid package wildcard: {self.wildcard!r}'
+        if self.err is not None:
+            msg += f': {self.err}'
+        return msg
 
 
 
@@ -245,6 +245,17 @@ class AndRestriction(base):
                 return self.negate
         return not self.negate
 
+    def match_many(self, vals):
+        """Match a batch, each restriction is evaluated once over the items still matching."""
+        vals = list(vals)
+        pending = range(len(vals))
+        for rest in self.restrictions:
+            if not pending:
+                break
+            mask = rest.match_many([vals[i] for i in pending])
+            pending = [i for i, matched in zip(pending, mask) if matched]
+        return _mask(len(vals), pending, not self.negate)
+
     def force_True(self, pkg, *vals):
         pvals = [pkg]
         pvals.extend(vals)
@@ -404,6 +415,17 @@ class OrRestriction(base):
                 return not self.negate
         return self.negate
 
+    def match_many(self, vals):
+        """Match a batch, each restriction is evaluated once over the items not matched yet."""
+        vals = list(vals)
+        pending = range(len(vals))
+        for rest in self.restrictions:
+            if not pending:
+                break
+            mask = rest.match_many([vals[i] for i in pending])
+            pending = [i for i, matched in zip(pending, mask) if not matched]
+        return _mask(len(vals), pending, self.negate)
+
     def cnf_solutions(self, full_solution_expansion=False):
         """Returns a list in CNF (conjunctive normalized form) of this instance.
 
@@ -580,3 +602,11 @@ class AtMostOneOfRestriction(base):
         restricts_str = " ".join(map(str, self.restrictions))
         negate = 'not ' if self.negate else ''
         return f'{negate}at-most-one-of ( {restricts_str} )'
+
+
+def _mask(length, indexes, value):
+    """list of length booleans, value at indexes and the opposite elsewhere"""
+    ret = [not value] * length
+    for i in indexes:
+        ret[i] = value
+    return ret
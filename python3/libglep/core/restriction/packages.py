@@ -65,6 +65,42 @@ class PackageRestriction(restriction.base, metaclass=generic_equality):
             return self.negate
         return self.restriction.match(attr) != self.negate
 
+    def match_many(self, pkgs):
+        """Match a batch of packages.
+
+        The attribute is pulled from all the packages first, then the child
+        restriction is evaluated once over that column.
+        """
+        column = self._pull_column(pkgs)
+        negate = self.negate
+        present = [i for i, attr in enumerate(column) if attr is not klass.sentinel]
+        ret = [negate] * len(column)
+        if len(present) == len(column):
+            mask = self.restriction.match_many(column)
+        else:
+            mask = self.restriction.match_many([column[i] for i in present])
+        for i, matched in zip(present, mask):
+            ret[i] = matched != negate
+        return ret
+
+    def _pull_column(self, pkgs):
+        pull = self._pull_attr_func
+        column = []
+        append = column.append
+        pkgs = iter(pkgs)
+        while True:
+            # the try block is only set up again after a failure, not per package
+            try:
+                for pkg in pkgs:
+                    append(pull(pkg))
+                return column
+            except IGNORED_EXCEPTIONS:
+                raise
+            except Exception as e:
+                if self._handle_exception(pkg, e, self._attr_split):
+                    raise
+                append(klass.sentinel)
+
     def _handle_exception(self, pkg, exc, attr_split):
         if isinstance(exc, AttributeError):
             if not self.ignore_missing:
@@ -177,6 +213,9 @@ class PackageRestrictionMulti(PackageRestriction):
             return klass.sentinel
         return val
 
+    def _pull_column(self, pkgs):
+        return [self._pull_attr(pkg) for pkg in pkgs]
+
     __hash__ = PackageRestriction.__hash__
     __eq__ = PackageRestriction.__eq__
 
@@ -26,6 +26,15 @@ class base(klass.SlotsPicklingMixin, metaclass=caching.WeakInstMeta):
     def match(self, *arg, **kwargs):
         raise NotImplementedError
 
+    def match_many(self, vals):
+        """Match a batch of values (or packages).
+
+        :param vals: sequence of what :meth:`match` accepts
+        :return: list of booleans, one per item of vals
+        """
+        match = self.match
+        return [match(x) for x in vals]
+
     def force_False(self, *arg, **kwargs):
         return not self.match(*arg, **kwargs)
 
@@ -55,6 +64,9 @@ class AlwaysBool(base):
     def match(self, *a, **kw):
         return self.negate
 
+    def match_many(self, vals):
+        return [self.negate] * len(vals)
+
     def force_False(self, *a, **kw):
         return not self.negate
 
@@ -96,6 +108,9 @@ class Negate(base):
     def match(self, *a, **kw):
         return not self._restrict.match(*a, **kw)
 
+    def match_many(self, vals):
+        return [not x for x in self._restrict.match_many(vals)]
+
     def __str__(self):
         return "not (%s)" % self._restrict
 
@@ -118,6 +133,9 @@ class FakeType(base):
     def match(self, *a, **kw):
         return self._restrict.match(*a, **kw)
 
+    def match_many(self, vals):
+        return self._restrict.match_many(vals)
+
     def __str__(self):
         return "Faked type(%s): %s" % (self.type, self._restrict)
 
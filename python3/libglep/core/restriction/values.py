@@ -114,6 +114,23 @@ class StrRegex(base, metaclass=hashed_base):
                 value = str(value)
         return (self._matchfunc(value) is not None) != self.negate
 
+    def match_many(self, vals):
+        # columns repeat a lot (licenses, eapis...), search each distinct value once
+        match = self.match
+        cache = {}
+        ret = []
+        for val in vals:
+            # the class is part of the key, str(1) and str(True) differ
+            key = (val.__class__, val)
+            try:
+                ret.append(cache[key])
+            except KeyError:
+                ret.append(cache.setdefault(key, match(val)))
+            except TypeError:
+                # unhashable
+                ret.append(match(val))
+        return ret
+
     def __repr__(self):
         result = [self.__class__.__name__, repr(self.regex)]
         if self.negate:
@@ -166,6 +183,12 @@ class StrExactMatch(base, metaclass=generic_equality):
         else:
             return (self.exact == value.lower()) != self.negate
 
+    def match_many(self, vals):
+        exact, negate = self.exact, self.negate
+        if self.case_sensitive:
+            return [(exact == str(x)) != negate for x in vals]
+        return [(exact == str(x).lower()) != negate for x in vals]
+
     def intersect(self, other):
         s1, s2 = self.exact, other.exact
         if other.case_sensitive and not self.case_sensitive:
@@ -229,6 +252,16 @@ class StrGlobMatch(base, metaclass=hashed_base):
             f = value.endswith
         return f(self.glob) ^ self.negate
 
+    def match_many(self, vals):
+        glob, negate = self.glob, self.negate
+        if self.flags == re.I:
+            vals = [str(x).lower() for x in vals]
+        else:
+            vals = [str(x) for x in vals]
+        if self.prefix:
+            return [x.startswith(glob) ^ negate for x in vals]
+        return [x.endswith(glob) ^ negate for x in vals]
+
     def __repr__(self):
         if self.negate:
             string = '<%s %r case_sensitive=%r negated @%#8x>'
@@ -342,6 +375,25 @@ class ContainmentMatch2(base, metaclass=hashed_base):
                 if k in val:
                     return not self.negate
 
+    def match_many(self, vals):
+        negate = self.negate
+        if self.all:
+            test = self.vals.issubset
+        else:
+            test = self.vals.isdisjoint
+            negate = not negate
+        match = self.match
+        ret = []
+        for val in vals:
+            if isinstance(val, str):
+                ret.append(match(val))
+                continue
+            try:
+                ret.append(test(val) != negate)
+            except TypeError:
+                ret.append(match(val))
+        return ret
+
     def force_False(self, pkg, attr, val, _values_override=None):
 
         # "More than one statement on a single line"
@@ -21,13 +21,13 @@
 # THE SOFTWARE.
 
 
-from .core._cp import InvalidCP
+from .core.pkg._cp import InvalidCP
 
-from .core._cpv import InvalidCPV
+from .core.pkg._cpv import InvalidCPV
 
-from .core._pkg_wildcard import InvalidPkgWildcard
+from .core.pkg._wildcard import InvalidPkgWildcard
 
-from .core._pkg_atom import InvalidPkgAtom
+from .core.pkg._atom import InvalidPkgAtom
 
 from .repo._repo import RepoError
 from .repo._repo import RepoPropertyFileParseError
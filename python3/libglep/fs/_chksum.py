@@ -0,0 +1,140 @@
+"""
+parallel checksum computation of files
+"""
+
+__all__ = ("get_file_chksums", "ChksumEngine")
+
+import collections
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from snakeoil.chksum import get_handler
+
+# chunk size of the read loop, big enough that the hashlib calls (which release the GIL) dominate
+_BLOCKSIZE = 1 << 20
+
+# files bigger than this are hashed through mmap instead of read()
+_MMAP_THRESHOLD = 64 << 20
+
+_HASHLIB_TYPES = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s,
+    "sha3_256": hashlib.sha3_256,
+    "sha3_512": hashlib.sha3_512,
+}
+
+
+def get_file_chksums(path, chksum_types):
+    """Compute several checksums of a file with one read pass.
+
+    :param chksum_types: sequence of chksum type names, see :obj:`snakeoil.chksum`
+    :return: dict of chksum type -> value, values are the same as the ones of the snakeoil handlers
+    """
+    hashers = []
+    ret = {}
+    others = []
+    for chf_type in chksum_types:
+        if chf_type in _HASHLIB_TYPES:
+            hashers.append((chf_type, _HASHLIB_TYPES[chf_type]()))
+        elif chf_type != "size":
+            # no hashlib implementation (rmd160, whirlpool, ...), left to snakeoil
+            others.append(chf_type)
+
+    updates = [h.update for _, h in hashers]
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= _MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                try:
+                    for i in range(0, size, _BLOCKSIZE):
+                        chunk = view[i:i + _BLOCKSIZE]
+                        for update in updates:
+                            update(chunk)
+                        chunk.release()
+                finally:
+                    view.release()
+        elif updates:
+            data = f.read(_BLOCKSIZE)
+            while data:
+                for update in updates:
+                    update(data)
+                data = f.read(_BLOCKSIZE)
+
+    for chf_type, h in hashers:
+        ret[chf_type] = int(h.hexdigest(), 16)
+    for chf_type in others:
+        ret[chf_type] = get_handler(chf_type)(path)
+    if "size" in chksum_types:
+        ret["size"] = size
+    return ret
+
+
+class ChksumEngine:
+    """Compute the checksums of many files in a pool of threads.
+
+    Each file is read once for all the chksum types, files are spread over the threads. hashlib
+    releases the GIL while hashing, so the pool scales with the number of cores.
+    """
+
+    def __init__(self, chksum_types, jobs=None):
+        """
+        :param chksum_types: sequence of chksum type names
+        :param jobs: number of threads, defaults to the number of cpus
+        """
+        self.chksum_types = tuple(chksum_types)
+        self.jobs = jobs if jobs else os.cpu_count()
+        self._pool = ThreadPoolExecutor(max_workers=self.jobs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def submit(self, path):
+        """Returns a future of the chksums dict of path."""
+        return self._pool.submit(get_file_chksums, path, self.chksum_types)
+
+    def map(self, paths):
+        """Iterate over (path, chksums dict) of paths, in order."""
+        pending = collections.deque()
+        window = self.jobs * 4
+        for path in paths:
+            pending.append((path, self.submit(path)))
+            if len(pending) > window:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+    def iter_fill(self, iterable):
+        """Iterate over the fs objects of iterable, with the chksums of the regular files computed.
+
+        Objects are yielded in order, a bounded number of them is kept in flight.
+        """
+        pending = collections.deque()
+        window = self.jobs * 4
+        for obj in iterable:
+            future = self.submit(obj.data.path) if obj.is_reg else None
+            pending.append((obj, future))
+            while pending and (len(pending) > window or pending[0][1] is None):
+                yield _resolve(*pending.popleft())
+        while pending:
+            yield _resolve(*pending.popleft())
+
+
+def _resolve(obj, future):
+    if future is None:
+        return obj
+    return obj.change_attributes(chksums=future.result())
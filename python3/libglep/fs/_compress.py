@@ -0,0 +1,175 @@
+"""
+streaming compression of binpkg archives through external, multi-threaded binaries
+"""
+
+__all__ = ("CompressedWriter", "known_compressors")
+
+import bz2
+import lzma
+import os
+import subprocess
+import threading
+import zlib
+
+from ._chksum import _HASHLIB_TYPES
+from ._decompress import _aliases, _find_binary
+
+# compressor -> (default level, candidate binaries best first with their arguments besides -c);
+# "{jobs}" is replaced by the number of cpus, "{level}" by the compression level
+known_compressors = {
+    "zstd": (3, (("zstd", ("-T0", "-q", "-{level}")),)),
+    "xz": (6, (("xz", ("-T0", "-{level}")),)),
+    "bzip2": (9, (("lbzip2", ("-n{jobs}", "-{level}")), ("pbzip2", ("-p{jobs}", "-{level}")),
+                  ("bzip2", ("-{level}",)))),
+    "gzip": (6, (("pigz", ("-p{jobs}", "-{level}")), ("gzip", ("-{level}",)))),
+    "lz4": (1, (("lz4", ("-q", "-{level}")),)),
+}
+
+# in-process fallbacks, single threaded
+_native_compressors = {
+    "bzip2": bz2.BZ2Compressor,
+    "xz": lambda level: lzma.LZMACompressor(preset=level),
+    "gzip": lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+}
+
+# size of the reads from the compressor
+_BLOCKSIZE = 1 << 20
+
+
+class CompressedWriter:
+    """Write only file object, compressing its data to a file.
+
+    The compression is done by an external process (multi-threaded where the binary allows it)
+    fed through a pipe, and a thread checksums its output while copying it to the file, so the
+    caller only pays for producing the data. The chksums are available once closed.
+    """
+
+    def __init__(self, filepath, compressor, level=None, chksum_types=()):
+        """
+        :param compressor: one of :obj:`known_compressors`, or an alias like bz2 or zst
+        :param level: compression level, defaults to the one of the compressor
+        :param chksum_types: sequence of chksum type names of the compressed file,
+            see :obj:`snakeoil.chksum`
+        """
+        compressor = _aliases.get(compressor, compressor)
+        if compressor not in known_compressors:
+            raise ValueError(f"unknown compressor: {compressor!r}")
+        default_level, candidates = known_compressors[compressor]
+        if level is None:
+            level = default_level
+
+        for chf_type in chksum_types:
+            if chf_type != "size" and chf_type not in _HASHLIB_TYPES:
+                raise ValueError(f"unsupported chksum type: {chf_type!r}")
+        self.chksum_types = tuple(chksum_types)
+        self.chksums = None
+        self._hashers = [(x, _HASHLIB_TYPES[x]()) for x in self.chksum_types if x != "size"]
+        self._size = 0
+
+        args = None
+        for name, extra_args in candidates:
+            path = _find_binary(name)
+            if path is not None:
+                args = [path, "-c"]
+                args += [x.format(jobs=os.cpu_count(), level=level) for x in extra_args]
+                break
+        if args is None and compressor not in _native_compressors:
+            raise ValueError(f"no compressor available for {compressor}")
+
+        self._out = open(filepath, "wb")
+        self._process = None
+        self._compressor = None
+        self._error = None
+        if args is not None:
+            self._process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, close_fds=True)
+            self._thread = threading.Thread(target=self._pump, daemon=True)
+            self._thread.start()
+        else:
+            self._compressor = _native_compressors[compressor](level)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data):
+        if self._process is not None:
+            self._process.stdin.write(data)
+        else:
+            self._sink(self._compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        """Finish the compression, raise if the compressor failed.
+
+        The partial file is removed on failure, as by :obj:`abort`.
+        """
+        if self._out.closed:
+            return
+        try:
+            if self._process is not None:
+                self._process.stdin.close()
+                self._thread.join()
+                ret = self._process.wait()
+                if self._error is not None:
+                    raise self._error
+                if ret != 0:
+                    raise OSError(f"{self._process.args[0]} exited with {ret}")
+            else:
+                self._sink(self._compressor.flush())
+            self._out.close()
+        except BaseException:
+            self.abort()
+            raise
+
+        self.chksums = {chf_type: int(h.hexdigest(), 16) for chf_type, h in self._hashers}
+        if "size" in self.chksum_types:
+            self.chksums["size"] = self._size
+
+    def abort(self):
+        """Stop the compression and remove the partial file."""
+        try:
+            if self._process is not None:
+                self._process.kill()
+                try:
+                    self._process.stdin.close()
+                except OSError:
+                    # broken pipe, the data still buffered for the killed compressor is lost anyway
+                    pass
+                self._thread.join()
+                self._process.wait()
+        finally:
+            try:
+                self._out.close()
+            except OSError:
+                pass
+            try:
+                os.unlink(self._out.name)
+            except FileNotFoundError:
+                pass
+
+    def _pump(self):
+        fd = self._process.stdout.fileno()
+        try:
+            while True:
+                data = os.read(fd, _BLOCKSIZE)
+                if not data:
+                    break
+                self._sink(data)
+        except Exception as e:
+            # reported by close()
+            self._error = e
+            self._process.kill()
+        finally:
+            self._process.stdout.close()
+
+    def _sink(self, data):
+        for _, h in self._hashers:
+            h.update(data)
+        self._size += len(data)
+        self._out.write(data)
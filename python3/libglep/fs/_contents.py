@@ -34,6 +34,83 @@ def check_instance(obj):
     return obj.location, obj
 
 
+class _PathTrie:
+    """Child paths of every directory of a set of paths.
+
+    Ancestor directories of the paths are nodes too, whether they are in the set or not, so that
+    the subtree of any path is reachable from it. Queries cost the size of the subtree. The children
+    of a directory are kept in insertion order (dicts used as ordered sets).
+    """
+
+    def __init__(self, paths, contains, ordered=False):
+        """
+        :param paths: initial paths
+        :param contains: callable telling if a path is in the set
+        :param ordered: if True, keep the insertion position of the paths in :obj:`positions`
+        """
+        self._children = {}
+        self._contains = contains
+        self.positions = {} if ordered else None
+        self._next_position = 0
+        for path in paths:
+            self.add(path)
+
+    def add(self, path):
+        positions = self.positions
+        if positions is not None and path not in positions:
+            # like an OrderedDict, adding a path again keeps its position
+            positions[path] = self._next_position
+            self._next_position += 1
+        children = self._children
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            s = children.get(parent)
+            if s is not None:
+                # parent is already linked to its own ancestors
+                s[path] = None
+                break
+            children[parent] = {path: None}
+            path = parent
+
+    def remove(self, path):
+        """Drop path and its ancestors which are neither in the set nor a directory of a path of the set."""
+        if self.positions is not None:
+            self.positions.pop(path, None)
+        children = self._children
+        while not self._contains(path) and not children.get(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            s = children.get(parent)
+            if s is None:
+                break
+            s.pop(path, None)
+            if s:
+                break
+            del children[parent]
+            path = parent
+
+    def iter_subtree(self, path):
+        """Yield the paths under path, path excluded, each directory before its children."""
+        children = self._children
+        stack = [iter(children.get(path, ()))]
+        while stack:
+            for child in stack[-1]:
+                yield child
+                s = children.get(child)
+                if s:
+                    stack.append(iter(s))
+                    break
+            else:
+                stack.pop()
+
+    def directories(self):
+        """Return the paths which have children."""
+        return self._children.keys()
+
+
 class ContentsSet(metaclass=generic_equality):
     """set of :class:`libglep.fs.EntryBase` objects"""
 
@@ -48,6 +125,7 @@ class ContentsSet(metaclass=generic_equality):
         :param mutable: controls if it modifiable after initialization
         """
         self._dict = self.__dict_kls__()
+        self._trie = None       # built on first subtree query, maintained afterwards
         if initial is not None:
             self._dict.update(check_instance(x) for x in initial)
         self.mutable = mutable
@@ -78,6 +156,8 @@ class ContentsSet(metaclass=generic_equality):
         if not fs.isfs_obj(obj):
             raise TypeError(f"'{obj}' is not a fs.fsBase class")
         self._dict[obj.location] = obj
+        if self._trie is not None:
+            self._trie.add(obj.location)
 
     def __delitem__(self, obj):
 
@@ -93,19 +173,18 @@ class ContentsSet(metaclass=generic_equality):
             # weird, but keeping with set.
             raise AttributeError(
                 f'{self.__class__} is frozen; no remove functionality')
-        if fs.isfs_obj(obj):
-            del self._dict[obj.location]
-        else:
-            del self._dict[normpath(obj)]
+        location = obj.location if fs.isfs_obj(obj) else normpath(obj)
+        del self._dict[location]
+        if self._trie is not None:
+            self._trie.remove(location)
 
     def remove(self, obj):
         del self[obj]
 
     def discard(self, obj):
-        if fs.isfs_obj(obj):
-            self._dict.pop(obj.location, None)
-        else:
-            self._dict.pop(obj, None)
+        location = obj.location if fs.isfs_obj(obj) else obj
+        if self._dict.pop(location, None) is not None and self._trie is not None:
+            self._trie.remove(location)
 
     def __getitem__(self, obj):
         if fs.isfs_obj(obj):
@@ -127,6 +206,7 @@ class ContentsSet(metaclass=generic_equality):
             raise AttributeError(
                 f'{self.__class__} is frozen; no clear functionality')
         self._dict.clear()
+        self._trie = None
 
     @staticmethod
     def _convert_loc(iterable):
@@ -227,8 +307,14 @@ class ContentsSet(metaclass=generic_equality):
 
     def update(self, iterable):
         d = self._dict
-        for x in iterable:
-            d[x.location] = x
+        if self._trie is None:
+            for x in iterable:
+                d[x.location] = x
+        else:
+            trie_add = self._trie.add
+            for x in iterable:
+                d[x.location] = x
+                trie_add(x.location)
 
     def iterfiles(self, invert=False):
         """A generator yielding just :obj:`pkgcore.fs.fs.fsFile` instances.
@@ -327,11 +413,12 @@ class ContentsSet(metaclass=generic_equality):
                 start_point = start_point.target
             else:
                 start_point = start_point.location
-        for x in self:
-            cn_path = normpath(start_point).rstrip(os.path.sep) + os.path.sep
-            # what about sym targets?
-            if x.location.startswith(cn_path):
-                yield x
+        # what about sym targets?
+        d = self._dict
+        for location in self._get_trie().iter_subtree(normpath(start_point)):
+            obj = d.get(location)
+            if obj is not None:
+                yield obj
 
     def child_nodes(self, start_point):
         """Return a clone of this instance, w/ just the child nodes returned
@@ -370,21 +457,20 @@ class ContentsSet(metaclass=generic_equality):
 
     def add_missing_directories(self, mode=0o775, uid=0, gid=0, mtime=None):
         """Ensure that a directory node exists for each path; add if missing."""
-        missing = (x.dirname for x in self)
-        missing = set(x for x in missing if x not in self)
+        # the directories of the trie are all the ancestors of the paths
+        missing = set(x for x in self._get_trie().directories() if x not in self._dict)
         if mtime is None:
             mtime = time.time()
-        # have to go recursive since many directories may be missing.
-        missing_initial = list(missing)
-        for x in missing_initial:
-            target = os.path.dirname(x)
-            while target not in missing and target not in self:
-                missing.add(target)
-                target = os.path.dirname(target)
         missing.discard("/")
+        missing.discard("")
         self.update(fs.fsDir(location=x, mode=mode, uid=uid, gid=gid, mtime=mtime)
             for x in missing)
 
+    def _get_trie(self):
+        if self._trie is None:
+            self._trie = _PathTrie(self._dict, self._dict.__contains__)
+        return self._trie
+
 
 class OrderedContentsSet(ContentsSet):
 
@@ -399,3 +485,16 @@ class OrderedContentsSet(ContentsSet):
         if add_missing_directories:
             self.add_missing_directories()
         self.mutable = mutable
+
+    def iter_child_nodes(self, start_point):
+        # the trie only keeps the order of the children of each directory,
+        # the subtree it finds is sorted back into the order of the set
+        nodes = list(ContentsSet.iter_child_nodes(self, start_point))
+        positions = self._trie.positions
+        nodes.sort(key=lambda x: positions[x.location])
+        return iter(nodes)
+
+    def _get_trie(self):
+        if self._trie is None:
+            self._trie = _PathTrie(self._dict, self._dict.__contains__, ordered=True)
+        return self._trie
@@ -0,0 +1,110 @@
+"""
+decompression of binpkg archives through external, multi-threaded binaries
+"""
+
+__all__ = ("decompress_handle", "detect_compressor", "known_decompressors")
+
+import bz2
+import gzip
+import lzma
+import os
+
+from snakeoil.compression import _util
+from snakeoil.process import CommandNotFound, find_binary
+
+try:
+    import lz4.frame as _lz4_frame
+except ImportError:
+    _lz4_frame = None
+
+# compressor -> candidate binaries, best first, with their arguments besides -dc;
+# "{jobs}" is replaced by the number of cpus
+known_decompressors = {
+    "bzip2": (("lbzip2", ("-n{jobs}",)), ("pbzip2", ("-p{jobs}",)), ("bzip2", ())),
+    "xz": (("xz", ("-T0",)),),
+    "zstd": (("zstd", ("-T0", "-q")),),
+    "lz4": (("lz4", ("-q",)),),
+    "gzip": (("pigz", ("-p{jobs}",)), ("gzip", ())),
+}
+
+# in-process fallbacks, single threaded
+_native_decompressors = {
+    "bzip2": bz2.open,
+    "xz": lzma.open,
+    "gzip": gzip.open,
+}
+if _lz4_frame is not None:
+    _native_decompressors["lz4"] = _lz4_frame.open
+
+_aliases = {
+    "bz2": "bzip2",
+    "gz": "gzip",
+    "zst": "zstd",
+    "lzma": "xz",
+}
+
+_magics = (
+    (b"BZh", "bzip2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+    (b"\x04\x22\x4d\x18", "lz4"),
+    (b"\x1f\x8b", "gzip"),
+)
+
+# binary name -> path or None, filled on first use
+_binaries = {}
+
+
+def detect_compressor(path):
+    """Return the compressor of a file from its magic bytes, None if it isn't compressed."""
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for magic, compressor in _magics:
+        if head.startswith(magic):
+            return compressor
+    return None
+
+
+def decompress_handle(compressor, source, parallelize=True):
+    """Return a readable file object of the decompressed content of source.
+
+    The decompression runs in an external process writing to a pipe, nothing is written to disk.
+    When source is a path the returned object supports seeking (backward seeks restart the
+    decompression), which is what :class:`tarfile.TarFile` needs to extract members lazily.
+
+    :param compressor: one of :obj:`known_decompressors`, or an alias like bz2 or zst
+    :param source: path, file object or file descriptor of the compressed data
+    :param parallelize: if False, prefer the single threaded in-process implementation
+    """
+    compressor = _aliases.get(compressor, compressor)
+    if compressor not in known_decompressors:
+        raise ValueError(f"unknown compressor: {compressor!r}")
+
+    native = _native_decompressors.get(compressor)
+    if not parallelize and native is not None and isinstance(source, str):
+        return native(source, "rb")
+
+    for name, args in known_decompressors[compressor]:
+        path = _find_binary(name)
+        if path is not None:
+            jobs = str(os.cpu_count())
+            return _util.decompress_handle(path, source, extra_args=[x.format(jobs=jobs) for x in args])
+
+    if native is not None:
+        if isinstance(source, int):
+            source = os.fdopen(source, "rb", closefd=False)
+        return native(source, "rb")
+    raise ValueError(f"no decompressor available for {compressor}")
+
+
+def _find_binary(name):
+    try:
+        return _binaries[name]
+    except KeyError:
+        pass
+    try:
+        ret = find_binary(name)
+    except CommandNotFound:
+        ret = None
+    _binaries[name] = ret
+    return ret
@@ -10,8 +10,9 @@ from stat import S_IMODE, S_ISDIR, S_ISFIFO, S_ISLNK, S_ISREG
 from snakeoil.chksum import get_handlers
 from snakeoil.data_source import local_source
 from snakeoil.mappings import LazyValDict
-from snakeoil.osutils import listdir, normpath, pjoin
+from snakeoil.osutils import normpath, pjoin
 
+from ._chksum import ChksumEngine
 from .contents import ContentsSet
 from .fs import fsBase, fsDev, fsDir, fsFifo, fsFile, fsSymlink, get_major_minor
 
@@ -75,14 +76,56 @@ def gen_obj(path, stat=None, chksum_handlers=None, real_location=None,
         return fsDev(path, **d)
 
 
-# hmm. this code is roughly 25x slower then find.
-# make it less slow somehow. the obj instantiation is a bit of a
-# killer I'm afraid; without obj, looking at 2.3ms roughly best of 3
-# 100 iterations, obj instantiation, 58ms.
-# also, os.path.join is rather slow.
-# in this case, we know it's always pegging one more dir on, so it's
-# fine doing it this way (specially since we're relying on
-# os.path.sep, not '/' :P)
+# the scan is built around os.scandir: directory entries come with their
+# type, so the light mode does no stat at all except for fifos and devices,
+# and the full mode does exactly one (cached) lstat per entry. most of the
+# remaining cost of the full mode is the obj instantiation.
+
+def _iter_dir(base, hidden, backup):
+    with os.scandir(base) as it:
+        for entry in it:
+            name = entry.name
+            if not hidden and name.startswith('.'):
+                continue
+            if not backup and name.endswith('~'):
+                continue
+            yield entry
+
+
+def _entry_stat(entry, follow_symlinks):
+    if follow_symlinks:
+        try:
+            return entry.stat()
+        except FileNotFoundError:
+            # dangling symlink
+            pass
+    return entry.stat(follow_symlinks=False)
+
+
+def _entry_type(entry, follow_symlinks):
+    if entry.is_dir(follow_symlinks=follow_symlinks):
+        return "dir"
+    if entry.is_file(follow_symlinks=follow_symlinks):
+        return "reg"
+    if entry.is_symlink():
+        return "sym"
+    if S_ISFIFO(_entry_stat(entry, follow_symlinks).st_mode):
+        return "fifo"
+    return "dev"
+
+
+def _path_type(path, stat_func):
+    mode = stat_func(path).st_mode
+    if S_ISDIR(mode):
+        return "dir"
+    elif S_ISREG(mode):
+        return "reg"
+    elif S_ISLNK(mode):
+        return "sym"
+    elif S_ISFIFO(mode):
+        return "fifo"
+    return "dev"
+
 
 def _internal_iter_scan(path, chksum_handlers, stat_func=os.lstat,
                         hidden=True, backup=True):
@@ -92,16 +135,13 @@ def _internal_iter_scan(path, chksum_handlers, stat_func=os.lstat,
     yield obj
     if not obj.is_dir:
         return
+    follow = stat_func is not os.lstat
     while dirs:
         base = dirs.popleft()
-        for x in listdir(base):
-            if not hidden and x.startswith('.'):
-                continue
-            if not backup and x.endswith('~'):
-                continue
-            path = pjoin(base, x)
-            obj = gen_obj(path, chksum_handlers=chksum_handlers,
-                        real_location=path, stat_func=stat_func)
+        for entry in _iter_dir(base, hidden, backup):
+            path = entry.path
+            obj = gen_obj(path, stat=_entry_stat(entry, follow),
+                        chksum_handlers=chksum_handlers)
             yield obj
             if obj.is_dir:
                 dirs.append(path)
@@ -114,29 +154,48 @@ def _internal_offset_iter_scan(path, chksum_handlers, offset, stat_func=os.lstat
     dirs = collections.deque([path[len(offset):]])
     if dirs[0]:
         yield gen_obj(dirs[0], chksum_handlers=chksum_handlers,
-            stat_func=stat_func)
+            real_location=path, stat_func=stat_func)
 
     sep = os.path.sep
     while dirs:
         base = dirs.popleft()
         real_base = pjoin(offset, base.lstrip(sep))
         base = base.rstrip(sep) + sep
-        for x in listdir(real_base):
-            if not hidden and x.startswith('.'):
-                continue
-            if not backup and x.endswith('~'):
-                continue
-            path = pjoin(base, x)
-            obj = gen_obj(path, chksum_handlers=chksum_handlers,
-                        real_location=pjoin(real_base, x),
-                        stat_func=os.lstat)
+        for entry in _iter_dir(real_base, hidden, backup):
+            path = base + entry.name
+            obj = gen_obj(path, stat=entry.stat(follow_symlinks=False),
+                        chksum_handlers=chksum_handlers,
+                        real_location=entry.path)
             yield obj
             if obj.is_dir:
                 dirs.append(path)
 
 
+def _internal_light_iter_scan(path, offset, stat_func=os.lstat,
+                              hidden=True, backup=True):
+    path = normpath(path)
+    if offset is not None:
+        offset = normpath(offset).rstrip(os.path.sep)
+    strip = len(offset) if offset is not None else 0
+
+    kind = _path_type(path, stat_func)
+    if path[strip:]:
+        yield (path[strip:], kind)
+    if kind != "dir":
+        return
+    follow = stat_func is not os.lstat
+    dirs = collections.deque([path])
+    while dirs:
+        base = dirs.popleft()
+        for entry in _iter_dir(base, hidden, backup):
+            kind = _entry_type(entry, follow)
+            yield (entry.path[strip:], kind)
+            if kind == "dir":
+                dirs.append(entry.path)
+
+
 def iter_scan(path, offset=None, follow_symlinks=False, chksum_types=None,
-              hidden=True, backup=True):
+              hidden=True, backup=True, chksum_jobs=None, light=False):
     """
     Recursively scan a path.
 
@@ -150,15 +209,35 @@ def iter_scan(path, offset=None, follow_symlinks=False, chksum_types=None,
     :param offset: if not None, prefix to strip from each objects location.
         if offset is /tmp, /tmp/blah becomes /blah
     :type nonexistent: str or None
+    :param chksum_jobs: if not None, the chksum_types checksums of the files are
+        computed ahead, in one read pass per file, by a pool of chksum_jobs threads
+        (0 for one per cpu), instead of lazily on first access
+    :param light: if True, yield (location, type) tuples instead of objects, type
+        is one of "dir", "reg", "sym", "fifo" and "dev". Types come from the
+        directory entries, nothing is stat'ed but fifos and devices; use
+        :obj:`gen_obj` to get the object of an entry when it's needed.
     """
+    stat_func = follow_symlinks and os.stat or os.lstat
+    if light:
+        return _internal_light_iter_scan(
+            path, offset, stat_func, hidden=hidden, backup=backup)
+
     chksum_handlers = get_handlers(chksum_types)
 
-    stat_func = follow_symlinks and os.stat or os.lstat
     if offset is None:
-        return _internal_iter_scan(
+        it = _internal_iter_scan(
             path, chksum_handlers, stat_func, hidden=hidden, backup=backup)
-    return _internal_offset_iter_scan(
-        path, chksum_handlers, offset, stat_func, hidden=hidden, backup=backup)
+    else:
+        it = _internal_offset_iter_scan(
+            path, chksum_handlers, offset, stat_func, hidden=hidden, backup=backup)
+    if chksum_jobs is None:
+        return it
+    return _iter_scan_chksums(it, chksum_handlers, chksum_jobs)
+
+
+def _iter_scan_chksums(it, chksum_handlers, jobs):
+    with ChksumEngine(chksum_handlers, jobs) as engine:
+        yield from engine.iter_fill(it)
 
 
 def sorted_scan(path, nonexistent=False, *args, **kwargs):
@@ -6,14 +6,21 @@ Shouldn't be accessed directly for the most part, use
 """
 
 import errno
+import fcntl
 import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 
+from snakeoil.data_source import local_source
 from snakeoil.osutils import ensure_dirs, pjoin, unlink_if_exists
 from snakeoil.process.spawn import spawn
 
 from ..const import CP_BINARY
 from . import contents, fs
+from ._contents import _PathTrie
 from .livefs import gen_obj
 
 
@@ -143,7 +150,7 @@ def copyfile(obj, mkdirs=False):
         fp = existent_fp = obj.location + "#new"
 
     if fs.isreg(obj):
-        obj.data.transfer_to_path(fp)
+        transfer_file(obj.data, fp)
     elif fs.issym(obj):
         os.symlink(obj.target, fp)
     elif fs.isfifo(obj):
@@ -162,6 +169,68 @@ def copyfile(obj, mkdirs=False):
         os.rename(existent_fp, obj.location)
     return True
 
+# ioctl cloning a file (reflink), btrfs, xfs, ...
+_FICLONE = 0x40049409
+
+
+def transfer_file(data, path):
+    """Copy a data source to path, in kernel when the data source is a local file.
+
+    A reflink (FICLONE) is tried first, then :func:`os.copy_file_range`, then :func:`os.sendfile`,
+    data sources which aren't local files go through :meth:`transfer_to_path`.
+    """
+    # bz2_source has a path too, but of the compressed file
+    if not isinstance(data, local_source):
+        data.transfer_to_path(path)
+        return
+    with open(data.path, 'rb') as fsrc, open(path, 'wb') as fdst:
+        _copy_fd(fsrc.fileno(), fdst.fileno())
+
+
+def _copy_fd(src_fd, dst_fd):
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return
+    except OSError:
+        # not supported by the filesystem, or across filesystems
+        pass
+
+    # procfs and sysfs files have a size of 0, they are only copied by reading them until EOF
+    size = os.fstat(src_fd).st_size
+    offset = 0
+    if size > 0:
+        for func in (_copy_file_range, _sendfile):
+            try:
+                while offset < size:
+                    n = func(src_fd, dst_fd, offset, size - offset)
+                    if n == 0:
+                        # some filesystems copy nothing instead of failing (FUSE, overlayfs, ...),
+                        # the next method goes on from offset
+                        break
+                    offset += n
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                                   errno.EOPNOTSUPP, errno.ENOTSUP):
+                    raise
+            if offset == size:
+                return
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    with open(src_fd, 'rb', closefd=False) as fsrc, open(dst_fd, 'wb', closefd=False) as fdst:
+        shutil.copyfileobj(fsrc, fdst)
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    if not hasattr(os, 'copy_file_range'):
+        raise OSError(errno.ENOSYS, 'copy_file_range is not available')
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
 def do_link(src, trg):
     try:
         os.link(src.location, trg.location)
@@ -197,16 +266,20 @@ def do_link(src, trg):
     return True
 
 
-def merge_contents(cset, offset=None, callback=None):
+def merge_contents(cset, offset=None, callback=None, jobs=None):
 
     """
     merge a :class:`pkgcore.fs.contents.ContentsSet` instance to the livefs
 
+    Directories are created first, then regular files are copied by a pool of
+    threads; callback is still called from the calling thread, in order.
+
     :param cset: :class:`pkgcore.fs.contents.ContentsSet` instance
     :param offset: if not None, offset to prefix all locations with.
         Think of it as target dir.
     :param callback: callable to report each entry being merged; given a single arg,
         the fs object being merged.
+    :param jobs: number of threads copying regular files, defaults to the number of cpus
     :raise EnvironmentError: Thrown for permission failures.
     """
 
@@ -251,54 +324,82 @@ def merge_contents(cset, offset=None, callback=None):
             ensure_perms(x)
     del d
 
-    # might look odd, but what this does is minimize the try/except cost
-    # to one time, assuming everything behaves, rather then per item.
-    i = iterate(cset.iterdirs(invert=True))
     merged_inodes = {}
-    while True:
-        try:
-            for x in i:
-                callback(x)
-
-                if x.is_reg:
-                    key = (x.dev, x.inode)
-                    # This logic could be made smarter- instead of
-                    # blindly trying candidates, we could inspect the st_dev
-                    # of the final location.  This however can be broken by
-                    # overlayfs's potentially.  Brute force is in use either
-                    # way.
-                    candidates = merged_inodes.setdefault(key, [])
-                    if any(target._can_be_hardlinked(x) and do_link(target, x)
-                            for target in candidates):
-                        continue
-                    candidates.append(x)
-
-                copyfile(x, mkdirs=True)
+    futures = []
+    with ThreadPoolExecutor(max_workers=(jobs if jobs else os.cpu_count())) as pool:
+        for x in iterate(cset.iterdirs(invert=True)):
+            callback(x)
 
-            break
-        except CannotOverwrite as cf:
-            if not fs.issym(x):
-                raise
+            if x.is_reg:
+                key = (x.dev, x.inode)
+                # This logic could be made smarter- instead of
+                # blindly trying candidates, we could inspect the st_dev
+                # of the final location.  This however can be broken by
+                # overlayfs's potentially.  Brute force is in use either
+                # way.
+                # a candidate must be completely copied before linking to it.
+                candidates = merged_inodes.setdefault(key, [])
+                if any(target._can_be_hardlinked(x) and future.result() and do_link(target, x)
+                        for target, future in candidates):
+                    continue
+                future = pool.submit(copyfile, x, mkdirs=True)
+                candidates.append((x, future))
+                futures.append(future)
+                continue
 
-            # by this time, all directories should've been merged.
-            # thus we can check the target
             try:
-                if not fs.isdir(gen_obj(pjoin(x.location, x.target))):
+                copyfile(x, mkdirs=True)
+            except CannotOverwrite as cf:
+                if not fs.issym(x):
                     raise
-            except OSError:
-                raise cf
+
+                # by this time, all directories should've been merged.
+                # thus we can check the target
+                try:
+                    if not fs.isdir(gen_obj(pjoin(x.location, x.target))):
+                        raise cf
+                except OSError:
+                    raise cf
+
+        # raise the first error of the copies
+        for future in futures:
+            future.result()
     return True
 
 
-def unmerge_contents(cset, offset=None, callback=None):
+class UnmergeSummary:
+    """what :func:`unmerge_contents` did, given to its summary_callback once it's done"""
+
+    def __init__(self):
+        self.files = 0
+        self.missing = 0
+        self.dirs = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        return (f'removed {self.files} files ({self.missing} already missing) '
+                f'and {self.dirs} directories in {self.elapsed:.2f}s')
+
+
+# number of entries of a directory unlinked by a single job
+_UNLINK_BATCH = 256
+
+
+def unmerge_contents(cset, offset=None, callback=None, jobs=None, summary_callback=None):
 
     """
     unmerge a :obj:`pkgcore.fs.contents.ContentsSet` instance to the livefs
 
+    Non directories are unlinked by a pool of threads, in batches of entries
+    of the same directory.  Then only the directories which may have been
+    emptied are removed, deepest first.
+
     :param cset: :obj:`pkgcore.fs.contents.ContentsSet` instance
     :param offset: if not None, offset to prefix all locations with.
         Think of it as target dir.
     :param callback: callable to report each entry being unmerged
+    :param jobs: number of threads unlinking files, defaults to the number of cpus
+    :param summary_callback: if not None, called once done with an :class:`UnmergeSummary`
     :return: True, or an exception is thrown on failure
         (OSError, although see copyfile for specifics).
     :raise EnvironmentError: see :func:`copyfile` and :func:`mkdir`
@@ -311,20 +412,80 @@ def unmerge_contents(cset, offset=None, callback=None):
     if offset is not None:
         iterate = partial(contents.offset_rewriter, offset.rstrip(os.path.sep))
 
-    for x in iterate(cset.iterdirs(invert=True)):
-        callback(x)
-        unlink_if_exists(x.location)
+    summary = UnmergeSummary()
+    start = time.monotonic()
 
-    # this is a fair sight faster then using sorted/reversed
-    l = list(iterate(cset.iterdirs()))
-    l.sort(reverse=True)
-    for x in l:
-        try:
-            os.rmdir(x.location)
-        except OSError as e:
-            if not e.errno in (errno.ENOTEMPTY, errno.ENOENT, errno.ENOTDIR,
-                               errno.EBUSY, errno.EEXIST):
-                raise
-        else:
+    batches = {}
+    futures = []
+    with ThreadPoolExecutor(max_workers=(jobs if jobs else os.cpu_count())) as pool:
+        for x in iterate(cset.iterdirs(invert=True)):
             callback(x)
+            parent, name = os.path.split(x.location)
+            names = batches.setdefault(parent, [])
+            names.append(name)
+            if len(names) >= _UNLINK_BATCH:
+                futures.append(pool.submit(_unlink_batch, parent, names))
+                batches[parent] = []
+        for parent, names in batches.items():
+            if names:
+                futures.append(pool.submit(_unlink_batch, parent, names))
+
+        for future in futures:
+            removed, missing = future.result()
+            summary.files += removed
+            summary.missing += missing
+
+    dirs = {x.location: x for x in iterate(cset.iterdirs())}
+
+    # candidates are the directories files were removed from, and the ones
+    # without any sub directory in cset; parents are added as they're emptied
+    trie = _PathTrie(dirs, dirs.__contains__)
+    parents = trie.directories()
+    by_depth = defaultdict(set)
+    for path in dirs:
+        if path in batches or path not in parents:
+            by_depth[path.count(os.path.sep)].add(path)
+
+    while by_depth:
+        depth = max(by_depth)
+        for path in sorted(by_depth.pop(depth), reverse=True):
+            try:
+                os.rmdir(path)
+            except FileNotFoundError:
+                # already gone, its parent may have been emptied all the same
+                pass
+            except OSError as e:
+                if not e.errno in (errno.ENOTEMPTY, errno.ENOTDIR,
+                                   errno.EBUSY, errno.EEXIST):
+                    raise
+                continue
+            else:
+                callback(dirs[path])
+                summary.dirs += 1
+            parent = os.path.dirname(path)
+            if parent in dirs:
+                by_depth[depth - 1].add(parent)
+
+    summary.elapsed = time.monotonic() - start
+    if summary_callback is not None:
+        summary_callback(summary)
     return True
+
+
+def _unlink_batch(dirpath, names):
+    """unlink names in dirpath, returns the number of removed and missing entries"""
+    try:
+        fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+    except (FileNotFoundError, NotADirectoryError):
+        return 0, len(names)
+    removed = 0
+    try:
+        for name in names:
+            try:
+                os.unlink(name, dir_fd=fd)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    finally:
+        os.close(fd)
+    return removed, len(names) - removed
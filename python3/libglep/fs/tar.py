@@ -5,18 +5,22 @@ binpkg tar utilities
 import os
 import stat
 from functools import partial
-from itertools import count
+from itertools import chain, count
+from operator import attrgetter
 
 from snakeoil import compression
-from snakeoil.compatibility import cmp, sorted_cmp
 from snakeoil.data_source import invokable_data_source
+from snakeoil.osutils import pjoin
 from snakeoil.tar import tarfile
 
-from . import contents
+from . import _compress, _decompress, contents
 from .fs import fsDev, fsDir, fsFifo, fsFile, fsSymlink
 
 _unique_inode = count(2**32).__next__
 
+# same as the kernel's limit of symlinks followed while resolving a path
+_MAX_SYMLINK_HOPS = 40
+
 known_compressors = {
     "bz2": tarfile.TarFile.bz2open,
     "gz": tarfile.TarFile.gzopen,
@@ -39,6 +43,29 @@ def write_set(contents_set, filepath, compressor='bzip2', absolute_paths=False,
             tar_handle.close()
         handle.close()
 
+def write_binpkg(contents_set, filepath, compressor='zstd', level=None,
+                 chksum_types=('size', 'sha512', 'blake2b'), absolute_paths=False):
+    """
+    write a contentset to a compressed tarball, streaming
+
+    The tar stream is piped to a compressor process, multi-threaded where the
+    binary allows it, and the compressed output is checksummed as it is written.
+
+    :param compressor: see :obj:`_compress.known_compressors`
+    :param level: compression level, defaults to the one of the compressor
+    :param chksum_types: chksums to compute of the written file
+    :return: dict of chksum type -> value of the written file
+    """
+    with _compress.CompressedWriter(filepath, compressor, level, chksum_types) as handle:
+        tar_handle = tarfile.open(name=filepath, fileobj=handle, mode='w|',
+            bufsize=_compress._BLOCKSIZE)
+        try:
+            add_contents_to_tarfile(contents_set, tar_handle, absolute_paths)
+        finally:
+            tar_handle.close()
+    return handle.chksums
+
+
 def add_contents_to_tarfile(contents_set, tar_fd, absolute_paths=False):
     # first add directories, then everything else
     # this is just a pkgcore optimization, it prefers to see the dirs first.
@@ -154,89 +181,131 @@ def generate_contents(filepath, compressor="bz2", parallelize=True):
     """
     generate a contentset from a tarball
 
+    The tarball is decompressed by an external process, multi-threaded where
+    the binary allows it (lbzip2, pbzip2, xz -T0, zstd -T0), and read as it is
+    decompressed; no temporary file is involved.
+
     :param filepath: string path to location on disk
     :param compressor: defaults to bz2; decompressor to use, see
-        :obj:`known_compressors` for list of valid compressors
+        :obj:`_decompress.known_decompressors` for list of valid compressors,
+        None to detect it from the file, or to read an uncompressed tarball
     """
 
-    if compressor == 'bz2':
-        compressor = 'bzip2'
+    if compressor is None:
+        compressor = _decompress.detect_compressor(filepath)
 
     tar_handle = None
-    handle = compression.decompress_handle(compressor, filepath,
-        parallelize=parallelize)
+    if compressor is None:
+        handle = open(filepath, 'rb')
+    else:
+        handle = _decompress.decompress_handle(compressor, filepath,
+            parallelize=parallelize)
 
     try:
         tar_handle = tarfile.TarFile(name=filepath, fileobj=handle, mode='r')
     except tarfile.ReadError as e:
-        if not e.message.endswith("empty header"):
+        if not str(e).endswith("empty header"):
             raise
         tar_handle = []
     return convert_archive(tar_handle)
 
 
 def convert_archive(archive):
+    """
+    convert a tar archive to an :obj:`OrderedContentsSet`
+
+    Entries below symlinked directories of the archive are moved to the
+    resolved location, directories come first, then symlinks, fifos and
+    devices, then regular files in archive order.
+    """
     # regarding the usage of del in this function... bear in mind these sets
     # could easily have 10k -> 100k entries in extreme cases; thus the del
     # usage, explicitly trying to ensure we don't keep refs long term.
 
-    # this one is a bit fun.
-    raw = list(archive_to_fsobj(archive))
-    # we use the data source as the unique key to get position.
-    files_ordering = list(enumerate(x for x in raw if x.is_reg))
-    files_ordering = {x.data: idx for idx, x in files_ordering}
-    t = contents.ContentsSet(raw, mutable=True)
-    del raw, archive
-
-    # first rewrite affected syms.
-    raw_syms = t.links()
-    syms = contents.ContentsSet(raw_syms)
-    while True:
-        for x in sorted(syms):
-            affected = syms.child_nodes(x.location)
-            if not affected:
-                continue
-            syms.difference_update(affected)
-            syms.update(affected.change_offset(x.location, x.resolved_target))
-            del affected
-            break
+    # a single pass over the archive; symlinks are kept aside since one can
+    # show up after the entries below it.
+    entries = []
+    syms = []
+    for x in archive_to_fsobj(archive):
+        if x.is_sym:
+            syms.append(x)
         else:
-            break
+            entries.append(x)
+    del archive
+
+    resolve = _prefix_resolver(_resolve_symlinks(syms))
+
+    def relocate(iterable):
+        for x in iterable:
+            dirname = x.dirname
+            resolved = resolve(dirname)
+            if resolved != dirname:
+                x = x.change_attributes(location=pjoin(resolved, x.basename))
+            yield x
 
-    t.difference_update(raw_syms)
-    t.update(syms)
-
-    del raw_syms
-    syms = sorted(syms, reverse=True)
-    # ok, syms are correct.  now we get the rest.
-    # we shift the readds into a separate list so that we don't reinspect
-    # them on later runs; this slightly reduces the working set.
-    additions = []
-    for x in syms:
-        affected = t.child_nodes(x.location)
-        if not affected:
-            continue
-        t.difference_update(affected)
-        additions.extend(affected.change_offset(x.location, x.resolved_target))
-
-    t.update(additions)
+    t = contents.ContentsSet(relocate(entries), mutable=True)
+    del entries
+    t.update(relocate(syms))
+    del syms
     t.add_missing_directories()
 
-    # finally... an insane sort.
-    def sort_func(x, y):
-        if x.is_dir:
-            if not y.is_dir:
-                return -1
-            return cmp(x, y)
-        elif y.is_dir:
-            return +1
-        elif x.is_reg:
-            if y.is_reg:
-                return cmp(files_ordering[x.data],
-                    files_ordering[y.data])
-            return +1
-        elif y.is_reg:
-            return -1
-        return cmp(x, y)
-
-    return contents.OrderedContentsSet(sorted_cmp(t, sort_func), mutable=False)
+    location = attrgetter("location")
+    dirs = sorted(t.iterdirs(), key=location)
+    others = sorted((x for x in t if not x.is_dir and not x.is_reg), key=location)
+    # insertion order of the set is the order of the archive
+    files = [x for x in t if x.is_reg]
+    del t
+    return contents.OrderedContentsSet(chain(dirs, others, files), mutable=False)
+
+
+def _resolve_symlinks(syms):
+    """
+    returns a dict of location -> resolved target of syms, with the locations
+    resolved through the symlinked directories of syms
+    """
+    links = {}
+    # a symlink can be below another symlinked directory, iterate until the
+    # locations are stable
+    for _ in range(_MAX_SYMLINK_HOPS):
+        resolve = _prefix_resolver(links)
+        new_links = {}
+        for x in syms:
+            loc = pjoin(resolve(x.dirname), x.basename)
+            new_links[loc] = os.path.normpath(pjoin(os.path.dirname(loc), x.target))
+        if new_links == links:
+            break
+        links = new_links
+    return links
+
+
+def _prefix_resolver(links):
+    """
+    returns a function resolving a directory through the symlinked
+    directories of links, a dict of location -> resolved target
+    """
+    cache = {}
+    active = set()
+
+    def resolve(path):
+        ret = cache.get(path)
+        if ret is not None:
+            return ret
+        parent = os.path.dirname(path)
+        if parent == path or path in active:
+            # root, or a symlink loop
+            return path
+        active.add(path)
+        try:
+            ret = pjoin(resolve(parent), os.path.basename(path))
+            for _ in range(_MAX_SYMLINK_HOPS):
+                target = links.get(ret)
+                if target is None:
+                    break
+                # the target can be below symlinked directories as well
+                ret = pjoin(resolve(os.path.dirname(target)), os.path.basename(target))
+        finally:
+            active.discard(path)
+        cache[path] = ret
+        return ret
+
+    return resolve
@@ -1,3 +1,5 @@
 #!/usr/bin/env python3
 
 from ._repo import Repo
+from ._index import RepoIndex
+from ._inherit_index import InheritIndex
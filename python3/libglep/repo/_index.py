@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import os
+import bisect
+from ..core.pkg._cp import CP
+from ..core.pkg._cpv import package_version_key, package_version_glob_match
+
+
+class RepoIndex:
+    """Index of the packages of a repository, for matching atoms against them.
+
+    For every CP the CPVs are kept sorted by version key, so that matching an atom is a hash
+    lookup followed by a bisection on the version range of its operator, with no linear scan.
+    CPs are indexed lazily, on first query, from Repo.query_CPVs().
+
+    Only the package part of an atom is matched (category, package, version, slot, subslot and
+    repository), use dependencies and blockers are not evaluated.
+    """
+
+    def __init__(self, repo, slot_getter=None):
+        """
+        :param repo: Repo object
+        :keyword slot_getter: function returning (slot, subslot) of a CPV, subslot may be None.
+            Atoms with slot or subslot restrictions can only be matched if it is given.
+        """
+
+        self._repo = repo
+        self._slot_getter = slot_getter
+        self._entries = dict()      # (category, package) -> _IndexEntry or None
+
+    def match(self, atom):
+        """Returns a tuple of the CPVs matching atom, sorted from the lowest version to the highest."""
+
+        entry = self._get_entry(atom)
+        if entry is None:
+            return ()
+
+        if atom.op is None:
+            idx_list = range(0, len(entry.cpvs))
+        elif atom.post_wildcard:
+            # "=1.2*" matches versions whose string begins with "1.2", they are contiguous in string order,
+            # the ones where "1.2" doesn't end on a component boundary (1.20) are filtered out
+            prefix = atom.ver if atom.rev is None else f"{atom.ver}-{atom.rev}"
+            lo = bisect.bisect_left(entry.fullvers, prefix)
+            hi = bisect.bisect_left(entry.fullvers, prefix + "\uffff", lo)
+            idx_list = sorted([entry.fullver_idx[i] for i in range(lo, hi)
+                               if package_version_glob_match(prefix, entry.fullvers[i])])
+        else:
+            idx_list = range(*_bisect_range(entry.keys, atom.op, package_version_key(atom.ver, atom.rev)))
+
+        if atom.subslot is not None:
+            return tuple([entry.cpvs[i] for i in idx_list if entry.subslots[i] == atom.subslot])
+        else:
+            return tuple([entry.cpvs[i] for i in idx_list])
+
+    def best_match(self, atom):
+        """Returns the highest CPV matching atom, or None."""
+
+        entry = self._get_entry(atom)
+        if entry is None:
+            return None
+
+        if atom.op is None:
+            lo, hi = 0, len(entry.cpvs)
+        elif atom.post_wildcard or atom.subslot is not None:
+            ret = self.match(atom)
+            return ret[-1] if len(ret) > 0 else None
+        else:
+            lo, hi = _bisect_range(entry.keys, atom.op, package_version_key(atom.ver, atom.rev))
+        return entry.cpvs[hi - 1] if hi > lo else None
+
+    def clear(self):
+        """Drop all the indexed CPs, they are indexed again on next query."""
+        self._entries.clear()
+
+    def _get_entry(self, atom):
+        if atom.repo_id is not None and atom.repo_id != self._repo.repo_name:
+            return None
+        if (atom.slot is not None or atom.subslot is not None) and self._slot_getter is None:
+            raise ValueError(f"slot_getter is needed to match slot restricted atom {atom}")
+
+        key = (atom.category, atom.package)
+        try:
+            entry = self._entries[key]
+        except KeyError:
+            entry = None
+            if os.path.isdir(os.path.join(self._repo.location, atom.category, atom.package)):
+                entry = _new_index_entry(self._repo.query_CPVs(CP(atom.category, atom.package)), self._slot_getter)
+            self._entries[key] = entry
+
+        if entry is not None and atom.slot is not None:
+            entry = entry.slot_entries.get(atom.slot)
+        return entry
+
+
+class _IndexEntry:
+
+    def __init__(self, cpvs, slots, subslots):
+        # columns, sorted by version key
+        order = sorted(range(0, len(cpvs)), key=lambda i: cpvs[i].version_key)
+        self.cpvs = [cpvs[i] for i in order]
+        self.keys = [x.version_key for x in self.cpvs]
+        self.slots = [slots[i] for i in order]
+        self.subslots = [subslots[i] for i in order]
+
+        # version strings sorted as strings, with their position in the columns, for "=*" matching
+        fullvers = sorted((x.fullver, i) for i, x in enumerate(self.cpvs))
+        self.fullvers = [x[0] for x in fullvers]
+        self.fullver_idx = [x[1] for x in fullvers]
+
+        self.slot_entries = None
+
+
+def _new_index_entry(cpvs, slot_getter):
+    if slot_getter is None:
+        return _IndexEntry(cpvs, [None] * len(cpvs), [None] * len(cpvs))
+
+    slots = [slot_getter(x) for x in cpvs]
+    ret = _IndexEntry(cpvs, [x[0] for x in slots], [x[1] for x in slots])
+
+    # one sub-entry per slot, so that slot restricted atoms are bisected too
+    ret.slot_entries = dict()
+    for slot in set(ret.slots):
+        idx_list = [i for i, x in enumerate(ret.slots) if x == slot]
+        ret.slot_entries[slot] = _IndexEntry([ret.cpvs[i] for i in idx_list],
+                                             [slot] * len(idx_list),
+                                             [ret.subslots[i] for i in idx_list])
+    return ret
+
+
+def _bisect_range(keys, op, key):
+    # returns the (lo, hi) index range of the versions matching "<op><version>"
+    if op == "=":
+        lo = bisect.bisect_left(keys, key)
+        return (lo, bisect.bisect_right(keys, key, lo))
+    elif op == "~":
+        # any revision of the version, the key without revision sorts before all of them
+        base = key[:3]
+        lo = bisect.bisect_left(keys, base)
+        return (lo, bisect.bisect_left(keys, base + (float("inf"),), lo))
+    elif op == "<":
+        return (0, bisect.bisect_left(keys, key))
+    elif op == "<=":
+        return (0, bisect.bisect_right(keys, key))
+    elif op == ">":
+        return (bisect.bisect_right(keys, key), len(keys))
+    elif op == ">=":
+        return (bisect.bisect_left(keys, key), len(keys))
+    else:
+        assert False
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import os
+import json
+from ..core.pkg._cpv import CPV
+
+
+class InheritIndex:
+    """Reverse index from eclass name to the CPVs inheriting it, built from the _eclasses_ values of metadata/md5-cache.
+
+    The index is saved to index_file, which should be outside of the repository (a cache directory) so that
+    it doesn't show up in VCS checkouts, and loaded from it next time. update() only rescans the md5-cache
+    categories whose directory mtime changed since the index was saved, cache writers replace entries
+    atomically so that any change to a category changes its mtime. set_inherited() and remove() update
+    single CPVs, for callers which regenerate cache entries themselves.
+    """
+
+    VERSION = 1
+
+    def __init__(self, location, index_file=None):
+        """
+        :param location: on disk location of the repository
+        :keyword index_file: file the index is saved to, no persistence if None
+        """
+
+        self._cache_dir = os.path.join(location, "metadata", "md5-cache")
+        self._index_file = index_file
+        self._categories = dict()           # category -> [mtime_ns, {pf: [eclass, ...]}]
+        self._reverse = dict()              # eclass -> set of "category/pf"
+        self._dirty = False
+
+        if index_file is not None:
+            try:
+                with open(index_file) as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    self._categories = data["categories"]
+            except (OSError, ValueError, KeyError):
+                pass
+        for category, (mtime, pf_dict) in self._categories.items():
+            for pf, eclasses in pf_dict.items():
+                self._add_reverse(category + "/" + pf, eclasses)
+
+        self.update()
+
+    def get(self, eclass):
+        """Returns a frozenset of the CPVs inheriting eclass, directly or indirectly."""
+        return frozenset([CPV(x) for x in self._reverse.get(eclass, ())])
+
+    def get_eclasses(self, cpv):
+        """Returns the names of the eclasses inherited by cpv, an empty tuple if it's not indexed."""
+        pf_dict = self._categories.get(cpv.category, [None, {}])[1]
+        return tuple(pf_dict.get(cpv.package + "-" + cpv.fullver, ()))
+
+    def update(self):
+        """Rescan the md5-cache categories which changed since they were indexed, and save the index if needed."""
+
+        try:
+            with os.scandir(self._cache_dir) as it:
+                current = {x.name: x.stat().st_mtime_ns for x in it if x.is_dir()}
+        except FileNotFoundError:
+            current = dict()
+
+        for category in list(self._categories):
+            if category not in current:
+                self._remove_category(category)
+        for category, mtime in current.items():
+            if category not in self._categories or self._categories[category][0] != mtime:
+                self._remove_category(category)
+                self._scan_category(category, mtime)
+
+        self.save()
+
+    def set_inherited(self, cpv, eclasses):
+        category, pf = cpv.category, cpv.package + "-" + cpv.fullver
+        self._remove_cpv(category, pf)
+        self._categories.setdefault(category, [None, {}])[1][pf] = list(eclasses)
+        self._categories[category][0] = None            # rescan on next update(), the cache entry may not be written yet
+        self._add_reverse(category + "/" + pf, eclasses)
+        self._dirty = True
+
+    def remove(self, cpv):
+        self._remove_cpv(cpv.category, cpv.package + "-" + cpv.fullver)
+        self._dirty = True
+
+    def save(self):
+        if self._index_file is None or not self._dirty:
+            return
+        data = {
+            "version": self.VERSION,
+            "categories": self._categories,
+        }
+        try:
+            os.makedirs(os.path.dirname(self._index_file), exist_ok=True)
+            with open(self._index_file + ".tmp", "w") as f:
+                json.dump(data, f)
+            os.replace(self._index_file + ".tmp", self._index_file)
+        except OSError:
+            # not writable (permissions, read-only filesystem, ...), the index is only kept in memory
+            return
+        self._dirty = False
+
+    def _scan_category(self, category, mtime):
+        pf_dict = dict()
+        with os.scandir(os.path.join(self._cache_dir, category)) as it:
+            for dirent in it:
+                if not dirent.is_file():
+                    continue
+                eclasses = []
+                with open(dirent.path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.startswith("_eclasses_="):
+                            eclasses = line[len("_eclasses_="):].split()[0::2]
+                            break
+                pf_dict[dirent.name] = eclasses
+                self._add_reverse(category + "/" + dirent.name, eclasses)
+        self._categories[category] = [mtime, pf_dict]
+        self._dirty = True
+
+    def _remove_category(self, category):
+        if category not in self._categories:
+            return
+        for pf in list(self._categories[category][1]):
+            self._remove_cpv(category, pf)
+        del self._categories[category]
+        self._dirty = True
+
+    def _remove_cpv(self, category, pf):
+        pf_dict = self._categories.get(category, [None, {}])[1]
+        for eclass in pf_dict.pop(pf, ()):
+            s = self._reverse.get(eclass)
+            if s is not None:
+                s.discard(category + "/" + pf)
+                if len(s) == 0:
+                    del self._reverse[eclass]
+
+    def _add_reverse(self, cpv_str, eclasses):
+        for eclass in eclasses:
+            self._reverse.setdefault(eclass, set()).add(cpv_str)
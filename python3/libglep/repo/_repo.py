@@ -15,7 +15,8 @@ from snakeoil.bash import read_dict
 from snakeoil.data_source import local_source
 from snakeoil.osutils import access, listdir_dirs, listdir_files, pjoin
 from snakeoil.mappings import ImmutableDict
-from .metadata import LayoutConf
+from .metadata import LayoutConf, Md5Cache
+from ._inherit_index import InheritIndex
 from ... import CP, CPV
 
 
@@ -104,13 +105,18 @@ def property_file_parse(prefix, *paths):
 class Repo:
     """Raw implementation supporting standard ebuild tree."""
 
-    def __init__(self, location):
+    extension = "ebuild"
+
+    def __init__(self, location, cache_location=None):
         """
         :param location: on disk location of the tree
+        :keyword cache_location: directory where data derived from the tree (like the inherit index) is
+            saved, nothing is saved if None
         """
         sf = object.__setattr__
 
         sf(self, "location", location)
+        sf(self, "cache_location", cache_location)
 
         fobj = LayoutConf(_two_path(self, "metadata", "layout.conf")[1])
         sf(self, 'repo_name', fobj.repo_name)
@@ -143,6 +149,23 @@ class Repo:
             pass
         return ImmutableDict(mirrors)
 
+    @klass.jit_attr
+    def md5_cache(self):
+        """Md5Cache object reading metadata/md5-cache, None if the repo uses another cache format."""
+        if self.cache_format != "md5-dict":
+            return None
+        return Md5Cache(self.location)
+
+    @klass.jit_attr
+    def inherit_index(self):
+        """InheritIndex object answering which CPVs inherit an eclass, None if the repo uses another cache format."""
+        if self.cache_format != "md5-dict":
+            return None
+        index_file = None
+        if self.cache_location is not None:
+            index_file = pjoin(self.cache_location, "inherit-index")
+        return InheritIndex(self.location, index_file)
+
     @klass.jit_attr
     @property_file_read_lines("profiles", "arch.list")
     def arches(self, property_filename, lines):
@@ -266,10 +289,10 @@ class Repo:
 
     def query_CPVs(self, cp_obj=None):                                  # FIXME: should have more advanced query parameter
         cpv_pattern = pjoin(self.location, cp_obj.category, cp_obj.package, f"*.{self.extension}")
-        ret = glob.glob(cpv_pattern)                                                            # list all ebuild files
-        assert all(x.startswith(cp_obj.package) for x in ret)
-        ret = [x[len(cp_obj.package):len(self.extension)*-1] for x in ret]
-        return tuple([CPV(cp_obj.category, cp_obj.package, x, _do_check=False) for x in ret])       # FIXME: why convert to tuple? for performance? for read-only?
+        ret = [os.path.basename(x) for x in glob.glob(cpv_pattern)]                             # list all ebuild files
+        assert all(x.startswith(cp_obj.package + "-") for x in ret)
+        ret = [x[:(len(self.extension) + 1) * -1] for x in ret]
+        return tuple([CPV(f"{cp_obj.category}/{x}") for x in ret])                              # FIXME: why convert to tuple? for performance? for read-only?
 
     def get_package_dirpath(self, cp_obj):
         return pjoin(self.location, cp_obj.category, cp_obj.package)
@@ -2,6 +2,7 @@ from ._layout_conf import LayoutConf
 from ._manifests import Manifests
 from ._metadata_xml import MetaDataXML
 from ._known_profile import KnownProfile
+from ._md5_cache import Md5Cache, read_cache_file, pf_to_package
 from ._pkg_updates import XXX
 
 
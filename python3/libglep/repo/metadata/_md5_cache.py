@@ -0,0 +1,149 @@
+import os
+import hashlib
+from snakeoil.osutils import pjoin
+from snakeoil.mappings import ImmutableDict
+from ...core.pkg._cpv import CPV
+
+
+class Md5Cache:
+    """Reader of the md5-dict metadata cache of a repository (metadata/md5-cache).
+
+    Metadata of a package (DEPEND, RDEPEND, SLOT, KEYWORDS, IUSE, EAPI, ...) is read from its cache
+    file, no ebuild is sourced. Cache files are loaded lazily, a whole category at a time. An entry is
+    only served if the md5 of its ebuild and of every inherited eclass equal the _md5_ and _eclasses_
+    values stored in it, the checksums of the eclasses are computed once.
+    """
+
+    def __init__(self, location, eclass_dirs=None):
+        """
+        :param location: on disk location of the repository
+        :keyword eclass_dirs: eclass directories searched for inherited eclasses, in priority order,
+            defaults to the eclass directory of the repository
+        """
+
+        self.location = location
+        self._cache_dir = pjoin(location, "metadata", "md5-cache")
+        self._eclass_dirs = tuple(eclass_dirs) if eclass_dirs is not None else (pjoin(location, "eclass"),)
+        self._categories = dict()           # category -> {pf: ImmutableDict}
+        self._valid = dict()                # (category, pf) -> bool
+        self._eclass_md5 = dict()           # eclass name -> md5 hexdigest, or None if not found
+
+    def get(self, cpv, validate=True):
+        """Returns the cache entry of cpv as an ImmutableDict, or None if there is no cache entry or it is stale."""
+
+        entries = self._load_category(cpv.category)
+        pf = cpv.package + "-" + cpv.fullver
+        entry = entries.get(pf)
+        if entry is None:
+            return None
+        if validate and not self._is_valid(cpv.category, cpv.package, pf, entry):
+            return None
+        return entry
+
+    def is_valid(self, cpv):
+        pf = cpv.package + "-" + cpv.fullver
+        entry = self._load_category(cpv.category).get(pf)
+        if entry is None:
+            return False
+        return self._is_valid(cpv.category, cpv.package, pf, entry)
+
+    def iter_cpvs(self, category):
+        """Iterate over the CPVs which have a cache entry in category, stale entries included."""
+        for pf in self._load_category(category):
+            yield CPV(f"{category}/{pf}")
+
+    def clear(self):
+        """Drop everything loaded, cache files are read again on next query."""
+        self._categories.clear()
+        self._valid.clear()
+        self._eclass_md5.clear()
+
+    def _load_category(self, category):
+        try:
+            return self._categories[category]
+        except KeyError:
+            pass
+
+        entries = dict()
+        category_dir = pjoin(self._cache_dir, category)
+        try:
+            with os.scandir(category_dir) as it:
+                for dirent in it:
+                    if dirent.is_file():
+                        entries[dirent.name] = ImmutableDict(read_cache_file(dirent.path))
+        except FileNotFoundError:
+            pass
+        self._categories[category] = entries
+        return entries
+
+    def _is_valid(self, category, package, pf, entry):
+        key = (category, pf)
+        try:
+            return self._valid[key]
+        except KeyError:
+            pass
+
+        ret = False
+        if "_md5_" in entry:
+            try:
+                with open(pjoin(self.location, category, package, pf + ".ebuild"), "rb") as f:
+                    ret = (hashlib.md5(f.read()).hexdigest() == entry["_md5_"])
+            except FileNotFoundError:
+                pass
+        if ret:
+            eclasses = entry.get("_eclasses_", "").split()
+            if len(eclasses) % 2 != 0:
+                ret = False
+            else:
+                for i in range(0, len(eclasses), 2):
+                    if self._get_eclass_md5(eclasses[i]) != eclasses[i + 1]:
+                        ret = False
+                        break
+
+        self._valid[key] = ret
+        return ret
+
+    def _get_eclass_md5(self, name):
+        try:
+            return self._eclass_md5[name]
+        except KeyError:
+            pass
+
+        ret = None
+        for eclass_dir in self._eclass_dirs:
+            try:
+                with open(pjoin(eclass_dir, name + ".eclass"), "rb") as f:
+                    ret = hashlib.md5(f.read()).hexdigest()
+                    break
+            except FileNotFoundError:
+                pass
+        self._eclass_md5[name] = ret
+        return ret
+
+
+def read_cache_file(path):
+    """Returns the content of an md5-cache entry file as a dict of key -> value.
+
+    Raises FileNotFoundError if path doesn't exist.
+    """
+
+    d = dict()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            key, sep, value = line.rstrip("\n").partition("=")
+            if sep != "":
+                d[key] = value
+    return d
+
+
+def pf_to_package(pf):
+    """Returns the package name of a package-version-revision string, like the name of a cache entry file.
+
+    "foo-bar-1.0-r1" -> "foo-bar"
+    """
+
+    parts = pf.split("-")
+    if len(parts) > 2 and parts[-1].startswith("r") and parts[-1][1:].isdigit():
+        parts.pop()
+    parts.pop()
+    return "-".join(parts)
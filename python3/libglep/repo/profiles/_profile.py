@@ -4,7 +4,7 @@ from snakeoil import klass
 from snakeoil.osutils import abspath, pjoin
 from snakeoil.bash import iter_read_bash, read_bash_dict
 from snakeoil.sequences import split_negations, stable_unique
-from ...core._pkg_wildcard import PkgWildcard
+from ...core.pkg import PkgWildcard, parse_atoms
 
 
 def property_file_get_path(property_filename, eapi_optional=None):
@@ -347,18 +347,34 @@ class Profile(metaclass=klass.immutable_instance):
 
     def _parse_pkg_wildcard_negations(self, property_filename, iterable):
         """Parse files containing optionally negated package atoms."""
-        neg, pos = [], []
+        negated, strings, linenos, errs = [], [], [], []
         for line, lineno in iterable:
-            try:
-                if line[0] == '-':
-                    line = line[1:]
-                    if not line:
-                        self.__raiseProfilePropertyFileParseError("'-' negation without an atom")
-                    neg.append(PkgWildcard(line))
-                else:
-                    pos.append(PkgWildcard(line))
-            except errors.InvalidPkgWildcard as e:
-                self.__raiseProfilePropertyFileParseError("parsing error: {e}")
+            if line[0] == '-':
+                if len(line) == 1:
+                    errs.append((lineno, "'-' negation without an atom"))
+                    continue
+                negated.append(True)
+                strings.append(line[1:])
+            else:
+                negated.append(False)
+                strings.append(line)
+            linenos.append(lineno)
+
+        # parse the whole file in one call, so that all the invalid lines are reported together
+        parsed = parse_atoms(strings, wildcard=True)
+        for row, e in parsed.errors:
+            errs.append((linenos[row], f"parsing error: {e}"))
+        if errs:
+            errs.sort()
+            error_str = ", ".join("line %d: %s" % (lineno, err) for lineno, err in errs)
+            raise ProfilePropertyFileParseError(self, property_filename, error_str)
+
+        neg, pos = [], []
+        for is_negated, obj in zip(negated, parsed.objects()):
+            if is_negated:
+                neg.append(obj)
+            else:
+                pos.append(obj)
         return tuple(neg), tuple(pos)
 
     def _package_keywords_splitter(self, property_filename, line, lineno):
@@ -51,7 +51,7 @@ class VarTreePackageProperty(Enum):
     ENVIRONMENT = auto()
 
     FEATURES = auto()
-    IHERITED = auto()
+    INHERITED = auto()
     DEFINED_PHASES = auto()
     IUSE_EFFECTIVE = auto()
     USE = auto()
@@ -69,13 +69,13 @@ class VarTreePackageProperty(Enum):
 
 class VarTreeBase(ABC):
 
-    def cp_list(self, category=None):                                 # FIXME: should have more advanced query parameter
+    def cp_list(self, category=None):
         raise NotImplementedError()
 
-    def cpv_list(self, cp_obj=None):                                  # FIXME: should have more advanced query parameter
+    def cpv_list(self, cp_obj=None, atom=None):
         raise NotImplementedError()
 
-    def package_list(self, cpv_obj=None):
+    def package_list(self, cpv_obj=None, atom=None):
         raise NotImplementedError()
 
 
@@ -85,13 +85,13 @@ class VarTreeRwBase(ABC):
     def vartree(self):
         raise NotImplementedError()
 
-    def cp_list(self, category=None):                                 # FIXME: should have more advanced query parameter
+    def cp_list(self, category=None):
         raise NotImplementedError()
 
-    def cpv_list(self, cp_obj=None):                                  # FIXME: should have more advanced query parameter
+    def cpv_list(self, cp_obj=None, atom=None):
         raise NotImplementedError()
 
-    def package_list(self, cpv_obj=None):
+    def package_list(self, cpv_obj=None, atom=None):
         raise NotImplementedError()
 
     def add_package(self, cpv):
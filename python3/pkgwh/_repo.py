@@ -24,8 +24,12 @@
 import os
 import re
 import pathlib
+import subprocess
 import robust_layer.simple_git
 import robust_layer.simple_fops
+import libglep.repo
+from ._repo_cache import RepoCache, RepoCacheError
+from ._repo_regen import CacheRegenerator
 
 
 class Repo:
@@ -109,12 +113,13 @@ class Repo:
             robust_layer.simple_fops.mkdir(self.repo_dir)
             return
 
+        # changedFiles is the list of files changed by the sync, None means anything may have changed
         if self._syncInfo.name == RepoSyncInfo.RSYNC:
-            _RepoSyncRsync.sync(self)
+            changedFiles = _RepoSyncRsync.sync(self)
         elif self._syncInfo.name == RepoSyncInfo.GIT:
-            _RepoSyncGit.sync(self)
+            changedFiles = _RepoSyncGit.sync(self)
         elif self._syncInfo.name == RepoSyncInfo.SUBVERSION:
-            _RepoSyncSubversion.sync(self)
+            changedFiles = _RepoSyncSubversion.sync(self)
         else:
             assert False
 
@@ -131,13 +136,45 @@ class Repo:
             self.__patchRepoN(self._repoName)
             self.__patchRepoS(self._repoName)
             print("Done.")
+            if changedFiles is not None:
+                # the patches are applied to the work tree, they are local changes for git
+                patchedFiles = _RepoSyncGit.getLocalChanges(self.repo_dir)
+                changedFiles = changedFiles + patchedFiles if patchedFiles is not None else None
+
+        # only regenerate the cache entries affected by the sync
+        if changedFiles is None:
+            self.regenerate_metadata_cache()
+        else:
+            inheritIndex = libglep.repo.Repo(self.repo_dir, cache_location=_repoCacheDir(self._pkgwh, self._repoName)).inherit_index
+            CacheRegenerator(self.repo_dir, inherit_index=inheritIndex).regenerate_changed(changedFiles)
 
+    def regenerate_metadata_cache(self, jobs=None, progress_callback=None):
+        # regenerates the stale entries of metadata/md5-cache, returns the failed ones
+        assert self.exists_and_valid()
+        return CacheRegenerator(self.repo_dir, jobs=jobs).regenerate(progress_callback=progress_callback)
 
     def generate_cache(self):
-        pass
+        assert self.exists_and_valid()
+        RepoCache.generate(self.repo_dir, _repoCacheFile(self._pkgwh, self._repoName))
 
     def remove_cache(self):
-        pass
+        robust_layer.simple_fops.rm(_repoCacheFile(self._pkgwh, self._repoName))
+
+    def get_cache(self):
+        # returns None if the cache does not exist or is stale
+        assert self.exists_and_valid()
+
+        fn = _repoCacheFile(self._pkgwh, self._repoName)
+        if not os.path.exists(fn):
+            return None
+        try:
+            ret = RepoCache(fn)
+        except RepoCacheError:
+            return None
+        if ret.is_stale(self.repo_dir):
+            ret.close()
+            return None
+        return ret
 
     def _parse(self, buf):
         if not os.path.exists(self.repo_conf_file()):
@@ -272,13 +309,55 @@ class _RepoSyncRsync:
     def sync(repo):
         # we use "-rlptD" insead of "-a" so that the remote user/group is ignored
         robust_layer.rsync.exec("-rlptD", "-z", "-hhh", "--no-motd", "--delete", "--info=progress2", repo.sync_info.url, repo.repo_dir)
+        return None
 
 
 class _RepoSyncGit:
 
     @staticmethod
     def sync(repo):
+        # returns the files changed between the pre-sync and post-sync commits, None if they are unknown
+        # the files patched before the sync are included, the pull may have reverted them
+        oldCommit = _RepoSyncGit._getHeadCommit(repo.repo_dir)
+        oldPatchedFiles = _RepoSyncGit.getLocalChanges(repo.repo_dir)
         robust_layer.simple_git.pull(repo.repo_dir, reclone_on_failure=True, url=repo.sync_info.url)
+        newCommit = _RepoSyncGit._getHeadCommit(repo.repo_dir)
+
+        if oldCommit is None or newCommit is None or oldPatchedFiles is None:
+            return None
+        if oldCommit == newCommit:
+            return oldPatchedFiles
+        try:
+            out = subprocess.check_output(["git", "-C", repo.repo_dir, "diff", "--name-only", "--no-renames", oldCommit, newCommit],
+                                          universal_newlines=True, stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            # old commit is lost, the repository was re-cloned or force-pushed
+            return None
+        return [x for x in out.split("\n") if x != ""] + oldPatchedFiles
+
+    @staticmethod
+    def getLocalChanges(repoDir):
+        # returns the modified, deleted and untracked files of the work tree (the generated metadata excluded),
+        # None if they are unknown
+        if not os.path.exists(os.path.join(repoDir, ".git")):
+            return None
+        try:
+            out = subprocess.check_output(["git", "-C", repoDir, "status", "--porcelain", "-z", "--no-renames", "--untracked-files=all",
+                                           "--", ".", ":(exclude)metadata"],
+                                          universal_newlines=True, stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            return None
+        # entries are "XY <path>"
+        return [x[3:] for x in out.split("\0") if x != ""]
+
+    @staticmethod
+    def _getHeadCommit(repoDir):
+        if not os.path.exists(os.path.join(repoDir, ".git")):
+            return None
+        try:
+            return subprocess.check_output(["git", "-C", repoDir, "rev-parse", "HEAD"], universal_newlines=True, stderr=subprocess.DEVNULL).strip()
+        except subprocess.CalledProcessError:
+            return None
 
 
 class _RepoSyncSubversion:
@@ -302,6 +381,16 @@ def _repoDir(pkgwh, repoName):
     return os.path.join(pkgwh.config.data_repo_dir, "%s" % (repoName))
 
 
+def _repoCacheFile(pkgwh, repoName):
+    # returns /var/cache/portage/repos/XXXX.cache
+    return os.path.join(pkgwh.config.cache_repo_dir, "%s.cache" % (repoName))
+
+
+def _repoCacheDir(pkgwh, repoName):
+    # returns /var/cache/portage/repos/XXXX, for the other data derived from the repository
+    return os.path.join(pkgwh.config.cache_repo_dir, "%s" % (repoName))
+
+
 def _generateCfgReposFileContent(pkgwh, repoName, priority, innerRepoName, syncInfo, hideList, unhideList, patchDirList):
     buf = ""
 
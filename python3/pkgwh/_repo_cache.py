@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2005-2014 Fpemud <fpemud@sina.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import mmap
+import struct
+import subprocess
+from libglep.repo.metadata import read_cache_file, pf_to_package
+
+
+class RepoCache:
+
+    """
+    Snapshot of the metadata of all the packages of a repository, in one binary file.
+
+    The file is memory-mapped and lookups only decode what they need, it is never parsed as a whole.
+    Layout (all integers are little-endian uint32):
+        header:     magic, version, stamp string, number of keys, number of CPs, number of CPVs, table offsets
+        key table:  one string reference per metadata key (DEPEND, RDEPEND, SLOT, ...)
+        cp table:   (cp string reference, index of first CPV, number of CPVs), sorted by cp
+        cpv table:  (pf string reference, one value string reference per key)
+        strings:    utf-8 bytes of all the strings, a string reference is (offset, length) into it
+
+    The stamp is "mtime:<newest md5-cache directory mtime>", prefixed with "git:<HEAD commit id>:" for git
+    repositories, a snapshot whose stamp differs from the one of the repository is stale.
+    """
+
+    MAGIC = b"PKGWHRC\0"
+    VERSION = 1
+
+    def __init__(self, path):
+        self._path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, stampRef, keyCount, cpCount, cpvCount, keyOff, cpOff, cpvOff, strOff = _header.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self._mm.close()
+            raise RepoCacheError("invalid repository cache file %s" % (path))
+
+        self._cpCount = cpCount
+        self._cpvCount = cpvCount
+        self._cpOff = cpOff
+        self._cpvOff = cpvOff
+        self._strOff = strOff
+        self._cpvRecord = struct.Struct("<%dI" % (2 + 2 * keyCount))
+
+        self.stamp = self._str(*_u32x2.unpack_from(self._mm, stampRef))
+        self.keys = tuple([self._str(*_u32x2.unpack_from(self._mm, keyOff + i * _u32x2.size)) for i in range(0, keyCount)])
+
+    def close(self):
+        self._mm.close()
+
+    def is_stale(self, repo_dir):
+        return self.stamp != get_repo_stamp(repo_dir)
+
+    def get_pfs(self, cp):
+        """Returns the package-version(-revision) strings of cp, an empty list if cp is not in the snapshot."""
+
+        i = self._findCp(cp)
+        if i is None:
+            return []
+        cpvStart, cpvCount = _cpRecord.unpack_from(self._mm, self._cpOff + i * _cpRecord.size)[2:]
+        return [self._str(*self._cpvRecord.unpack_from(self._mm, self._cpvOff + j * self._cpvRecord.size)[:2])
+                for j in range(cpvStart, cpvStart + cpvCount)]
+
+    def get_metadata(self, cp, pf):
+        """Returns the metadata of package cp, version pf as a dict, None if it is not in the snapshot."""
+
+        i = self._findCp(cp)
+        if i is None:
+            return None
+        cpvStart, cpvCount = _cpRecord.unpack_from(self._mm, self._cpOff + i * _cpRecord.size)[2:]
+
+        # cpvs of a cp are sorted by pf
+        lo, hi = cpvStart, cpvStart + cpvCount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._cpvRecord.unpack_from(self._mm, self._cpvOff + mid * self._cpvRecord.size)
+            midPf = self._str(record[0], record[1])
+            if midPf == pf:
+                ret = dict()
+                for k, key in enumerate(self.keys):
+                    value = self._str(record[2 + k * 2], record[3 + k * 2])
+                    if value != "":
+                        ret[key] = value
+                return ret
+            elif midPf < pf:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _findCp(self, cp):
+        lo, hi = 0, self._cpCount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = _cpRecord.unpack_from(self._mm, self._cpOff + mid * _cpRecord.size)
+            midCp = self._str(record[0], record[1])
+            if midCp == cp:
+                return mid
+            elif midCp < cp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _str(self, offset, length):
+        offset += self._strOff
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    @classmethod
+    def generate(cls, repo_dir, path):
+        """Write the snapshot of the md5-cache of repository repo_dir to path, atomically."""
+
+        stamp = get_repo_stamp(repo_dir)
+
+        # read all the cache entries, sorted by cp then pf
+        cacheDir = os.path.join(repo_dir, "metadata", "md5-cache")
+        entries = []
+        keySet = set()
+        for category in sorted(os.listdir(cacheDir)):
+            categoryDir = os.path.join(cacheDir, category)
+            if not os.path.isdir(categoryDir):
+                continue
+            for pf in os.listdir(categoryDir):
+                d = read_cache_file(os.path.join(categoryDir, pf))
+                keySet.update(d.keys())
+                entries.append((category + "/" + pf_to_package(pf), pf, d))
+        entries.sort(key=lambda x: (x[0], x[1]))
+        keys = sorted(keySet)
+
+        strings = _StringTable()
+        stampRef = strings.add(stamp)
+        keyTable = bytearray()
+        for key in keys:
+            keyTable += _u32x2.pack(*strings.add(key))
+        cpTable = bytearray()
+        cpvTable = bytearray()
+        cpvRecord = struct.Struct("<%dI" % (2 + 2 * len(keys)))
+        cpCount = 0
+        i = 0
+        while i < len(entries):
+            j = i
+            while j < len(entries) and entries[j][0] == entries[i][0]:
+                d = entries[j][2]
+                refs = list(strings.add(entries[j][1]))
+                for key in keys:
+                    refs += strings.add(d.get(key, ""))
+                cpvTable += cpvRecord.pack(*refs)
+                j += 1
+            cpTable += _cpRecord.pack(*strings.add(entries[i][0]), i, j - i)
+            cpCount += 1
+            i = j
+
+        # stamp reference is stored right after the header
+        keyOff = _header.size + _u32x2.size
+        cpOff = keyOff + len(keyTable)
+        cpvOff = cpOff + len(cpTable)
+        strOff = cpvOff + len(cpvTable)
+        header = _header.pack(cls.MAGIC, cls.VERSION, _header.size, len(keys), cpCount, len(entries), keyOff, cpOff, cpvOff, strOff)
+
+        tmpPath = path + ".tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmpPath, "wb") as f:
+            f.write(header)
+            f.write(_u32x2.pack(*stampRef))
+            f.write(keyTable)
+            f.write(cpTable)
+            f.write(cpvTable)
+            f.write(strings.data)
+        os.replace(tmpPath, path)
+
+
+class RepoCacheError(Exception):
+    pass
+
+
+def get_repo_stamp(repo_dir):
+    # the md5-cache is regenerated in place after a sync or after the repository is patched,
+    # and the patches don't change git HEAD, so its newest mtime is part of the stamp too
+    cacheDir = os.path.join(repo_dir, "metadata", "md5-cache")
+    mtime = os.stat(cacheDir).st_mtime_ns
+    with os.scandir(cacheDir) as it:
+        for dirent in it:
+            if dirent.is_dir():
+                mtime = max(mtime, dirent.stat().st_mtime_ns)
+
+    if os.path.exists(os.path.join(repo_dir, ".git")):
+        out = subprocess.check_output(["git", "-C", repo_dir, "rev-parse", "HEAD"], universal_newlines=True)
+        return "git:%s:mtime:%d" % (out.strip(), mtime)
+    return "mtime:%d" % (mtime)
+
+
+class _StringTable:
+
+    def __init__(self):
+        self.data = bytearray()
+        self._refDict = dict()
+
+    def add(self, s):
+        # identical strings (KEYWORDS, DEPEND of different versions, ...) are stored once
+        ret = self._refDict.get(s)
+        if ret is None:
+            b = s.encode("utf-8")
+            ret = (len(self.data), len(b))
+            self.data += b
+            self._refDict[s] = ret
+        return ret
+
+
+_header = struct.Struct("<8s9I")
+_u32x2 = struct.Struct("<2I")
+_cpRecord = struct.Struct("<4I")
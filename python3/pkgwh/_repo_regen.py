@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2005-2014 Fpemud <fpemud@sina.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import queue
+import hashlib
+import tempfile
+import threading
+import subprocess
+from libglep.repo import InheritIndex
+from libglep.repo.metadata import read_cache_file, pf_to_package
+
+
+class CacheRegenerator:
+
+    """
+    Regenerate the md5-cache (metadata/md5-cache) of a repository.
+
+    Stale entries are found by comparing the md5 of the ebuilds and eclasses with the _md5_ and _eclasses_
+    values of the cache entries. Stale ebuilds are sourced by a pool of persistent bash worker processes,
+    each ebuild in its own subshell of a worker, so that only one bash is started per job. Entries are
+    written atomically.
+
+    The workers provide inherit and the helpers allowed in global scope (die, has, EXPORT_FUNCTIONS, ver_cut,
+    ver_rs, ver_test, einfo and friends, debug-print*), the USE query helpers die as they are not allowed
+    there. The RDEPEND=DEPEND default of EAPI 0 to 3 is applied. bash_init_file can be given to source the
+    complete helper set of a package manager in each worker instead.
+    """
+
+    def __init__(self, repo_dir, eclass_dirs=None, jobs=None, bash_init_file=None, inherit_index=None):
+        """
+        :param repo_dir: location of the repository
+        :keyword eclass_dirs: eclass directories in priority order, defaults to the eclass directory of the repository
+        :keyword jobs: number of worker processes, defaults to the number of CPUs
+        :keyword bash_init_file: bash file sourced by every worker before sourcing ebuilds
+        :keyword inherit_index: libglep InheritIndex of the repository (Repo.inherit_index), a non persistent one
+            is built when needed if None
+        """
+
+        self._repoDir = repo_dir
+        self._cacheDir = os.path.join(repo_dir, "metadata", "md5-cache")
+        self._eclassDirs = list(eclass_dirs) if eclass_dirs is not None else [os.path.join(repo_dir, "eclass")]
+        self._jobs = jobs if jobs is not None else os.cpu_count()
+        self._bashInitFile = bash_init_file
+        self._eclassMd5Dict = dict()
+        self._inheritIndex = inherit_index
+
+        assert self._jobs > 0
+
+    def find_stale(self, cpv_list=None):
+        """Returns the list of "category/package-version" strings whose cache entry is missing or stale.
+
+        All the ebuilds of the repository are checked, unless cpv_list is given.
+        """
+
+        if cpv_list is None:
+            cpv_list = self._listCpvs()
+
+        ret = []
+        for cpv in cpv_list:
+            category, pf = cpv.split("/")
+            try:
+                entry = read_cache_file(os.path.join(self._cacheDir, category, pf))
+            except FileNotFoundError:
+                ret.append(cpv)
+                continue
+            if not self._isEntryValid(cpv, entry):
+                ret.append(cpv)
+        return ret
+
+    def find_orphaned(self):
+        """Returns the list of "category/package-version" strings which have a cache entry but no ebuild."""
+
+        ret = []
+        if not os.path.isdir(self._cacheDir):
+            return ret
+        for category in sorted(os.listdir(self._cacheDir)):
+            for pf in sorted(os.listdir(os.path.join(self._cacheDir, category))):
+                cpv = category + "/" + pf
+                if not os.path.exists(self._ebuildPath(cpv)):
+                    ret.append(cpv)
+        return ret
+
+    def regenerate(self, cpv_list=None, progress_callback=None):
+        """Regenerate the cache entries of cpv_list (the stale entries by default), and remove orphaned entries.
+
+        progress_callback(done_count, total_count, cpv, error_or_none) is called after each entry, from the
+        calling thread. Returns a dict of the failed cpvs and their error message.
+        """
+
+        if cpv_list is None:
+            cpv_list = self.find_stale()
+            for cpv in self.find_orphaned():
+                os.unlink(os.path.join(self._cacheDir, cpv))
+
+        failed = dict()
+        if len(cpv_list) == 0:
+            return failed
+
+        taskQueue = queue.Queue()
+        resultQueue = queue.Queue()
+        for cpv in cpv_list:
+            taskQueue.put(cpv)
+
+        workers = [_Worker(self._eclassDirs, self._bashInitFile) for i in range(0, min(self._jobs, len(cpv_list)))]
+        threads = [threading.Thread(target=self._workerThread, args=(workers, i, taskQueue, resultQueue)) for i in range(0, len(workers))]
+        try:
+            for t in threads:
+                t.start()
+            for i in range(0, len(cpv_list)):
+                cpv, error = resultQueue.get()
+                if error is not None:
+                    failed[cpv] = error
+                if progress_callback is not None:
+                    progress_callback(i + 1, len(cpv_list), cpv, error)
+        finally:
+            for t in threads:
+                taskQueue.put(None)
+            for t in threads:
+                t.join()
+            for w in workers:
+                if w is not None:
+                    w.close()
+
+        return failed
+
+    def regenerate_changed(self, changed_files, progress_callback=None):
+        """Regenerate only the cache entries affected by changed_files, the paths relative to the repository of
+        the added, modified and deleted files (for example from "git diff --name-only").
+
+        Changed eclasses are expanded to the ebuilds inheriting them through the inherit index. Returns a dict
+        of the failed cpvs and their error message.
+        """
+
+        cpvSet = set()
+        eclassSet = set()
+        for fn in changed_files:
+            parts = fn.split("/")
+            if len(parts) == 3 and parts[2].endswith(".ebuild"):
+                cpvSet.add(parts[0] + "/" + parts[2][:-len(".ebuild")])
+            elif len(parts) == 2 and parts[0] == "eclass" and parts[1].endswith(".eclass"):
+                eclassSet.add(parts[1][:-len(".eclass")])
+
+        if len(eclassSet) > 0:
+            # only the md5-cache categories changed since the index was saved are rescanned
+            if self._inheritIndex is None:
+                self._inheritIndex = InheritIndex(self._repoDir)
+            else:
+                self._inheritIndex.update()
+            for name in eclassSet:
+                cpvSet |= set([str(x) for x in self._inheritIndex.get(name)])
+                self._eclassMd5Dict.pop(name, None)
+
+        # deleted ebuilds only have their cache entry removed
+        cpvList = []
+        for cpv in sorted(cpvSet):
+            if os.path.exists(self._ebuildPath(cpv)):
+                cpvList.append(cpv)
+            else:
+                try:
+                    os.unlink(os.path.join(self._cacheDir, cpv))
+                except FileNotFoundError:
+                    pass
+
+        return self.regenerate(self.find_stale(cpvList), progress_callback=progress_callback)
+
+    def _workerThread(self, workers, i, taskQueue, resultQueue):
+        # every task must get a result, regenerate() waits for as many as it queued
+        while True:
+            cpv = taskQueue.get()
+            if cpv is None:
+                break
+            try:
+                if workers[i] is None:
+                    workers[i] = _Worker(self._eclassDirs, self._bashInitFile)
+                metadata = workers[i].source(cpv, self._ebuildPath(cpv))
+                self._writeEntry(cpv, metadata)
+                resultQueue.put((cpv, None))
+            except Exception as e:
+                resultQueue.put((cpv, str(e)))
+                # only a failed ebuild leaves the worker usable, else it is restarted for the next task
+                if workers[i] is not None and not (isinstance(e, _SourceError) and workers[i].is_alive()):
+                    workers[i].close()
+                    workers[i] = None
+
+    def _writeEntry(self, cpv, metadata):
+        inherited = metadata.pop("INHERITED", "").split()
+
+        lines = ["%s=%s\n" % (k, v) for k, v in sorted(metadata.items()) if v != ""]
+        if len(inherited) > 0:
+            eclasses = []
+            for name in sorted(set(inherited)):
+                eclasses += [name, self._getEclassMd5(name)]
+            lines.append("_eclasses_=%s\n" % ("\t".join(eclasses)))
+        lines.append("_md5_=%s\n" % (_md5File(self._ebuildPath(cpv))))
+
+        fn = os.path.join(self._cacheDir, cpv)
+        os.makedirs(os.path.dirname(fn), exist_ok=True)
+        with open(fn + ".tmp", "w") as f:
+            f.write("".join(lines))
+        os.replace(fn + ".tmp", fn)
+
+    def _isEntryValid(self, cpv, entry):
+        try:
+            if entry.get("_md5_") != _md5File(self._ebuildPath(cpv)):
+                return False
+        except FileNotFoundError:
+            return False
+        eclasses = entry.get("_eclasses_", "").split()
+        if len(eclasses) % 2 != 0:
+            return False
+        for i in range(0, len(eclasses), 2):
+            if self._getEclassMd5(eclasses[i]) != eclasses[i + 1]:
+                return False
+        return True
+
+    def _getEclassMd5(self, name):
+        if name not in self._eclassMd5Dict:
+            self._eclassMd5Dict[name] = None
+            for d in self._eclassDirs:
+                fn = os.path.join(d, name + ".eclass")
+                if os.path.exists(fn):
+                    self._eclassMd5Dict[name] = _md5File(fn)
+                    break
+        return self._eclassMd5Dict[name]
+
+    def _listCpvs(self):
+        ret = []
+        with open(os.path.join(self._repoDir, "profiles", "categories")) as f:
+            categories = [x.strip() for x in f.read().split("\n") if x.strip() != ""]
+        for category in categories:
+            categoryDir = os.path.join(self._repoDir, category)
+            if not os.path.isdir(categoryDir):
+                continue
+            for pkgName in sorted(os.listdir(categoryDir)):
+                pkgDir = os.path.join(categoryDir, pkgName)
+                if not os.path.isdir(pkgDir):
+                    continue
+                for fn in sorted(os.listdir(pkgDir)):
+                    if fn.endswith(".ebuild"):
+                        ret.append(category + "/" + fn[:-len(".ebuild")])
+        return ret
+
+    def _ebuildPath(self, cpv):
+        category, pf = cpv.split("/")
+        return os.path.join(self._repoDir, category, pf_to_package(pf), pf + ".ebuild")
+
+
+class _Worker:
+
+    def __init__(self, eclassDirs, bashInitFile):
+        # the stderr of each ebuild goes to this file, it is reported with the error of a failed ebuild
+        fd, self._stderrFile = tempfile.mkstemp(prefix="pkgwh-regen-")
+        os.close(fd)
+        env = {
+            "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
+            "PKGWH_ECLASS_DIRS": " ".join(eclassDirs),
+            "PKGWH_INIT_FILE": bashInitFile if bashInitFile is not None else "",
+            "PKGWH_STDERR_FILE": self._stderrFile,
+        }
+        self._proc = subprocess.Popen(["bash", "-c", _WORKER_SCRIPT], env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      universal_newlines=True, bufsize=1)
+
+    def source(self, cpv, ebuildPath):
+        category, pf = cpv.split("/")
+        pn = pf_to_package(pf)
+        self._proc.stdin.write("%s\t%s\t%s\t%s\n" % (ebuildPath, category, pn, pf))
+        self._proc.stdin.flush()
+
+        ret = dict()
+        while True:
+            line = self._proc.stdout.readline()
+            if line == "":
+                raise _SourceError("worker process exited" + self._readStderr())
+            line = line.rstrip("\n")
+            if line.startswith(_END_MARKER):
+                status = line[len(_END_MARKER):].strip()
+                if status != "0":
+                    raise _SourceError("failed to source ebuild, exit status %s%s" % (status, self._readStderr()))
+                return ret
+            key, sep, value = line.partition("=")
+            ret[key] = " ".join(value.split())
+
+    def is_alive(self):
+        return self._proc.poll() is None
+
+    def close(self):
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self._proc.poll() is None:
+            self._proc.kill()
+        self._proc.wait()
+        try:
+            os.unlink(self._stderrFile)
+        except FileNotFoundError:
+            pass
+
+    def _readStderr(self):
+        try:
+            with open(self._stderrFile, errors="replace") as f:
+                msg = f.read().strip()
+        except OSError:
+            return ""
+        return (": " + msg) if msg != "" else ""
+
+
+class _SourceError(Exception):
+    pass
+
+
+def _md5File(path):
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+_END_MARKER = "\0pkgwh-end"
+
+_WORKER_SCRIPT = r"""
+_PKGWH_KEYS="BDEPEND DEFINED_PHASES DEPEND DESCRIPTION EAPI HOMEPAGE IDEPEND INHERITED IUSE KEYWORDS LICENSE PDEPEND PROPERTIES RDEPEND REQUIRED_USE RESTRICT SLOT SRC_URI"
+_PKGWH_INCREMENTAL_KEYS="IUSE REQUIRED_USE DEPEND RDEPEND PDEPEND BDEPEND IDEPEND"
+# sorted by the phase name without its prefix, which is the order of DEFINED_PHASES in the md5-cache
+_PKGWH_PHASES="src_compile pkg_config src_configure pkg_info src_install pkg_nofetch pkg_postinst pkg_postrm pkg_preinst src_prepare pkg_prerm pkg_pretend pkg_setup src_test src_unpack"
+
+die() { echo "$*" >&2; exit 1; }
+has() { local _n=$1; shift; [[ " $* " == *" ${_n} "* ]]; }
+EXPORT_FUNCTIONS() {
+    local _f
+    for _f in "$@"; do
+        eval "${_f}() { ${ECLASS}_${_f} \"\$@\"; }"
+    done
+}
+debug-print() { :; }
+debug-print-function() { :; }
+debug-print-section() { :; }
+
+einfo() { :; }
+einfon() { :; }
+elog() { :; }
+ewarn() { :; }
+eerror() { :; }
+eqawarn() { :; }
+ebegin() { :; }
+eend() { return ${1:-0}; }
+
+# USE flags are not known when generating metadata
+for _f in use useq usev usex use_with use_enable in_iuse has_version best_version; do
+    eval "${_f}() { die \"${_f} is not allowed in global scope\"; }"
+done
+unset _f
+
+# version helpers of EAPI 7, eclasses of older EAPIs (eapi7-ver) override them
+_pkgwh_ver_split() {
+    # fills _comp with alternating separators and components, the first separator may be empty
+    local _v=$1 _s _c
+    _comp=()
+    while [[ -n ${_v} ]]; do
+        _s=${_v%%[a-zA-Z0-9]*}
+        _v=${_v:${#_s}}
+        if [[ ${_v} == [0-9]* ]]; then
+            _c=${_v%%[^0-9]*}
+        else
+            _c=${_v%%[^a-zA-Z]*}
+        fi
+        _v=${_v:${#_c}}
+        _comp+=("${_s}" "${_c}")
+    done
+}
+
+_pkgwh_ver_range() {
+    # sets _start and _end from range $1, open ends and ends past $2 are clamped to $2
+    [[ $1 == [0-9]* ]] || die "${FUNCNAME[1]}: invalid range: $1"
+    _start=${1%%-*}
+    if [[ $1 != *-* ]]; then
+        _end=${_start}
+    elif [[ -n ${1#*-} ]]; then
+        _end=${1#*-}
+        [[ ${_start} -le ${_end} ]] || die "${FUNCNAME[1]}: invalid range: $1"
+    else
+        _end=$2
+    fi
+    [[ ${_end} -le $2 ]] || _end=$2
+}
+
+ver_cut() {
+    local _start _end
+    local -a _comp
+    _pkgwh_ver_split "${2-${PV}}"
+    _pkgwh_ver_range "$1" $(( ${#_comp[@]} / 2 ))
+    # component n is at index 2n-1, the separator before it at 2n-2
+    (( _start > 0 )) && _start=$(( _start * 2 - 1 ))
+    local IFS=
+    (( _end * 2 > _start )) && echo "${_comp[*]:_start:_end*2-_start}" || echo
+}
+
+ver_rs() {
+    local _v _start _end _i
+    local -a _comp
+    if (( $# % 2 == 1 )); then
+        _v=${!#}
+    else
+        _v=${PV}
+    fi
+    _pkgwh_ver_split "${_v}"
+    while (( $# >= 2 )); do
+        _pkgwh_ver_range "$1" $(( ${#_comp[@]} / 2 - 1 ))
+        for (( _i = _start * 2; _i <= _end * 2; _i += 2 )); do
+            (( _i == 0 )) && [[ -z ${_comp[0]} ]] && continue
+            _comp[_i]=$2
+        done
+        shift 2
+    done
+    local IFS=
+    echo "${_comp[*]}"
+}
+
+_pkgwh_cmp_int() {
+    # compares two decimal strings of any length, 1 if $1 < $2, 2 if equal, 3 if greater
+    local _a=$1 _b=$2
+    while [[ ${_a} == 0* ]]; do _a=${_a#0}; done
+    while [[ ${_b} == 0* ]]; do _b=${_b#0}; done
+    if (( ${#_a} != ${#_b} )); then
+        (( ${#_a} < ${#_b} )) && return 1 || return 3
+    fi
+    [[ ${_a} < ${_b} ]] && return 1
+    [[ ${_a} > ${_b} ]] && return 3
+    return 2
+}
+
+_pkgwh_ver_cmp() {
+    # PMS version comparison of $1 and $2, 1 if $1 < $2, 2 if equal, 3 if greater
+    local _re='^([0-9]+(\.[0-9]+)*)([a-z]?)((_(alpha|beta|pre|rc|p)[0-9]*)*)(-r([0-9]+))?$'
+    local _an _al _as _ar _bn _bl _bs _br _a _b _x _y _ret
+    [[ $1 =~ ${_re} ]] || die "ver_test: invalid version: $1"
+    _an=${BASH_REMATCH[1]} _al=${BASH_REMATCH[3]} _as=${BASH_REMATCH[4]} _ar=${BASH_REMATCH[8]:-0}
+    [[ $2 =~ ${_re} ]] || die "ver_test: invalid version: $2"
+    _bn=${BASH_REMATCH[1]} _bl=${BASH_REMATCH[3]} _bs=${BASH_REMATCH[4]} _br=${BASH_REMATCH[8]:-0}
+
+    _pkgwh_cmp_int "${_an%%.*}" "${_bn%%.*}"
+    _ret=$?
+    (( _ret != 2 )) && return ${_ret}
+    while [[ ${_an} == *.* && ${_bn} == *.* ]]; do
+        _an=${_an#*.} _bn=${_bn#*.}
+        _a=${_an%%.*} _b=${_bn%%.*}
+        if [[ ${_a} == 0* || ${_b} == 0* ]]; then
+            # compared as decimal fractions
+            while [[ ${_a} == *0 ]]; do _a=${_a%0}; done
+            while [[ ${_b} == *0 ]]; do _b=${_b%0}; done
+            [[ ${_a} < ${_b} ]] && return 1
+            [[ ${_a} > ${_b} ]] && return 3
+        else
+            _pkgwh_cmp_int "${_a}" "${_b}"
+            _ret=$?
+            (( _ret != 2 )) && return ${_ret}
+        fi
+    done
+    [[ ${_an} == *.* ]] && return 3
+    [[ ${_bn} == *.* ]] && return 1
+
+    [[ ${_al} < ${_bl} ]] && return 1
+    [[ ${_al} > ${_bl} ]] && return 3
+
+    # suffixes, a missing one sorts between the negative ones and _p
+    local -A _sv=([alpha]=1 [beta]=2 [pre]=3 [rc]=4 [end]=5 [p]=6)
+    _as=${_as#_} _bs=${_bs#_}
+    while [[ -n ${_as} || -n ${_bs} ]]; do
+        _a=${_as%%_*} _b=${_bs%%_*}
+        _x=${_a%%[0-9]*} _y=${_b%%[0-9]*}
+        (( ${_sv[${_x:-end}]} < ${_sv[${_y:-end}]} )) && return 1
+        (( ${_sv[${_x:-end}]} > ${_sv[${_y:-end}]} )) && return 3
+        _pkgwh_cmp_int "${_a#${_x}}" "${_b#${_y}}"
+        _ret=$?
+        (( _ret != 2 )) && return ${_ret}
+        [[ ${_as} == *_* ]] && _as=${_as#*_} || _as=
+        [[ ${_bs} == *_* ]] && _bs=${_bs#*_} || _bs=
+    done
+
+    _pkgwh_cmp_int "${_ar}" "${_br}"
+}
+
+ver_test() {
+    local _va=${PVR}
+    if (( $# == 3 )); then
+        _va=$1
+        shift
+    fi
+    (( $# == 2 )) || die "ver_test: bad number of arguments"
+    case $1 in
+        -eq|-ne|-lt|-le|-gt|-ge) ;;
+        *) die "ver_test: invalid operator: $1" ;;
+    esac
+    _pkgwh_ver_cmp "${_va}" "$2"
+    test $? "$1" 2
+}
+
+inherit() {
+    local _e _d _f _k _v
+    for _e in "$@"; do
+        _f=
+        for _d in ${PKGWH_ECLASS_DIRS}; do
+            if [[ -f ${_d}/${_e}.eclass ]]; then
+                _f=${_d}/${_e}.eclass
+                break
+            fi
+        done
+        [[ -n ${_f} ]] || die "eclass ${_e} not found"
+
+        # values of the incremental variables set by eclasses are added to the ebuild ones
+        for _k in ${_PKGWH_INCREMENTAL_KEYS}; do
+            local _save_${_k}="${!_k}" _isset_${_k}=${!_k+1}
+            unset ${_k}
+        done
+        local ECLASS=${_e}
+        source "${_f}" || die "failed to source eclass ${_e}"
+        for _k in ${_PKGWH_INCREMENTAL_KEYS}; do
+            eval "_PKGWH_E_${_k}+=\" \${${_k}}\""
+            # an unset variable stays unset, for the RDEPEND default
+            _v=_isset_${_k}
+            if [[ -n ${!_v} ]]; then
+                eval "${_k}=\${_save_${_k}}"
+            else
+                unset ${_k}
+            fi
+        done
+
+        has "${_e}" ${INHERITED} || INHERITED+=" ${_e}"
+    done
+}
+
+[[ -n ${PKGWH_INIT_FILE} ]] && source "${PKGWH_INIT_FILE}"
+
+while IFS=$'\t' read -r _ebuild CATEGORY PN PF; do
+    (
+        PVR=${PF#${PN}-}
+        if [[ ${PVR} =~ -r[0-9]+$ ]]; then
+            PR=${PVR##*-}
+            PV=${PVR%-*}
+        else
+            PR=r0
+            PV=${PVR}
+        fi
+        P=${PN}-${PV}
+        EBUILD_PHASE=depend
+        source "${_ebuild}" >/dev/null || die "failed to source ebuild"
+
+        # RDEPEND defaults to DEPEND when the ebuild doesn't set it, eclass values excluded
+        if [[ ${EAPI:-0} == [0123] ]] && ! declare -p RDEPEND >/dev/null 2>&1; then
+            RDEPEND=${DEPEND}
+        fi
+        for _k in ${_PKGWH_INCREMENTAL_KEYS}; do
+            _v=_PKGWH_E_${_k}
+            eval "${_k}+=\" \${!_v}\""
+        done
+        : ${EAPI:=0}
+        DEFINED_PHASES=
+        for _p in ${_PKGWH_PHASES}; do
+            declare -F ${_p} >/dev/null && DEFINED_PHASES+=" ${_p#*_}"
+        done
+        [[ -z ${DEFINED_PHASES} ]] && DEFINED_PHASES=-
+
+        for _k in ${_PKGWH_KEYS}; do
+            _v=${!_k}
+            printf '%s=%s\n' "${_k}" "${_v//$'\n'/ }"
+        done
+    ) </dev/null 2>"${PKGWH_STDERR_FILE}"
+    printf '\0pkgwh-end %s\n' "$?"
+done
+"""
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2005-2014 Fpemud <fpemud@sina.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import mmap
+import json
+import struct
+from .vartree.contents import iter_contents_file
+
+
+class VdbOwnerIndex:
+
+    """
+    Persistent path -> owning package index of a VDB (/var/db/pkg).
+
+    The index is a table sorted by path (owners.idx), memory-mapped and bisected, plus a journal (owners.log)
+    of the packages added and removed since the table was written. Every add(), remove() and replace() is
+    one journal record written with a single write() and fsync(), a torn last record is ignored on load, so
+    an update is either fully applied or not at all. The table is rewritten when the journal gets long.
+
+    Directories are not indexed, they are shared by many packages.
+
+    The index stores the VDB stamp (newest mtime of the VDB directory and its category directories) it
+    corresponds to, it is rebuilt from the CONTENTS files if the VDB was modified by someone else.
+
+    If the index directory is not writable (non-root user, read-only filesystem, ...) the index is kept in
+    memory only, from the first failed write on.
+    """
+
+    MAGIC = b"PKGWHOI\0"
+    VERSION = 1
+    MAX_JOURNAL_RECORDS = 256
+
+    def __init__(self, vdb_dir, index_dir):
+        self._vdbDir = vdb_dir
+        self._indexDir = index_dir
+        self._tableFile = os.path.join(index_dir, "owners.idx")
+        self._journalFile = os.path.join(index_dir, "owners.log")
+        self._inMemory = False          # set when writing the index failed
+
+        self._table = None
+        self._added = dict()            # path -> cpv, added after the table was written
+        self._addedByCpv = dict()       # cpv -> set of paths in self._added
+        self._removed = set()           # cpvs whose entries in the table are obsolete
+        self._journalCount = 0
+        self._stamp = None              # VDB stamp the index corresponds to
+
+        self._load()
+        if self._stamp != _getVdbStamp(self._vdbDir):
+            self.rebuild()
+
+    def close(self):
+        if self._table is not None:
+            self._table.close()
+            self._table = None
+
+    def get_owner(self, path):
+        """Returns the cpv string of the package owning path, None if no package owns it."""
+
+        ret = self._added.get(path)
+        if ret is not None:
+            return ret
+        if self._table is not None:
+            ret = self._table.get(path)
+            if ret is not None and ret not in self._removed:
+                return ret
+        return None
+
+    def get_owners(self, paths):
+        """Returns a dict of path -> owning cpv string, for the paths of paths which are owned, for collision checks."""
+        ret = dict()
+        for path in paths:
+            owner = self.get_owner(path)
+            if owner is not None:
+                ret[path] = owner
+        return ret
+
+    def add(self, cpv):
+        """Index the files of cpv, whose VDB directory must already be written."""
+        paths = _readPaths(self._vdbDir, cpv)
+        self._commit({"op": "add", "cpv": cpv, "paths": paths})
+
+    def remove(self, cpv):
+        """Drop the files of cpv from the index, call it once its VDB directory is removed."""
+        self._commit({"op": "remove", "cpv": cpv})
+
+    def replace(self, old_cpv, new_cpv):
+        """Drop the files of old_cpv and index the files of new_cpv (they can be the same) in one transaction."""
+        paths = _readPaths(self._vdbDir, new_cpv)
+        self._commit({"op": "replace", "old": old_cpv, "cpv": new_cpv, "paths": paths})
+
+    def rebuild(self):
+        """Re-read all the CONTENTS files and rewrite the index."""
+
+        owners = dict()
+        for category in sorted(os.listdir(self._vdbDir)):
+            categoryDir = os.path.join(self._vdbDir, category)
+            if category.startswith(".") or not os.path.isdir(categoryDir):
+                continue
+            for pf in sorted(os.listdir(categoryDir)):
+                # skip the directories of merges in progress
+                if pf.startswith((".tmp.", ".staged.", "-MERGING-")) or pf.endswith(".lockfile"):
+                    continue
+                cpv = category + "/" + pf
+                for path in _readPaths(self._vdbDir, cpv):
+                    owners[path] = cpv
+        self._writeTable(owners)
+
+    def _commit(self, record):
+        # the VDB change is already done, a crash before the record is written leaves a stamp mismatch
+        # which makes the next load rebuild the index
+        record["stamp"] = _getVdbStamp(self._vdbDir)
+        if not self._inMemory:
+            data = (json.dumps(record) + "\n").encode("utf-8")
+            try:
+                os.makedirs(self._indexDir, exist_ok=True)
+                fd = os.open(self._journalFile, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, data)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                # not writable, the journal on disk is stale from now on, its stamp makes the next load rebuild it
+                self._inMemory = True
+        self._apply(record)
+        self._journalCount += 1
+        self._stamp = record["stamp"]
+
+        if self._journalCount > self.MAX_JOURNAL_RECORDS:
+            self._compact()
+
+    def _apply(self, record):
+        op = record["op"]
+        if op in ("remove", "replace"):
+            cpv = record["old"] if op == "replace" else record["cpv"]
+            self._removed.add(cpv)
+            for path in self._addedByCpv.pop(cpv, ()):
+                if self._added.get(path) == cpv:
+                    del self._added[path]
+        if op in ("add", "replace"):
+            cpv = record["cpv"]
+            self._removed.add(cpv)          # entries of a previous install of the same cpv are obsolete
+            pathSet = self._addedByCpv.setdefault(cpv, set())
+            for path in record["paths"]:
+                self._added[path] = cpv
+                pathSet.add(path)
+
+    def _load(self):
+        try:
+            self._table = _OwnerTable(self._tableFile)
+            self._stamp = self._table.stamp
+        except (OSError, ValueError):
+            return
+
+        try:
+            with open(self._journalFile, "rb") as f:
+                offset = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError()
+                        record = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        # torn write, the transaction was not committed, drop it so that new records are not appended after it
+                        try:
+                            os.truncate(self._journalFile, offset)
+                        except OSError:
+                            self._inMemory = True
+                        break
+                    self._apply(record)
+                    self._journalCount += 1
+                    self._stamp = record["stamp"]
+                    offset += len(line)
+        except OSError:
+            pass
+
+    def _compact(self):
+        owners = dict()
+        if self._table is not None:
+            for path, cpv in self._table.items():
+                if cpv not in self._removed:
+                    owners[path] = cpv
+        owners.update(self._added)
+        self._writeTable(owners, self._stamp)
+
+    def _writeTable(self, owners, stamp=None):
+        if stamp is None:
+            stamp = _getVdbStamp(self._vdbDir)
+
+        if not self._inMemory:
+            try:
+                self._writeTableFile(owners, stamp)
+            except OSError:
+                # not writable (permissions, read-only filesystem, ...), the index is only kept in memory
+                self._inMemory = True
+                try:
+                    os.unlink(self._tableFile + ".tmp")
+                except OSError:
+                    pass
+        if self._inMemory:
+            self.close()
+            self._table = _MemoryOwnerTable(owners)
+        else:
+            self._table = _OwnerTable(self._tableFile)
+
+        self._added = dict()
+        self._addedByCpv = dict()
+        self._removed = set()
+        self._journalCount = 0
+        self._stamp = stamp
+
+    def _writeTableFile(self, owners, stamp):
+        cpvList = sorted(set(owners.values()))
+        cpvIndex = {x: i for i, x in enumerate(cpvList)}
+        blob = bytearray()
+        cpvTable = bytearray()
+        for cpv in cpvList:
+            b = cpv.encode("utf-8")
+            cpvTable += _ref.pack(len(blob), len(b))
+            blob += b
+        pathTable = bytearray()
+        for path in sorted(owners, key=lambda x: x.encode("utf-8", "surrogateescape")):
+            b = path.encode("utf-8", "surrogateescape")
+            pathTable += _pathRecord.pack(len(blob), len(b), cpvIndex[owners[path]])
+            blob += b
+
+        os.makedirs(self._indexDir, exist_ok=True)
+        tmpFile = self._tableFile + ".tmp"
+        with open(tmpFile, "wb") as f:
+            f.write(_header.pack(self.MAGIC, self.VERSION, stamp, len(cpvList), len(owners)))
+            f.write(cpvTable)
+            f.write(pathTable)
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.close()
+        os.replace(tmpFile, self._tableFile)
+        try:
+            os.unlink(self._journalFile)
+        except FileNotFoundError:
+            pass
+
+
+class _OwnerTable:
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.stamp, self._cpvCount, self._pathCount = _header.unpack_from(self._mm, 0)
+        if magic != VdbOwnerIndex.MAGIC or version != VdbOwnerIndex.VERSION:
+            self._mm.close()
+            raise ValueError("invalid owner index file %s" % (path))
+        self._cpvOff = _header.size
+        self._pathOff = self._cpvOff + self._cpvCount * _ref.size
+        self._blobOff = self._pathOff + self._pathCount * _pathRecord.size
+
+    def close(self):
+        self._mm.close()
+
+    def get(self, path):
+        key = path.encode("utf-8", "surrogateescape")
+        lo, hi = 0, self._pathCount
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off, length, cpvIdx = _pathRecord.unpack_from(self._mm, self._pathOff + mid * _pathRecord.size)
+            midKey = self._mm[self._blobOff + off:self._blobOff + off + length]
+            if midKey == key:
+                return self._getCpv(cpvIdx)
+            elif midKey < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def items(self):
+        for i in range(0, self._pathCount):
+            off, length, cpvIdx = _pathRecord.unpack_from(self._mm, self._pathOff + i * _pathRecord.size)
+            yield (self._mm[self._blobOff + off:self._blobOff + off + length].decode("utf-8", "surrogateescape"), self._getCpv(cpvIdx))
+
+    def _getCpv(self, i):
+        off, length = _ref.unpack_from(self._mm, self._cpvOff + i * _ref.size)
+        return self._mm[self._blobOff + off:self._blobOff + off + length].decode("utf-8")
+
+
+class _MemoryOwnerTable:
+
+    def __init__(self, owners):
+        self._owners = owners
+
+    def close(self):
+        pass
+
+    def get(self, path):
+        return self._owners.get(path)
+
+    def items(self):
+        return self._owners.items()
+
+
+def _readPaths(vdbDir, cpv):
+    fn = os.path.join(vdbDir, cpv, "CONTENTS")
+    if not os.path.exists(fn):
+        return []
+    return [item[1] for item in iter_contents_file(fn) if item[0] != "dir"]
+
+
+def _getVdbStamp(vdbDir):
+    ret = os.stat(vdbDir).st_mtime_ns
+    with os.scandir(vdbDir) as it:
+        for dirent in it:
+            if not dirent.name.startswith(".") and dirent.is_dir():
+                ret = max(ret, dirent.stat().st_mtime_ns)
+    return ret
+
+
+_header = struct.Struct("<8sIqII")
+_ref = struct.Struct("<QI")
+_pathRecord = struct.Struct("<QII")
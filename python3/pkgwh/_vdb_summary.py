@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2005-2014 Fpemud <fpemud@sina.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+import os
+import json
+
+
+class VdbSummaryCache:
+
+    """
+    The files of the VDB which are read by whole-system queries (SLOT, USE, RDEPEND, ...), for all the
+    installed packages, in one file, like /var/cache/edb/vdb_metadata.pickle of portage.
+
+    Every package entry records the mtime of the package directory it was read from, get_all() re-reads
+    the packages whose directory changed (or is new) and drops the ones which are gone, then saves the
+    file if anything changed. update() and remove() are called when a package is merged or unmerged.
+    """
+
+    VERSION = 1
+    FILENAMES = ("SLOT", "USE", "IUSE", "KEYWORDS", "RDEPEND", "COUNTER", "BUILD_TIME", "SIZE", "repository")
+
+    def __init__(self, vdb_dir, cache_file):
+        self._vdbDir = vdb_dir
+        self._cacheFile = cache_file
+        self._packages = dict()         # cpv -> [mtime_ns, {filename: content}]
+        self._dirty = False
+
+        try:
+            with open(cache_file) as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION and data.get("filenames") == list(self.FILENAMES):
+                self._packages = data["packages"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def get(self, cpv):
+        """Returns a dict of filename -> content of cpv, missing files are not in it, None if cpv is not installed."""
+
+        try:
+            mtime = os.stat(os.path.join(self._vdbDir, cpv)).st_mtime_ns
+        except FileNotFoundError:
+            if self._packages.pop(cpv, None) is not None:
+                self._dirty = True
+            return None
+
+        item = self._packages.get(cpv)
+        if item is None or item[0] != mtime:
+            item = self._read(cpv, mtime)
+        return item[1]
+
+    def get_all(self):
+        """Returns a dict of cpv -> {filename: content} for all the installed packages."""
+
+        current = dict()
+        with os.scandir(self._vdbDir) as it:
+            for cdirent in it:
+                if cdirent.name.startswith(".") or not cdirent.is_dir():
+                    continue
+                with os.scandir(cdirent.path) as it2:
+                    for dirent in it2:
+                        # skip the directories of merges in progress
+                        if dirent.name.startswith((".tmp.", ".staged.", "-MERGING-")) or dirent.name.endswith(".lockfile"):
+                            continue
+                        if dirent.is_dir():
+                            current[cdirent.name + "/" + dirent.name] = dirent.stat().st_mtime_ns
+
+        for cpv in list(self._packages):
+            if cpv not in current:
+                del self._packages[cpv]
+                self._dirty = True
+        for cpv, mtime in current.items():
+            item = self._packages.get(cpv)
+            if item is None or item[0] != mtime:
+                self._read(cpv, mtime)
+
+        self.save()
+        return {k: v[1] for k, v in self._packages.items()}
+
+    def update(self, cpv):
+        """Re-read the files of cpv, to be called once it is merged."""
+        self._read(cpv, os.stat(os.path.join(self._vdbDir, cpv)).st_mtime_ns)
+        self.save()
+
+    def remove(self, cpv):
+        """Drop cpv, to be called once it is unmerged."""
+        if self._packages.pop(cpv, None) is not None:
+            self._dirty = True
+        self.save()
+
+    def save(self):
+        if not self._dirty:
+            return
+        data = {
+            "version": self.VERSION,
+            "filenames": list(self.FILENAMES),
+            "packages": self._packages,
+        }
+        try:
+            os.makedirs(os.path.dirname(self._cacheFile), exist_ok=True)
+            with open(self._cacheFile + ".tmp", "w") as f:
+                json.dump(data, f)
+            os.replace(self._cacheFile + ".tmp", self._cacheFile)
+        except OSError:
+            # not writable (permissions, read-only filesystem, disk full, ...), the cache is only kept in memory
+            try:
+                os.unlink(self._cacheFile + ".tmp")
+            except OSError:
+                pass
+            return
+        self._dirty = False
+
+    def _read(self, cpv, mtime):
+        pkgDir = os.path.join(self._vdbDir, cpv)
+        with os.scandir(pkgDir) as it:
+            fileSet = set([x.name for x in it])
+        d = dict()
+        for fn in self.FILENAMES:
+            if fn in fileSet:
+                with open(os.path.join(pkgDir, fn)) as f:
+                    d[fn] = f.read()
+        item = [mtime, d]
+        self._packages[cpv] = item
+        self._dirty = True
+        return item
@@ -22,7 +22,13 @@
 
 
 import os
+import bz2
 import pathlib
+import robust_layer.simple_fops
+from libglep.core.pkg import CPV, package_version_glob_match
+from libglep.repo.metadata import pf_to_package
+from ._vdb_owners import VdbOwnerIndex
+from ._vdb_summary import VdbSummaryCache
 from ._db_vartree import VarTreeBase, VarTreeRwBase, VarTreePackageBase, VarTreePackageProperty
 
 
@@ -35,212 +41,341 @@ class VarTree(VarTreeBase):
     def path(self):
         return self._rw.path
 
-    def cp_list(self, category=None):                                 # FIXME: should have more advanced query parameter
-        self._rw.cp_list()
+    def cp_list(self, category=None):
+        return self._rw.cp_list(category)
 
-    def cpv_list(self, cp_obj=None):                                  # FIXME: should have more advanced query parameter
-        self._rw.cpv_list()
+    def cpv_list(self, cp_obj=None, atom=None):
+        return self._rw.cpv_list(cp_obj, atom)
 
-    def package_list(self, cpv_obj=None):
-        self._rw.package_list()
+    def package_list(self, cpv_obj=None, atom=None):
+        return self._rw.package_list(cpv_obj, atom)
 
 
 class VarTreeRw(VarTreeRwBase):
 
     def __init__(self, pkgwh):
         self._pkgwh = pkgwh
+        self._vartree = VarTree(self)
+        self._dirIndex = _VdbDirIndex(self.path)
+        self._ownerIndex = None
+        self._summaryCache = None
 
     @property
     def path(self):
         return "/var/db/pkg"
 
-    def cp_list(self, category=None):                                 # FIXME: should have more advanced query parameter
-        assert False
+    @property
+    def vartree(self):
+        return self._vartree
 
-    def cpv_list(self, cp_obj=None):                                  # FIXME: should have more advanced query parameter
-        assert False
+    @property
+    def owner_index(self):
+        # path -> owning package index, loaded on first use, rebuilt if the VDB was changed behind our back
+        if self._ownerIndex is None:
+            self._ownerIndex = VdbOwnerIndex(self.path, os.path.join(self.path, ".pkgwh-cache"))
+        return self._ownerIndex
 
-    def package_list(self, cpv_obj=None):
-        assert False
+    @property
+    def summary_cache(self):
+        if self._summaryCache is None:
+            self._summaryCache = VdbSummaryCache(self.path, os.path.join(self.path, ".pkgwh-cache", "summary.json"))
+        return self._summaryCache
+
+    def get_owner(self, path):
+        return self.owner_index.get_owner(path)
+
+    def find_collisions(self, paths):
+        """Returns a dict of path -> owning cpv string, for the paths in paths which are already owned by an installed package."""
+        return self.owner_index.get_owners(paths)
+
+    def cp_list(self, category=None):
+        """Returns the sorted "category/package" strings of the installed packages, of category only if specified."""
+
+        ret = []
+        for cat, packages in self._dirIndex.get_categories(category):
+            ret += [cat + "/" + x for x in sorted(packages)]
+        return ret
+
+    def cpv_list(self, cp_obj=None, atom=None):
+        """Returns the sorted "category/package-version" strings of the installed packages.
+
+        cp_obj ("category/package" string or CP object) and atom (PkgAtom object) restrict the result to
+        the versions of a package, or to the ones matching an atom.
+        """
+
+        if atom is not None:
+            if cp_obj is not None and str(cp_obj) != atom.category + "/" + atom.package:
+                return []
+            return [x for x in self._cpvList(atom.category, atom.package) if self._atomMatch(atom, x)]
+
+        if cp_obj is not None:
+            category, package = str(cp_obj).split("/")
+            return self._cpvList(category, package)
+
+        ret = []
+        for cat, packages in self._dirIndex.get_categories():
+            for package in sorted(packages):
+                ret += [cat + "/" + x for x in packages[package]]
+        return ret
+
+    def package_list(self, cpv_obj=None, atom=None):
+        if cpv_obj is not None:
+            if not os.path.isdir(os.path.join(self.path, str(cpv_obj))):
+                return []
+            cpvList = [str(cpv_obj)]
+            if atom is not None and not self._atomMatch(atom, cpvList[0]):
+                return []
+        else:
+            cpvList = self.cpv_list(atom=atom)
+        return [VarTreePackage(self, x) for x in cpvList]
 
     def add_package(self, cpv):
-        raise NotImplementedError()
+        # the VDB directory of cpv is written by the merge code before
+        assert os.path.isdir(os.path.join(self.path, str(cpv)))
+        self.owner_index.add(str(cpv))
+        self.summary_cache.update(str(cpv))
 
     def remove_package(self, cpv):
-        raise NotImplementedError()
+        robust_layer.simple_fops.rm(os.path.join(self.path, str(cpv)))
+        self.owner_index.remove(str(cpv))
+        self.summary_cache.remove(str(cpv))
 
     def replace_package(self, cpv):
-        raise NotImplementedError()
+        # the VDB directory of cpv is re-written by the merge code before
+        assert os.path.isdir(os.path.join(self.path, str(cpv)))
+        self.owner_index.replace(str(cpv), str(cpv))
+        self.summary_cache.update(str(cpv))
+
+
+    def bulk_load(self, property_id_list, atom=None):
+        """Returns a dict of cpv string -> {property_id: data}, for all the installed packages (the ones matching atom if specified)."""
+
+        filenameList = [_propertyTable[x][0] for x in property_id_list]
+        if atom is None and all([x in VdbSummaryCache.FILENAMES for x in filenameList]):
+            # answered from the summary cache, without reading the package directories
+            ret = dict()
+            for cpv, d in self.summary_cache.get_all().items():
+                ret[cpv] = {x: _propertyTable[x][1](d.get(fn)) for x, fn in zip(property_id_list, filenameList)}
+            return ret
+
+        return {x._path: x.get_properties(property_id_list) for x in self.package_list(atom=atom)}
+
+    def _cpvList(self, category, package):
+        for cat, packages in self._dirIndex.get_categories(category):
+            return [cat + "/" + x for x in packages.get(package, ())]
+        return []
+
+    def _atomMatch(self, atom, cpvStr):
+        if atom.op is not None:
+            cpv = CPV(cpvStr)
+            if atom.post_wildcard:
+                prefix = atom.ver if atom.rev is None else atom.ver + "-" + atom.rev
+                if not package_version_glob_match(prefix, cpv.fullver):
+                    return False
+            elif atom.op == "~":
+                if cpv.ver != atom.ver:
+                    return False
+            else:
+                key = CPV(atom.category, atom.package, atom.ver, *([atom.rev] if atom.rev is not None else [])).version_key
+                if not _opFuncDict[atom.op](cpv.version_key, key):
+                    return False
+        if atom.slot is not None or atom.subslot is not None:
+            slot, sep, subslot = _readFile(os.path.join(self.path, cpvStr, "SLOT")).strip().partition("/")
+            if atom.slot is not None and slot != atom.slot:
+                return False
+            if atom.subslot is not None and subslot != atom.subslot:
+                return False
+        if atom.repo_id is not None:
+            if _readFile(os.path.join(self.path, cpvStr, "repository")).strip() != atom.repo_id:
+                return False
+        return True
 
 
 class VarTreePackage(VarTreePackageBase):
 
+    """
+    An installed package, its properties are the files in its VDB directory.
+
+    The directory is listed once, and the small files read are kept in the object, so that getting
+    several properties, or the same one several times, costs at most one open() per file.
+    Use get_properties() to get several properties at once.
+    """
+
     def __init__(self, vartree_rw, path):
         self._rw = vartree_rw
         self._path = path
+        self._fileSet = None            # names of the files in the package directory
+        self._fileCache = dict()        # filename -> content
         assert os.path.isdir(self._full_path())
 
     def get_cpv(self):
         assert False
 
     def get_property_filename(self, property_id : VarTreePackageProperty):
-        if property_id == VarTreePackageProperty.REPOSITORY:
-            return "repository"
-        if property_id == VarTreePackageProperty.CATEGORY:
-            return "CATEGORY"
-
-        if property_id == VarTreePackageProperty.EBUILD_FILE:
+        filename = _propertyTable[property_id][0]
+        if filename is None:
             return os.path.basename(self._path) + ".ebuild"
-        if property_id == VarTreePackageProperty.EAPI:
-            return "EAPI"
-        if property_id == VarTreePackageProperty.DESCRIPTION:
-            return "DESCRIPTION"
-        if property_id == VarTreePackageProperty.HOMEPAGE:
-            return "HOMEPAGE"
-        if property_id == VarTreePackageProperty.KEYWORDS:
-            return "KEYWORDS"
-        if property_id == VarTreePackageProperty.LICENSE:
-            return "LICENSE"
-        if property_id == VarTreePackageProperty.SLOT:
-            return "SLOT"
-        if property_id == VarTreePackageProperty.IUSE:
-            return "IUSE"
-        if property_id == VarTreePackageProperty.DEPEND:
-            return "DEPEND"
-        if property_id == VarTreePackageProperty.RDEPEND:
-            return "RDEPEND"
-        if property_id == VarTreePackageProperty.BDEPEND:
-            return "BDEPEND"
-
-        if property_id == VarTreePackageProperty.CHOST:
-            return "CHOST"
-        if property_id == VarTreePackageProperty.CBUILD:
-            return "CBUILD"
-        if property_id == VarTreePackageProperty.CFLAGS:
-            return "CFLAGS"
-        if property_id == VarTreePackageProperty.CXXFLAGS:
-            return "CXXFLAGS"
-        if property_id == VarTreePackageProperty.LDFLAGS:
-            return "LDFLAGS"
-        if property_id == VarTreePackageProperty.INSTALL_MASK:
-            return "INSTALL_MASK"
-        if property_id == VarTreePackageProperty.ENVIRONMENT:
-            return "environment.bz2"
-
-        if property_id == self.FEATURES:
-            return "FEATURES"
-        if property_id == self.INHERITED:
-            return "INHERITED"
-        if property_id == VarTreePackageProperty.DEFINED_PHASES:
-            return "DEFINED_PHASES"
-        if property_id == self.IUSE_EFFECTIVE:
-            return "IUSE_EFFECTIVE"
-        if property_id == VarTreePackageProperty.USE:
-            return "USE"
-
-        if property_id == VarTreePackageProperty.BUILD_TIME:
-            return "BUILD_TIME"
-        if property_id == VarTreePackageProperty.CONTENTS:
-            return "CONTENTS"
-        if property_id == VarTreePackageProperty.SIZE:
-            return "SIZE"
-
-        if property_id == VarTreePackageProperty.COUNTER:
-            return "COUNTER"
-        if property_id == VarTreePackageProperty.REQUIRES:
-            return "REQUIRES"
-        if property_id == self.NEEDED:
-            return "NEEDED"
-        if property_id == self.NEEDED_ELF:
-            return "NEEDED.ELF.2"
-        if property_id == self.PF:
-            return "PF"
-
-        assert False
+        return filename
 
     def get_property_filepath(self, property_id):
         return os.path.join(self._full_path(), self.get_property_filename(property_id))
 
     def get_property_data(self, property_id):
-        fullfn = self.get_property_filepath(property_id)
-
-        if property_id == VarTreePackageProperty.REPOSITORY:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.CATEGORY:
-            return pathlib.Path(fullfn).read_text()
-
-        if property_id == VarTreePackageProperty.EBUILD_FILE:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.EAPI:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.DESCRIPTION:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.HOMEPAGE:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.KEYWORDS:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.LICENSE:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.SLOT:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.IUSE:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.DEPEND:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.RDEPEND:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.BDEPEND:                    # non-trivial
-            if os.path.exists(fullfn):
-                return pathlib.Path(fullfn).read_text()
+        return self.get_properties([property_id])[property_id]
+
+    def get_properties(self, property_id_list):
+        """Returns a dict of property_id -> data, for the properties in property_id_list."""
+
+        if self._fileSet is None:
+            with os.scandir(self._full_path()) as it:
+                self._fileSet = frozenset([x.name for x in it])
+
+        ret = dict()
+        for property_id in property_id_list:
+            filename = self.get_property_filename(property_id)
+            parser = _propertyTable[property_id][1]
+            if parser is None:
+                ret[property_id] = None
+            elif filename not in self._fileSet:
+                ret[property_id] = parser(None)
+            elif parser is _parseBz2:
+                # big, read only when asked for and not kept
+                ret[property_id] = _parseBz2(os.path.join(self._full_path(), filename))
             else:
-                return ""
-
-        if property_id == VarTreePackageProperty.CHOST:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.CBUILD:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.CFLAGS:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.CXXFLAGS:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.LDFLAGS:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.INSTALL_MASK:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.ENVIRONMENT:                # non-trivial
-            with bz2.open(fullfn, "r") as f:
-                return f.read()
-
-        if property_id == self.FEATURES:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == self.INHERITED:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.DEFINED_PHASES:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == self.IUSE_EFFECTIVE:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.USE:
-            return pathlib.Path(fullfn).read_text()
-
-        if property_id == VarTreePackageProperty.BUILD_TIME:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == VarTreePackageProperty.CONTENTS:                                     # FIXME: return EntrySet
-            return None
-        if property_id == VarTreePackageProperty.SIZE:                       # non-trivial
-            return int(pathlib.Path(fullfn).read_text())
-
-        if property_id == VarTreePackageProperty.COUNTER:                    # non-trivial
-            return int(pathlib.Path(fullfn).read_text())
-        if property_id == VarTreePackageProperty.REQUIRES:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == self.NEEDED:
-            return pathlib.Path(fullfn).read_text()
-        if property_id == self.NEEDED_ELF:                                         # FIXME: ?? 
-            return None
-        if property_id == self.PF:
-            return pathlib.Path(fullfn).read_text()
-
-        assert False
+                try:
+                    data = self._fileCache[filename]
+                except KeyError:
+                    data = _readFile(os.path.join(self._full_path(), filename))
+                    self._fileCache[filename] = data
+                ret[property_id] = parser(data)
+        return ret
 
     def _full_path(self):
         return os.path.join(self._rw.path, self._path)
+
+
+class _VdbDirIndex:
+
+    """
+    In-memory index of the VDB directory tree, category -> package -> package-version(-revision) strings.
+
+    A category is listed again only when the mtime of its directory changed, so a query costs one
+    os.scandir() of the VDB directory, and nothing is re-listed if no package was merged or unmerged.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._categories = dict()           # category -> (mtime_ns, {package: [pf, ...]})
+
+    def get_categories(self, category=None):
+        """Returns a list of (category, {package: [pf, ...]}), sorted by category, only category if specified."""
+
+        if category is not None:
+            try:
+                mtime = os.stat(os.path.join(self._path, category)).st_mtime_ns
+            except FileNotFoundError:
+                self._categories.pop(category, None)
+                return []
+            return [(category, self._getPackages(category, mtime))]
+
+        current = dict()
+        with os.scandir(self._path) as it:
+            for dirent in it:
+                if not dirent.name.startswith(".") and dirent.is_dir():
+                    current[dirent.name] = dirent.stat().st_mtime_ns
+        for cat in list(self._categories):
+            if cat not in current:
+                del self._categories[cat]
+        return [(cat, self._getPackages(cat, current[cat])) for cat in sorted(current)]
+
+    def _getPackages(self, category, mtime):
+        item = self._categories.get(category)
+        if item is not None and item[0] == mtime:
+            return item[1]
+
+        packages = dict()
+        with os.scandir(os.path.join(self._path, category)) as it:
+            for dirent in it:
+                # skip the directories of merges in progress
+                if dirent.name.startswith((".tmp.", "-MERGING-")) or dirent.name.endswith(".lockfile"):
+                    continue
+                if dirent.is_dir():
+                    packages.setdefault(pf_to_package(dirent.name), []).append(dirent.name)
+        for pfList in packages.values():
+            pfList.sort(key=lambda x: CPV(category + "/" + x).version_key)
+        self._categories[category] = (mtime, packages)
+        return packages
+
+
+def _parseText(data):
+    return data if data is not None else ""
+
+
+def _parseInt(data):
+    return int(data) if data is not None else None
+
+
+def _parseBz2(fullfn):
+    if fullfn is None:
+        return None
+    with bz2.open(fullfn, "r") as f:
+        return f.read()
+
+
+# property_id -> (filename, parser), filename is None for the ebuild file, no parser means not supported yet
+_propertyTable = {
+    VarTreePackageProperty.REPOSITORY: ("repository", _parseText),
+    VarTreePackageProperty.CATEGORY: ("CATEGORY", _parseText),
+
+    VarTreePackageProperty.EBUILD_FILE: (None, _parseText),
+    VarTreePackageProperty.EAPI: ("EAPI", _parseText),
+    VarTreePackageProperty.DESCRIPTION: ("DESCRIPTION", _parseText),
+    VarTreePackageProperty.HOMEPAGE: ("HOMEPAGE", _parseText),
+    VarTreePackageProperty.KEYWORDS: ("KEYWORDS", _parseText),
+    VarTreePackageProperty.LICENSE: ("LICENSE", _parseText),
+    VarTreePackageProperty.SLOT: ("SLOT", _parseText),
+    VarTreePackageProperty.IUSE: ("IUSE", _parseText),
+    VarTreePackageProperty.DEPEND: ("DEPEND", _parseText),
+    VarTreePackageProperty.RDEPEND: ("RDEPEND", _parseText),
+    VarTreePackageProperty.BDEPEND: ("BDEPEND", _parseText),
+
+    VarTreePackageProperty.CHOST: ("CHOST", _parseText),
+    VarTreePackageProperty.CBUILD: ("CBUILD", _parseText),
+    VarTreePackageProperty.CFLAGS: ("CFLAGS", _parseText),
+    VarTreePackageProperty.CXXFLAGS: ("CXXFLAGS", _parseText),
+    VarTreePackageProperty.LDFLAGS: ("LDFLAGS", _parseText),
+    VarTreePackageProperty.INSTALL_MASK: ("INSTALL_MASK", _parseText),
+    VarTreePackageProperty.ENVIRONMENT: ("environment.bz2", _parseBz2),
+
+    VarTreePackageProperty.FEATURES: ("FEATURES", _parseText),
+    VarTreePackageProperty.INHERITED: ("INHERITED", _parseText),
+    VarTreePackageProperty.DEFINED_PHASES: ("DEFINED_PHASES", _parseText),
+    VarTreePackageProperty.IUSE_EFFECTIVE: ("IUSE_EFFECTIVE", _parseText),
+    VarTreePackageProperty.USE: ("USE", _parseText),
+
+    VarTreePackageProperty.BUILD_TIME: ("BUILD_TIME", _parseText),
+    VarTreePackageProperty.CONTENTS: ("CONTENTS", None),                # FIXME: return EntrySet
+    VarTreePackageProperty.SIZE: ("SIZE", _parseInt),
+
+    VarTreePackageProperty.COUNTER: ("COUNTER", _parseInt),
+    VarTreePackageProperty.REQUIRES: ("REQUIRES", _parseText),
+    VarTreePackageProperty.NEEDED: ("NEEDED", _parseText),
+    VarTreePackageProperty.NEEDED_ELF: ("NEEDED.ELF.2", None),         # FIXME: ??
+    VarTreePackageProperty.PF: ("PF", _parseText),
+}
+
+
+def _readFile(fullfn):
+    try:
+        return pathlib.Path(fullfn).read_text()
+    except FileNotFoundError:
+        return ""
+
+
+_opFuncDict = {
+    "=": lambda a, b: a == b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
@@ -1,6 +1,8 @@
 
 import os
+import mmap
 import stat
+import array
 
 from snakeoil import data_source
 from snakeoil.chksum import get_handler
@@ -49,38 +51,17 @@ class ContentsFile:
     def flush(self):
         return self._write()
 
+    def iter_entries(self):
+        """Iterate over the entries of the contents file without creating fs objects, see iter_contents_file()."""
+        return iter_contents_file(self._path)
+
+    def read_compact(self):
+        return CompactContents(self._path)
+
     def _iter_contents(self):
         self.clear()
-        for line in self._get_fd():
-            if not line:
-                continue
-            s = line.split(" ")
-            if s[0] in ("dir", "dev", "fif"):
-                path = ' '.join(s[1:])
-                if s[0] == 'dir':
-                    obj = fs.fsDir(path, strict=False)
-                elif s[0] == 'dev':
-                    obj = LookupFsDev(path, strict=False)
-                else:
-                    obj = fs.fsFifo(path, strict=False)
-            elif s[0] == "obj":
-                path = ' '.join(s[1:-2])
-                obj = fs.fsFile(
-                    path, chksums={"md5":int(s[-2], 16)},
-                        mtime=int(s[-1]), strict=False)
-            elif s[0] == "sym":
-                try:
-                    p = s.index("->")
-                    obj = fs.fsLink(' '.join(s[1:p]), ' '.join(s[p+1:-1]),
-                        mtime=int(s[-1]), strict=False)
-
-                except ValueError:
-                    # XXX throw a corruption error
-                    raise
-            else:
-                raise Exception(f"unknown entry type {line!r}")
-
-            yield obj
+        for item in iter_contents_file(self._path):
+            yield _make_fs_obj(*item)
 
     def _write(self):
         md5_handler = get_handler('md5')
@@ -116,3 +97,133 @@ class ContentsFile:
         finally:
             # if atomic, it forces the update to be wiped.
             del outfile
+
+
+class CompactContents:
+    """Columnar, read-only form of a contents file.
+
+    Paths are kept in one utf-8 string table with an offset array, types, mtimes and md5s in typed arrays,
+    fs objects are only created on demand by get_obj(). It takes a small fraction of the memory of a
+    ContentsSet, so that the contents of all the installed packages can be kept for owner lookups and
+    collision checks.
+    """
+
+    def __init__(self, path):
+        self._strings = bytearray()
+        self._offsets = array.array("Q", [0])
+        self._types = array.array("B")
+        self._mtimes = array.array("q")
+        self._md5s = bytearray()                # 16 bytes per entry, zeros if none
+        self._targets = dict()                  # index -> symlink target
+
+        for type, location, md5, mtime, target in iter_contents_file(path):
+            i = len(self._types)
+            self._strings += location.encode("utf-8", "surrogateescape")
+            self._offsets.append(len(self._strings))
+            self._types.append(_TYPES.index(type))
+            self._mtimes.append(mtime if mtime is not None else -1)
+            self._md5s += bytes.fromhex(md5) if md5 is not None else bytes(16)
+            if target is not None:
+                self._targets[i] = target
+
+        # entry indexes sorted by path, for bisection
+        self._order = array.array("I", sorted(range(0, len(self._types)), key=self._get_path_bytes))
+
+    def __len__(self):
+        return len(self._types)
+
+    def __contains__(self, location):
+        return self.find(location) is not None
+
+    def find(self, location):
+        """Returns the index of the entry of location, None if there's no such entry."""
+        key = location.encode("utf-8", "surrogateescape")
+        lo, hi = 0, len(self._order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            midKey = self._get_path_bytes(self._order[mid])
+            if midKey < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._order) and self._get_path_bytes(self._order[lo]) == key:
+            return self._order[lo]
+        return None
+
+    def get_path(self, i):
+        return self._get_path_bytes(i).decode("utf-8", "surrogateescape")
+
+    def get_type(self, i):
+        return _TYPES[self._types[i]]
+
+    def get_mtime(self, i):
+        return self._mtimes[i] if self._mtimes[i] != -1 else None
+
+    def get_md5(self, i):
+        if _TYPES[self._types[i]] != "obj":
+            return None
+        return self._md5s[i * 16:(i + 1) * 16].hex()
+
+    def get_target(self, i):
+        return self._targets.get(i)
+
+    def get_obj(self, i):
+        return _make_fs_obj(self.get_type(i), self.get_path(i), self.get_md5(i), self.get_mtime(i), self.get_target(i))
+
+    def iter_paths(self):
+        for i in range(0, len(self._types)):
+            yield self.get_path(i)
+
+    def _get_path_bytes(self, i):
+        return bytes(self._strings[self._offsets[i]:self._offsets[i + 1]])
+
+
+def iter_contents_file(path):
+    """Iterate over the entries of a contents file, lazily, through mmap.
+
+    Yields (type, path, md5, mtime, target) tuples, type is one of "obj", "sym", "dir", "dev" and "fif",
+    md5 (hex string), mtime (int) and target are None for the types which don't have them.
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                line = line.rstrip(b"\n").decode("utf-8", "surrogateescape")
+                if not line:
+                    continue
+                type, sep, rest = line.partition(" ")
+                if type in ("dir", "dev", "fif"):
+                    yield (type, rest, None, None, None)
+                elif type == "obj":
+                    # path may contain spaces, md5 and mtime never do
+                    location, md5, mtime = rest.rsplit(" ", 2)
+                    yield (type, location, md5, int(mtime), None)
+                elif type == "sym":
+                    rest, sep, mtime = rest.rpartition(" ")
+                    location, sep, target = rest.partition(" -> ")
+                    if sep == "":
+                        # XXX throw a corruption error
+                        raise ValueError(f"invalid sym entry {line!r}")
+                    yield (type, location, None, int(mtime), target)
+                else:
+                    raise Exception(f"unknown entry type {line!r}")
+
+
+def _make_fs_obj(type, location, md5, mtime, target):
+    if type == "dir":
+        return fs.fsDir(location, strict=False)
+    elif type == "dev":
+        return LookupFsDev(location, strict=False)
+    elif type == "fif":
+        return fs.fsFifo(location, strict=False)
+    elif type == "obj":
+        return fs.fsFile(location, chksums={"md5": int(md5, 16)}, mtime=mtime, strict=False)
+    elif type == "sym":
+        return fs.fsLink(location, target, mtime=mtime, strict=False)
+    else:
+        assert False
+
+
+_TYPES = ("obj", "sym", "dir", "dev", "fif")
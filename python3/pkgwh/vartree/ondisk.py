@@ -3,6 +3,7 @@ __all__ = ("tree", "ConfiguredTree")
 import errno
 import os
 import stat
+from contextlib import contextmanager
 from functools import partial
 
 from snakeoil import data_source
@@ -19,6 +20,7 @@ from ..package import base as pkg_base
 from ..repository import errors, prototype, wrapper
 from . import repo_ops
 from .contents import ContentsFile
+from .transaction import GroupCommit, recover
 
 
 class tree(prototype.tree):
@@ -47,6 +49,8 @@ class tree(prototype.tree):
             cache_location = pjoin("/var/cache/edb/dep", location.lstrip("/"))
         self.cache_location = cache_location
         self._versions_tmp_cache = {}
+        self.group_commit = None
+        self._recovered = False
         try:
             st = os.stat(self.location)
             if not stat.S_ISDIR(st.st_mode):
@@ -62,6 +66,27 @@ class tree(prototype.tree):
 
         self.package_class = self.package_factory(self)
 
+    def recover(self):
+        """Complete or remove the leftovers of interrupted merges, call it with the vdb locked, before merging.
+
+        It is called by the install and uninstall operations of the tree before their first change.
+        """
+        self._recovered = True
+        return recover(self.location)
+
+    @contextmanager
+    def grouped_commits(self, max_pending=32):
+        """Defer the fsync of the vdb category directories changed by the merges done in the with block."""
+        self.group_commit = GroupCommit(max_pending)
+        try:
+            yield self.group_commit
+        finally:
+            # entries of merged packages must be durable even if a later merge failed
+            try:
+                self.group_commit.flush()
+            finally:
+                self.group_commit = None
+
     def configure(self, *args):
         return ConfiguredTree(self, *args)
 
@@ -85,7 +110,7 @@ class tree(prototype.tree):
         bad = False
         try:
             for x in listdir_dirs(cpath):
-                if x.startswith(".tmp.") or x.endswith(".lockfile") \
+                if x.startswith((".tmp.", ".staged.")) or x.endswith(".lockfile") \
                         or x.startswith("-MERGING-"):
                     continue
                 try:
@@ -7,7 +7,7 @@ from itertools import chain
 
 from snakeoil import compression
 from snakeoil.data_source import local_source
-from snakeoil.osutils import ensure_dirs, normpath, pjoin
+from snakeoil.osutils import normpath, pjoin
 from snakeoil.version import get_version
 
 from .. import __title__
@@ -15,6 +15,7 @@ from ..ebuild import conditionals
 from ..log import logger
 from ..operations import repo as repo_ops
 from .contents import ContentsFile
+from .transaction import VdbTransaction
 
 
 def update_mtime(path, timestamp=None):
@@ -27,19 +28,32 @@ def update_mtime(path, timestamp=None):
         logger.error(f"failed updated vdb timestamp for {path!r}: {e}")
 
 
+def _recover(repo):
+    # leftovers of a crash are completed or removed before the first change of this process,
+    # when nothing is staged yet and the write lock is held
+    if not repo._recovered:
+        repo.recover()
+
+
 class install(repo_ops.install):
 
     def __init__(self, repo, newpkg, observer):
-        base = pjoin(repo.location, newpkg.category)
-        dirname = f"{newpkg.package}-{newpkg.fullver}"
-        self.install_path = pjoin(base, dirname)
-        self.tmp_write_path = pjoin(base, f".tmp.{dirname}")
+        self.transaction = VdbTransaction(
+            repo.location, newpkg.category, f"{newpkg.package}-{newpkg.fullver}")
+        self.install_path = self.transaction.install_path
+        self.tmp_write_path = self.transaction.tmp_path
         super().__init__(repo, newpkg, observer)
 
+    def start(self):
+        ret = super().start()
+        _recover(self.repo)
+        return ret
+
     def add_data(self, domain):
         # error checking?
+        txn = self.transaction
+        txn.begin()
         dirpath = self.tmp_write_path
-        ensure_dirs(dirpath, mode=0o755, minimal=True)
         update_mtime(self.repo.location)
         rewrite = self.repo._metadata_rewrites
         for k in self.new_pkg.tracked_attributes:
@@ -51,8 +65,7 @@ class install(repo_ops.install):
             elif k == "environment":
                 data = compression.compress_data('bzip2',
                     self.new_pkg.environment.bytes_fileobj().read())
-                with open(pjoin(dirpath, "environment.bz2"), "wb") as f:
-                    f.write(data)
+                txn.write("environment.bz2", data)
                 del data
             else:
                 v = getattr(self.new_pkg, k)
@@ -67,10 +80,9 @@ class install(repo_ops.install):
                         s = str(v)
                 else:
                     s = v
-                with open(pjoin(dirpath, rewrite.get(k, k.upper())), "w", 32768) as f:
-                    if s:
-                        s += '\n'
-                    f.write(s)
+                if s:
+                    s += '\n'
+                txn.write(rewrite.get(k, k.upper()), s)
 
         # ebuild_data is the actual ebuild- no point in holding onto
         # it for built ebuilds, but if it's there, we store it.
@@ -84,8 +96,7 @@ class install(repo_ops.install):
         else:
             o = o.bytes_fileobj().read()
         # XXX lil hackish accessing PF
-        with open(pjoin(dirpath, self.new_pkg.PF + ".ebuild"), "wb") as f:
-            f.write(o)
+        txn.write(self.new_pkg.PF + ".ebuild", o)
 
         # install NEEDED and NEEDED.ELF.2 files from tmpdir if they exist
         pkg_tmpdir = normpath(pjoin(domain.pm_tmpdir, self.new_pkg.category,
@@ -103,16 +114,22 @@ class install(repo_ops.install):
         # need to get zmedico to localize the counter
         # creation/counting to per CP for this trick to behave
         # perfectly.
-        with open(pjoin(dirpath, "COUNTER"), "w") as f:
-            f.write(str(int(time.time())))
+        txn.write("COUNTER", str(int(time.time())))
 
         # finally, we mark who made this.
-        with open(pjoin(dirpath, "PKGMANAGER"), "w") as f:
-            f.write(get_version(__title__, __file__))
+        txn.write("PKGMANAGER", get_version(__title__, __file__))
+
+        # the files of the package are merged already, from now on a crash completes the entry
+        txn.seal()
         return True
 
     def finalize_data(self):
-        os.rename(self.tmp_write_path, self.install_path)
+        group = self.repo.group_commit
+        if group is not None:
+            # moved into place now, the category directory is fsync'ed along with the other packages of the group
+            group.add_install(self.transaction)
+        else:
+            self.transaction.commit()
         update_mtime(self.repo.location)
         return True
 
@@ -124,12 +141,21 @@ class uninstall(repo_ops.uninstall):
             repo.location, pkg.category, pkg.package+"-"+pkg.fullver)
         super().__init__(repo, pkg, observer)
 
+    def start(self):
+        ret = super().start()
+        _recover(self.repo)
+        return ret
+
     def remove_data(self):
         return True
 
     def finalize_data(self):
         update_mtime(self.repo.location)
-        shutil.rmtree(self.remove_path)
+        group = self.repo.group_commit
+        if group is not None:
+            group.add_removal(self.remove_path)
+        else:
+            shutil.rmtree(self.remove_path)
         update_mtime(self.repo.location)
         return True
 
@@ -0,0 +1,152 @@
+"""
+transactional writes of vdb entries
+
+A package entry is written in ``<category>/.tmp.<PF>``. Once complete its files are fsync'ed and the
+directory is renamed to ``<category>/.staged.<PF>``, then renamed into place when the package is
+finalized, so a reader (or a crash) never sees a half written entry. A crash between the two renames
+leaves a complete entry of a package whose files are already merged, :obj:`recover` moves it into place.
+"""
+
+__all__ = ("VdbTransaction", "GroupCommit", "recover")
+
+import logging
+import os
+import shutil
+
+from snakeoil.osutils import ensure_dirs, pjoin
+
+logger = logging.getLogger(__name__)
+
+
+class VdbTransaction:
+    """Write of the vdb entry of one package.
+
+    Files are written into the staging directory with :obj:`write`, or by path with :obj:`stage_path`,
+    :obj:`seal` makes them durable once the entry is complete, then :obj:`commit` renames the entry
+    into place.
+    """
+
+    def __init__(self, location, category, pf):
+        self.category_path = pjoin(location, category)
+        self.install_path = pjoin(self.category_path, pf)
+        self.tmp_path = pjoin(self.category_path, f".tmp.{pf}")
+        self.staged_path = pjoin(self.category_path, f".staged.{pf}")
+
+    def begin(self):
+        # leftover of an interrupted merge of the same package
+        for path in (self.tmp_path, self.staged_path):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        ensure_dirs(self.tmp_path, mode=0o755, minimal=True)
+
+    def stage_path(self, name):
+        return pjoin(self.tmp_path, name)
+
+    def write(self, name, data):
+        """Write a file of the entry, data is str or bytes."""
+        if isinstance(data, bytes):
+            with open(pjoin(self.tmp_path, name), "wb") as f:
+                f.write(data)
+        else:
+            with open(pjoin(self.tmp_path, name), "w", 32768) as f:
+                f.write(data)
+
+    def seal(self):
+        """Mark the entry complete, after making its files durable; no file may be written afterwards."""
+        with os.scandir(self.tmp_path) as it:
+            for entry in it:
+                if entry.is_file(follow_symlinks=False):
+                    _fsync_path(entry.path)
+        _fsync_path(self.tmp_path)
+        os.rename(self.tmp_path, self.staged_path)
+
+    def commit(self, sync=True):
+        """Rename the sealed entry into place, sync=False if the category directory is fsync'ed by the caller."""
+        os.rename(self.staged_path, self.install_path)
+        if sync:
+            _fsync_path(self.category_path)
+
+    def abort(self):
+        for path in (self.tmp_path, self.staged_path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class GroupCommit:
+    """Commit of the vdb changes of several packages with one fsync per changed category directory.
+
+    Installs and removals are applied right away, so that the entry of a package is visible as soon
+    as its files are, only the fsync of the category directories is deferred to :obj:`flush`. Until
+    then a crash may undo the renames, which leaves sealed entries that :obj:`recover` moves into
+    place again. The queue is flushed when it holds max_pending packages.
+    """
+
+    def __init__(self, max_pending=32):
+        self.max_pending = max_pending
+        self._pending = 0
+        self._dirs = set()
+
+    def __len__(self):
+        return self._pending
+
+    def add_install(self, transaction):
+        transaction.commit(sync=False)
+        self._add(transaction.category_path)
+
+    def add_removal(self, path):
+        shutil.rmtree(path)
+        self._add(os.path.dirname(path))
+
+    def flush(self):
+        for path in self._dirs:
+            _fsync_path(path)
+        self._pending = 0
+        self._dirs = set()
+
+    def _add(self, dirpath):
+        self._dirs.add(dirpath)
+        self._pending += 1
+        if self._pending >= self.max_pending:
+            self.flush()
+
+
+def recover(location):
+    """Clean up after merges interrupted by a crash.
+
+    Sealed entries are moved into place, replacing an entry of the same package left by an interrupted
+    replace, incomplete entries and -MERGING- directories are removed.
+
+    :return: list of the removed directories
+    """
+    removed = []
+    try:
+        categories = [x for x in os.scandir(location) if x.is_dir() and not x.name.startswith(".")]
+    except FileNotFoundError:
+        return removed
+    for category in categories:
+        with os.scandir(category.path) as it:
+            entries = [x for x in it if x.is_dir(follow_symlinks=False)]
+        changed = False
+        for entry in entries:
+            if entry.name.startswith(".staged."):
+                install_path = pjoin(category.path, entry.name[len(".staged."):])
+                logger.warning(f"completing the vdb entry of an interrupted merge: {install_path!r}")
+                if os.path.exists(install_path):
+                    shutil.rmtree(install_path)
+                os.rename(entry.path, install_path)
+                changed = True
+            elif entry.name.startswith((".tmp.", "-MERGING-")):
+                logger.warning(f"removing leftover of an interrupted merge: {entry.path!r}")
+                shutil.rmtree(entry.path)
+                removed.append(entry.path)
+                changed = True
+        if changed:
+            _fsync_path(category.path)
+    return removed
+
+
+def _fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+# Parse every DEPEND/RDEPEND atom of a gentoo tree snapshot (taken from metadata/md5-cache)
+# with the single-regex parser used by Atom, and with the multi-pass find/slice parser
+# Atom used before, comparing their throughput and their results.
+#
+# The old parser is reproduced below as oldParseAtom(), since the in-tree one is gone. It
+# is kept as close as possible to the original, except that the category/package/version
+# split is fixed to accept hyphenated package names, which the original rejected.
+#
+# usage: benchmark-atom-parse.py [/var/db/repos/gentoo]
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "python3"))
+from libglep.core.pkg._parser import atom_re, ATOM_GROUPS
+from libglep.core.pkg._atom import Atom, InvalidPkgAtom
+
+
+def collectAtomList(repoDir):
+    ret = []
+    cacheDir = os.path.join(repoDir, "metadata", "md5-cache")
+    for category in sorted(os.listdir(cacheDir)):
+        categoryDir = os.path.join(cacheDir, category)
+        if not os.path.isdir(categoryDir):
+            continue
+        for fn in os.listdir(categoryDir):
+            with open(os.path.join(categoryDir, fn)) as f:
+                for line in f:
+                    key, sep, value = line.rstrip("\n").partition("=")
+                    if key not in ("DEPEND", "RDEPEND"):
+                        continue
+                    for token in value.split():
+                        if token in ("||", "(", ")") or token.endswith("?"):
+                            continue
+                        ret.append(token)
+    return ret
+
+
+_oldCategoryRe = re.compile(r"[A-Za-z0-9_][A-Za-z0-9+_.-]*")
+_oldPackageRe = re.compile(r"[A-Za-z0-9_][A-Za-z0-9+_-]*")
+_oldVersionRe = re.compile(r"\d+(?:\.\d+)*[a-zA-Z]?(?:_(?:alpha|beta|pre|rc|p)\d*)*")
+_oldRevisionRe = re.compile(r"r[1-9]\d*")
+_oldSlotRe = re.compile(r"[A-Za-z0-9_][A-Za-z0-9+_.-]*")
+_oldRepoRe = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_-]*")
+_oldUseFlagRe = re.compile(r"[A-Za-z0-9][A-Za-z0-9+_@-]*")
+
+
+def oldParseAtom(atom):
+    # returns the same components as atom_re.fullmatch(atom).groups(), or None
+    use = None
+    use_start = atom.find("[")
+    if use_start != -1:
+        use_end = atom.find("]", use_start)
+        if use_end != len(atom) - 1:
+            return None
+        use = atom[use_start + 1:use_end]
+        for x in use.split(","):
+            if x[-1:] in ("=", "?"):
+                x = x[:-1]
+                if x.startswith("!"):
+                    x = x[1:]
+            elif x.startswith("-"):
+                x = x[1:]
+            if x[-3:] in ("(+)", "(-)"):
+                x = x[:-3]
+            if not _oldUseFlagRe.fullmatch(x):
+                return None
+        atom = atom[:use_start]
+
+    repo_id = None
+    repo_id_start = atom.find("::")
+    if repo_id_start != -1:
+        repo_id = atom[repo_id_start + 2:]
+        if not _oldRepoRe.fullmatch(repo_id):
+            return None
+        atom = atom[:repo_id_start]
+
+    slot, subslot, slot_eq, slot_operator = None, None, None, None
+    slot_start = atom.find(":")
+    if slot_start != -1:
+        slot = atom[slot_start + 1:]
+        atom = atom[:slot_start]
+        if slot in ("*", "="):
+            slot, slot_operator = None, slot
+        else:
+            if slot.endswith("="):
+                slot, slot_eq = slot[:-1], "="
+            slots = slot.split("/")
+            if len(slots) > 2 or not all(_oldSlotRe.fullmatch(x) for x in slots):
+                return None
+            slot, subslot = (slots[0], None) if len(slots) == 1 else slots
+
+    blocks = None
+    if atom.startswith("!!"):
+        blocks, atom = "!!", atom[2:]
+    elif atom.startswith("!"):
+        blocks, atom = "!", atom[1:]
+
+    op = None
+    for x in ("<=", ">=", "<", ">", "=", "~"):
+        if atom.startswith(x):
+            op, atom = x, atom[len(x):]
+            break
+
+    post_wildcard = None
+    if atom.endswith("*"):
+        post_wildcard, atom = "*", atom[:-1]
+
+    try:
+        category, pkg_name_ver = atom.split("/")
+    except ValueError:
+        return None
+    if not _oldCategoryRe.fullmatch(category):
+        return None
+    pkg_chunks = pkg_name_ver.split("-")
+    rev = None
+    if len(pkg_chunks) > 2 and _oldRevisionRe.fullmatch(pkg_chunks[-1]):
+        rev = pkg_chunks.pop()
+    ver = None
+    if len(pkg_chunks) > 1 and _oldVersionRe.fullmatch(pkg_chunks[-1]):
+        ver = pkg_chunks.pop()
+    elif rev is not None:
+        return None
+    pkgname = "-".join(pkg_chunks)
+    if not _oldPackageRe.fullmatch(pkgname):
+        return None
+    if post_wildcard is not None and ver is None:
+        return None
+
+    return (blocks, op, category, pkgname, ver, rev, post_wildcard, slot, subslot, slot_eq, slot_operator, repo_id, use)
+
+
+def newParseAtom(atom):
+    m = atom_re.fullmatch(atom)
+    return m.groups() if m is not None else None
+
+
+def createAtom(atom):
+    try:
+        return Atom(atom)
+    except InvalidPkgAtom:
+        return None
+
+
+def timeit(title, func, count):
+    t = time.perf_counter()
+    func()
+    t = time.perf_counter() - t
+    print("%-40s %8.3f ms %10.0f atoms/s" % (title, t * 1000, count / t))
+
+
+if __name__ == "__main__":
+    repoDir = sys.argv[1] if len(sys.argv) > 1 else "/var/db/repos/gentoo"
+
+    atomList = collectAtomList(repoDir)
+    uniqueAtomList = sorted(set(atomList))
+    print("%d atoms, %d unique" % (len(atomList), len(uniqueAtomList)))
+    assert len(ATOM_GROUPS) == len(newParseAtom("=a/b-1"))
+
+    # correctness
+    mismatch = 0
+    for s in uniqueAtomList:
+        old, new = oldParseAtom(s), newParseAtom(s)
+        if old != new:
+            mismatch += 1
+            if mismatch <= 20:
+                print("mismatch: %s\n    old: %r\n    new: %r" % (s, old, new))
+    print("%d mismatches between the old and new parser" % (mismatch))
+
+    try:
+        from pkgcore.ebuild.atom import atom as pkgcoreAtom
+        from pkgcore.ebuild.errors import MalformedAtom
+    except ImportError:
+        pkgcoreAtom = None
+    if pkgcoreAtom is not None:
+        mismatch = 0
+        for s in uniqueAtomList:
+            try:
+                pkgcoreAtom(s)
+                ok = True
+            except MalformedAtom:
+                ok = False
+            if ok != (newParseAtom(s) is not None):
+                mismatch += 1
+                if mismatch <= 20:
+                    print("disagrees with pkgcore: %s (pkgcore %s)" % (s, "accepts" if ok else "rejects"))
+        print("%d disagreements with pkgcore" % (mismatch))
+
+    # throughput
+    timeit("old multi-pass parser", lambda: [oldParseAtom(x) for x in atomList], len(atomList))
+    timeit("new single-regex parser", lambda: [newParseAtom(x) for x in atomList], len(atomList))
+    timeit("Atom()", lambda: [createAtom(x) for x in atomList], len(atomList))
+    if pkgcoreAtom is not None:
+        timeit("pkgcore atom()", lambda: [pkgcoreAtom(x) for x in atomList], len(atomList))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+# Regenerate the whole md5-cache of a repository (typically an overlay after
+# share/repos-patch modifications) with an increasing number of jobs, to
+# measure how the worker pool scales. The repository is copied to a temporary
+# directory first, it is not modified.
+#
+# usage: benchmark-cache-regen.py <repo-dir> [eclass-dir ...]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "python3"))
+from pkgwh._repo_regen import CacheRegenerator
+
+
+def getJobsList():
+    ret = []
+    i = 1
+    while i < os.cpu_count():
+        ret.append(i)
+        i *= 2
+    ret.append(os.cpu_count())
+    return ret
+
+
+if __name__ == "__main__":
+    repoDir = sys.argv[1]
+    eclassDirs = sys.argv[2:] + [os.path.join(repoDir, "eclass")]
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        workDir = os.path.join(tmpDir, "repo")
+        shutil.copytree(repoDir, workDir, symlinks=True, ignore=shutil.ignore_patterns(".git", "md5-cache"))
+
+        base = None
+        for jobs in getJobsList():
+            shutil.rmtree(os.path.join(workDir, "metadata", "md5-cache"), ignore_errors=True)
+            regen = CacheRegenerator(workDir, eclass_dirs=eclassDirs, jobs=jobs)
+            stale = regen.find_stale()
+
+            t = time.perf_counter()
+            failed = regen.regenerate(stale)
+            t = time.perf_counter() - t
+            if base is None:
+                base = t
+            print("jobs=%-4d %6d entries %4d failed %9.3f s   speedup %5.2f" % (jobs, len(stale), len(failed), t, base / t))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# Compute md5, sha512 and blake2b of all the files of a directory (typically
+# an unpacked install image of several GB), first one file and one checksum
+# at a time through snakeoil like the lazy checksums of livefs objects do,
+# then with ChksumEngine and an increasing number of threads, to measure how
+# it scales with the number of cores. Drop the page cache between runs
+# (echo 3 > /proc/sys/vm/drop_caches) to include the disk in the measure.
+#
+# usage: benchmark-chksum.py <dir>
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "python3"))
+from snakeoil.chksum import get_chksums
+from snakeoil.data_source import local_source
+from libglep.fs._chksum import ChksumEngine
+
+
+CHKSUM_TYPES = ["md5", "sha512", "blake2b"]
+
+
+def getJobsList():
+    ret = []
+    i = 1
+    while i < os.cpu_count():
+        ret.append(i)
+        i *= 2
+    ret.append(os.cpu_count())
+    return ret
+
+
+def getFiles(topDir):
+    ret = []
+    for root, dirs, files in os.walk(topDir):
+        for fn in files:
+            fullfn = os.path.join(root, fn)
+            if os.path.isfile(fullfn) and not os.path.islink(fullfn):
+                ret.append(fullfn)
+    return ret
+
+
+if __name__ == "__main__":
+    fileList = getFiles(sys.argv[1])
+    totalSize = sum([os.path.getsize(x) for x in fileList])
+    print("%d files, %.1f MiB" % (len(fileList), totalSize / 1024 / 1024))
+
+    t = time.perf_counter()
+    serial = dict()
+    for fullfn in fileList:
+        serial[fullfn] = [get_chksums(local_source(fullfn), x)[0] for x in CHKSUM_TYPES]
+    base = time.perf_counter() - t
+    print("serial     %9.3f s  %8.1f MiB/s" % (base, totalSize / 1024 / 1024 / base))
+
+    for jobs in getJobsList():
+        t = time.perf_counter()
+        with ChksumEngine(CHKSUM_TYPES, jobs) as engine:
+            for fullfn, chksums in engine.map(fileList):
+                assert [chksums[x] for x in CHKSUM_TYPES] == serial[fullfn]
+        t = time.perf_counter() - t
+        print("jobs=%-4d  %9.3f s  %8.1f MiB/s  speedup %5.2f" % (jobs, t, totalSize / 1024 / 1024 / t, base / t))
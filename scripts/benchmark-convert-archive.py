@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+# Generate a synthetic binpkg-like tarball (200k entries by default) where
+# many directories are symlinks, some of them below other symlinked
+# directories, then convert it to a ContentsSet with the former cmp-sort +
+# restart-loop implementation of tar.convert_archive() and with the current
+# prefix map one, and print the time and peak memory of each. The old
+# implementation is skipped with --new-only, it is quadratic in the number of
+# symlinks. It also doesn't follow a symlink whose target is below another
+# symlinked directory, so the entries below the nested symlinks are expected
+# to differ.
+#
+# usage: benchmark-convert-archive.py [--new-only] [entries]
+
+import io
+import os
+import sys
+import time
+import tarfile
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "python3"))
+from snakeoil.compatibility import cmp, sorted_cmp
+from libglep.fs import contents, tar
+
+
+FILES_PER_DIR = 50
+
+
+def oldConvertArchive(archive):
+    # tar.convert_archive() before the prefix map
+    raw = list(tar.archive_to_fsobj(archive))
+    files_ordering = list(enumerate(x for x in raw if x.is_reg))
+    files_ordering = {x.data: idx for idx, x in files_ordering}
+    t = contents.ContentsSet(raw, mutable=True)
+    del raw, archive
+
+    raw_syms = t.links()
+    syms = contents.ContentsSet(raw_syms)
+    while True:
+        for x in sorted(syms):
+            affected = syms.child_nodes(x.location)
+            if not affected:
+                continue
+            syms.difference_update(affected)
+            syms.update(affected.change_offset(x.location, x.resolved_target))
+            del affected
+            break
+        else:
+            break
+
+    t.difference_update(raw_syms)
+    t.update(syms)
+
+    del raw_syms
+    syms = sorted(syms, reverse=True)
+    additions = []
+    for x in syms:
+        affected = t.child_nodes(x.location)
+        if not affected:
+            continue
+        t.difference_update(affected)
+        additions.extend(affected.change_offset(x.location, x.resolved_target))
+
+    t.update(additions)
+    t.add_missing_directories()
+
+    def sort_func(x, y):
+        if x.is_dir:
+            if not y.is_dir:
+                return -1
+            return cmp(x, y)
+        elif y.is_dir:
+            return +1
+        elif x.is_reg:
+            if y.is_reg:
+                return cmp(files_ordering[x.data],
+                    files_ordering[y.data])
+            return +1
+        elif y.is_reg:
+            return -1
+        return cmp(x, y)
+
+    return contents.OrderedContentsSet(sorted_cmp(t, sort_func), mutable=False)
+
+
+def addMember(tf, name, type, linkname=""):
+    ti = tarfile.TarInfo(name)
+    ti.type = type
+    ti.linkname = linkname
+    ti.mode = 0o755 if type != tarfile.REGTYPE else 0o644
+    ti.mtime = 1700000000
+    tf.addfile(ti, io.BytesIO(b"") if type == tarfile.REGTYPE else None)
+
+
+def createTarball(path, entryCount):
+    # usr/lib -> lib64 like layouts: each package dir has a symlinked "lib"
+    # directory, and a symlinked "share" below it pointing to a common dir.
+    # entries below the symlinks are stored in the archive through the
+    # symlinked path, as found in binpkgs of badly behaved build systems.
+    n = 0
+    with tarfile.open(path, "w") as tf:
+        addMember(tf, "./usr", tarfile.DIRTYPE)
+        addMember(tf, "./usr/share", tarfile.DIRTYPE)
+        i = 0
+        while n < entryCount:
+            pkg = "./opt/pkg%d" % i
+            addMember(tf, pkg, tarfile.DIRTYPE)
+            addMember(tf, pkg + "/lib64", tarfile.DIRTYPE)
+            addMember(tf, pkg + "/lib", tarfile.SYMTYPE, "lib64")
+            addMember(tf, pkg + "/lib/share", tarfile.SYMTYPE, "../../../usr/share/pkg%d" % i)
+            n += 4
+            for j in range(FILES_PER_DIR):
+                addMember(tf, "%s/lib/f%d.so" % (pkg, j), tarfile.REGTYPE)
+                addMember(tf, "%s/lib/share/d%d" % (pkg, j), tarfile.REGTYPE)
+                n += 2
+            i += 1
+    return n
+
+
+def run(func, path):
+    tracemalloc.start()
+    t = time.perf_counter()
+    with tarfile.open(path) as tf:
+        ret = func(tf)
+    t = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ret, t, peak
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    newOnly = "--new-only" in args
+    args = [x for x in args if x != "--new-only"]
+    entryCount = int(args[0]) if args else 200000
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "bench.tar")
+        n = createTarball(path, entryCount)
+        print("%d entries" % n)
+
+        new, t, peak = run(tar.convert_archive, path)
+        print("prefix map   %9.3f s  %8.1f MiB peak  %d entries" % (t, peak / 1024 / 1024, len(new)))
+
+        if not newOnly:
+            old, t, peak = run(oldConvertArchive, path)
+            print("restart loop %9.3f s  %8.1f MiB peak  %d entries" % (t, peak / 1024 / 1024, len(old)))
+            diff = set(x.location for x in old).symmetric_difference(x.location for x in new)
+            print("%d locations differ" % len(diff))
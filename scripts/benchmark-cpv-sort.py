@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# Sort every CPV of a gentoo tree snapshot, per package (best-version selection)
+# and as a whole, to measure the cost of CPV comparison.
+#
+# usage: benchmark-cpv-sort.py [/var/db/repos/gentoo]
+
+import os
+import sys
+import time
+import random
+import functools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "python3"))
+from libglep.core.pkg._cpv import CPV, package_fullver_cmp
+
+
+def collectCpvList(repoDir):
+    ret = []
+    with open(os.path.join(repoDir, "profiles", "categories")) as f:
+        categories = [x.strip() for x in f.read().split("\n") if x.strip() != ""]
+    for category in categories:
+        categoryDir = os.path.join(repoDir, category)
+        if not os.path.isdir(categoryDir):
+            continue
+        for pkgName in os.listdir(categoryDir):
+            pkgDir = os.path.join(categoryDir, pkgName)
+            if not os.path.isdir(pkgDir):
+                continue
+            for fn in os.listdir(pkgDir):
+                if not fn.endswith(".ebuild"):
+                    continue
+                fullver = fn[len(pkgName) + 1:-len(".ebuild")]
+                ver, sep, rev = fullver.rpartition("-r")
+                if sep == "" or not rev.isdigit():
+                    ver, rev = fullver, None
+                else:
+                    rev = "r" + rev
+                if rev is None:
+                    ret.append(CPV(category, pkgName, ver, _do_check=False))
+                else:
+                    ret.append(CPV(category, pkgName, ver, rev, _do_check=False))
+    return ret
+
+
+_uncachedKey = functools.cmp_to_key(lambda a, b: package_fullver_cmp(a.ver, a.rev, b.ver, b.rev))
+
+
+def timeit(title, func):
+    t = time.perf_counter()
+    func()
+    print("%-40s %8.3f ms" % (title, (time.perf_counter() - t) * 1000))
+
+
+if __name__ == "__main__":
+    repoDir = sys.argv[1] if len(sys.argv) > 1 else "/var/db/repos/gentoo"
+
+    cpvList = collectCpvList(repoDir)
+    random.shuffle(cpvList)
+    cpvDict = dict()
+    for cpv in cpvList:
+        cpvDict.setdefault(cpv.cp_str, []).append(cpv)
+    print("%d CPVs in %d packages" % (len(cpvList), len(cpvDict)))
+
+    timeit("per-package sort, no cached keys", lambda: [sorted(x, key=_uncachedKey) for x in cpvDict.values()])
+    timeit("per-package sort, first run", lambda: [sorted(x) for x in cpvDict.values()])
+    timeit("per-package sort, cached keys", lambda: [sorted(x) for x in cpvDict.values()])
+    timeit("per-package max, cached keys", lambda: [max(x) for x in cpvDict.values()])
+    timeit("whole tree sort by (cp, version_key)", lambda: sorted(cpvList, key=lambda x: (x.category, x.package, x.version_key)))
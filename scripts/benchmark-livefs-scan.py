@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+# Scan a big directory tree (typically /usr) with find -printf, with the
+# former listdir + lstat implementation of livefs.iter_scan(), and with the
+# os.scandir based one in full and light mode, and print the time of each
+# relative to find. The light mode is expected to be within 3x of find.
+#
+# usage: benchmark-livefs-scan.py [dir]
+
+import os
+import sys
+import time
+import collections
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "python3"))
+from libglep.fs import livefs
+
+
+def oldIterScan(path):
+    # livefs._internal_iter_scan() before it was moved to os.scandir
+    dirs = collections.deque([os.path.normpath(path)])
+    obj = livefs.gen_obj(dirs[0])
+    yield obj
+    while dirs:
+        base = dirs.popleft()
+        for x in os.listdir(base):
+            p = os.path.join(base, x)
+            obj = livefs.gen_obj(p, real_location=p)
+            yield obj
+            if obj.is_dir:
+                dirs.append(p)
+
+
+def timeIt(func):
+    t = time.perf_counter()
+    n = func()
+    return n, time.perf_counter() - t
+
+
+def runFind(path):
+    out = subprocess.check_output(["find", path, "-printf", "%p %y\n"])
+    return out.count(b"\n")
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "/usr"
+
+    # warm up the dentry and inode caches, so that all the runs are measured in the same conditions
+    runFind(path)
+
+    n, base = timeIt(lambda: runFind(path))
+    print("find -printf          %8d entries %9.3f s" % (n, base))
+
+    for name, func in [
+        ("listdir + lstat (old)", lambda: sum(1 for x in oldIterScan(path))),
+        ("scandir, full", lambda: sum(1 for x in livefs.iter_scan(path))),
+        ("scandir, light", lambda: sum(1 for x in livefs.iter_scan(path, light=True))),
+    ]:
+        n, t = timeIt(func)
+        print("%-21s %8d entries %9.3f s  %5.1fx find" % (name, n, t, t / base))
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import threading
+import pytest
+from libglep.core.pkg import CP, CPV, PkgAtom, enable_interning, disable_interning, get_interning_stats
+
+
+@pytest.fixture
+def interning():
+    enable_interning(maxsize=4)
+    yield
+    disable_interning()
+
+
+def test_disabled():
+    assert get_interning_stats() is None
+    assert CP("a/b") is not CP("a/b")
+    assert CP("a/b") == CP("a/b")
+
+
+def test_same_instance(interning):
+    assert CP("a/b") is CP("a/b")
+    assert CPV("a/b-1") is CPV("a/b-1")
+    assert PkgAtom(">=a/b-1:2") is PkgAtom(">=a/b-1:2")
+    assert CP("a/b") is not CP("a/c")
+
+    stats = get_interning_stats()
+    assert stats.hits == 4
+    assert stats.misses == 4
+
+
+def test_do_check_shares_key(interning):
+    assert CP("a", "b", _do_check=False) is CP("a", "b")
+
+
+def test_eviction(interning):
+    first = CP("a/b")
+    for x in "cdef":
+        CP("a/" + x)
+    assert get_interning_stats().size == 4
+    assert CP("a/b") is not first
+
+
+def test_immutable(interning):
+    cp = CP("a/b")
+    with pytest.raises(AttributeError):
+        cp.category = "c"
+    with pytest.raises(AttributeError):
+        del cp.package
+
+
+def test_threads():
+    enable_interning(maxsize=64)
+    try:
+        results = [[] for _ in range(8)]
+        barrier = threading.Barrier(len(results))
+
+        def run(ret):
+            barrier.wait()
+            for i in range(2000):
+                ret.append(CPV(f"a/b-{i % 100}"))
+
+        threads = [threading.Thread(target=run, args=(x,)) for x in results]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert all(len(x) == 2000 for x in results)
+        stats = get_interning_stats()
+        assert stats.size == 64
+        assert stats.hits + stats.misses == 8 * 2000
+    finally:
+        disable_interning()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import pytest
+from libglep.core.pkg import CPV, PkgAtom, PkgWildcard, package_version_glob_match, parse_atoms
+from libglep.core.pkg._atom import InvalidPkgAtom
+from libglep.core.pkg._wildcard import InvalidPkgWildcard
+
+
+@pytest.mark.parametrize("s", [
+    "a/b",
+    "=a/b-1.2*",
+    ">=a/b-1-r2",
+    "~a/b-1",
+    "<a/b-c-1_rc1",
+    "a/b:2",
+    "a/b:2/3",
+    "a/b:2=",
+    "a/b:2/3=",
+    "a/b:=",
+    "a/b:*",
+    "!a/b",
+    "!!a/b::gentoo",
+    "a/b[-bar,foo]",
+    ">=a/b-1:1/2=::gentoo[!foo=,bar?]",
+])
+def test_atom_roundtrip(s):
+    assert str(PkgAtom(s)) == s
+
+
+def test_atom_components():
+    atom = PkgAtom("!!>=dev-lang/python-3.11-r1:3.11/3.11=::gentoo[sqlite,-tk]")
+    assert atom.blocks and atom.blocks_strongly
+    assert atom.op == ">="
+    assert (atom.category, atom.package, atom.ver, atom.rev) == ("dev-lang", "python", "3.11", "r1")
+    assert (atom.slot, atom.subslot, atom.slot_operator) == ("3.11", "3.11", "=")
+    assert atom.repo_id == "gentoo"
+    assert atom.use == ("-tk", "sqlite")
+    assert not atom.post_wildcard
+
+    atom = PkgAtom("a/b:*")
+    assert (atom.slot, atom.subslot, atom.slot_operator) == (None, None, "*")
+
+    atom = PkgAtom("=a/b-1*")
+    assert atom.post_wildcard
+    assert atom.ver == "1"
+
+
+@pytest.mark.parametrize("s, err", [
+    ("b", "no category component"),
+    ("a/b-1", "versioned atom requires an operator"),
+    (">=a/b", "'>=' operator requires a version"),
+    ("~a/b-1-r1", "'~' operator cannot be combined with a revision"),
+    (">=a/b-1*", "'*' postfix requires '=' operator"),
+    ("a/b:", "empty slot targets aren't allowed"),
+    ("a/b:1/2/3", "redundant character in slot/subslot component: '1/2/3'"),
+    ("a/b::", "repo_id must not be empty"),
+    ("a/b[foo", "use restriction isn't completed"),
+    ("a/b[foo]x", "trailing garbage after use dep"),
+    ("a/b[fo%o]", "invalid use dep: 'fo%o'"),
+    (">=a/foo-1-2", "package name must not end in a hyphen followed by a version"),
+    ("=a/foo-1-1", "package name must not end in a hyphen followed by a version"),
+    ("=a/foo-1-r1-2:0", "package name must not end in a hyphen followed by a version"),
+])
+def test_atom_invalid(s, err):
+    with pytest.raises(InvalidPkgAtom) as e:
+        PkgAtom(s)
+    assert str(e.value).endswith(err)
+
+
+@pytest.mark.parametrize("s", ["*/*", "dev-*/py*", "=a/b-1.2*:2", ">=a/b*-1::gentoo"])
+def test_wildcard_roundtrip(s):
+    assert str(PkgWildcard(s)) == s
+
+
+def test_package_name_ending_in_version():
+    assert PkgAtom("a/foo-1-bar").package == "foo-1-bar"
+    assert PkgAtom("=a/foo-bar-1-r1").package == "foo-bar"
+    assert PkgAtom("a/foo-r1").package == "foo-r1"
+    assert CPV("a/foo-1-bar-2").package == "foo-1-bar"
+    with pytest.raises(TypeError):
+        CPV("a/foo-1-1")
+    with pytest.raises(InvalidPkgWildcard):
+        PkgWildcard("a/foo*-1")
+    parsed = parse_atoms(["=a/foo-1-1", "a/foo"])
+    assert [row for row, _ in parsed.errors] == [0]
+
+
+@pytest.mark.parametrize("s", ["!a/b", "a/b:=", "a/b[foo]", "a/b-1"])
+def test_wildcard_invalid(s):
+    with pytest.raises(InvalidPkgWildcard):
+        PkgWildcard(s)
+
+
+@pytest.mark.parametrize("prefix, fullver, ret", [
+    ("1.2", "1.2", True),
+    ("1.2", "1.2.3", True),
+    ("1.2", "1.2a", True),
+    ("1.2", "1.2_rc1", True),
+    ("1.2", "1.2-r1", True),
+    ("1.2", "1.20", False),
+    ("1.2", "1.1", False),
+    ("1.2_rc", "1.2_rc1", True),
+    ("1.", "1.5", True),
+])
+def test_version_glob_match(prefix, fullver, ret):
+    assert package_version_glob_match(prefix, fullver) == ret
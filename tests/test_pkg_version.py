@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import pytest
+from libglep.core.pkg import CPV
+from libglep.core.pkg._cpv import package_version_key, package_fullver_cmp
+
+
+# each version is lower than the next one
+_ordered = [
+    ("1.0_alpha", None),
+    ("1.0_alpha1", None),
+    ("1.0_beta", None),
+    ("1.0_pre", None),
+    ("1.0_rc1", None),
+    ("1.0_rc2", None),
+    ("1.0", None),
+    ("1.0", "r1"),
+    ("1.0", "r2"),
+    ("1.0_p", None),
+    ("1.0_p1", None),
+    ("1.0a", None),
+    ("1.0.0", None),
+    ("1.01", None),
+    ("1.02.1", None),
+    ("1.1", None),
+    ("1.2_rc1_p1", None),
+    ("1.2", None),
+    ("1.10", None),
+    ("2", None),
+    ("10", None),
+]
+
+
+def test_version_key_order():
+    keys = [package_version_key(ver, rev) for ver, rev in _ordered]
+    for i in range(len(keys) - 1):
+        assert keys[i] < keys[i + 1], _ordered[i:i + 2]
+
+
+def test_version_key_equal():
+    assert package_version_key("1.0", "r0") == package_version_key("1.0")
+    assert package_version_key("1.010") == package_version_key("1.01")
+    assert package_version_key("1.0") == package_version_key("1.00")
+    assert package_version_key("01") == package_version_key("1")
+
+
+@pytest.mark.parametrize("ver1, rev1, ver2, rev2, ret", [
+    ("1.0", None, "1.0", None, 0),
+    ("1.0", None, "1.0", "r1", -1),
+    ("1.1", None, "1.0", "r9", 1),
+    ("1.0_rc1", None, "1.0", None, -1),
+])
+def test_fullver_cmp(ver1, rev1, ver2, rev2, ret):
+    assert package_fullver_cmp(ver1, rev1, ver2, rev2) == ret
+    assert package_fullver_cmp(ver2, rev2, ver1, rev1) == -ret
+
+
+def test_cpv_order():
+    cpvs = [CPV("a", "b", ver) if rev is None else CPV("a", "b", ver, rev) for ver, rev in _ordered]
+    assert sorted(reversed(cpvs)) == cpvs
+    assert CPV("a/b-1.0") < CPV("a/b-1.0-r1") <= CPV("a/b-1.0-r1")
+    assert CPV("a/b-1.1") > CPV("a/b-1.0-r1") >= CPV("a/b-1.0-r1")
+    assert CPV("a/b-1.0").version_key == package_version_key("1.0")
+
+
+def test_cpv_components():
+    cpv = CPV("dev-lang/python-3.11.4_p1-r2")
+    assert (cpv.category, cpv.package, cpv.ver, cpv.rev) == ("dev-lang", "python", "3.11.4_p1", "r2")
+    assert cpv.fullver == "3.11.4_p1-r2"
+    assert cpv.cp_str == "dev-lang/python"
+    assert cpv.cpv_str == "dev-lang/python-3.11.4_p1-r2"
+    assert CPV("dev-lang", "python", "3.11.4_p1", "r2") == cpv
+
+    cpv = CPV("a/b-c-1")
+    assert (cpv.package, cpv.ver, cpv.rev) == ("b-c", "1", None)
+
+
+@pytest.mark.parametrize("s", ["a/b", "a/b-", "a/b-1.", "a/b-1-r0", "a/b-1_foo", "b-1"])
+def test_cpv_invalid(s):
+    with pytest.raises(TypeError):
+        CPV(s)
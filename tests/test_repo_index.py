@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import random
+import pytest
+from libglep.core.pkg import CPV, PkgAtom, package_version_glob_match
+
+# libglep.repo needs the full dependency set
+RepoIndex = pytest.importorskip("libglep.repo", exc_type=ImportError).RepoIndex
+
+
+_versions = ["0.9", "1.0_rc1", "1.0", "1.0-r1", "1.0-r2", "1.0a", "1.0.1", "1.2", "1.2.3",
+             "1.2_p1", "1.20", "2.0_beta1", "2.0", "10"]
+
+_slots = {
+    "0.9": ("0", None),
+    "1.0_rc1": ("1", "1.0"),
+    "1.0": ("1", "1.0"),
+    "1.0-r1": ("1", "1.0"),
+    "1.0-r2": ("1", "1.0"),
+    "1.0a": ("1", "1.0"),
+    "1.0.1": ("1", "1.0"),
+    "1.2": ("1", "1.2"),
+    "1.2.3": ("1", "1.2"),
+    "1.2_p1": ("1", "1.2"),
+    "1.20": ("1", "1.20"),
+    "2.0_beta1": ("2", "2"),
+    "2.0": ("2", "2"),
+    "10": ("10", "10"),
+}
+
+
+class _FakeRepo:
+
+    def __init__(self, location, cpvs):
+        self.repo_name = "test"
+        self.location = location
+        self.cpvs = cpvs
+        self.queries = 0
+        for x in cpvs:
+            (location / x.category / x.package).mkdir(parents=True, exist_ok=True)
+
+    def query_CPVs(self, cp):
+        self.queries += 1
+        ret = [x for x in self.cpvs if (x.category, x.package) == (cp.category, cp.package)]
+        random.shuffle(ret)
+        return ret
+
+
+def _match_naive(cpvs, atom):
+    # linear scan with plain version comparison, for reference
+    ret = []
+    for x in cpvs:
+        if (x.category, x.package) != (atom.category, atom.package):
+            continue
+        if atom.slot is not None and _slots[x.fullver][0] != atom.slot:
+            continue
+        if atom.subslot is not None and _slots[x.fullver][1] != atom.subslot:
+            continue
+        if atom.op is not None:
+            other = CPV(atom.category, atom.package, atom.ver) if atom.rev is None else \
+                CPV(atom.category, atom.package, atom.ver, atom.rev)
+            if atom.post_wildcard:
+                if not package_version_glob_match(other.fullver, x.fullver):
+                    continue
+            elif atom.op == "~":
+                if x.ver != atom.ver:
+                    continue
+            elif not {"=": x == other, "<": x < other, "<=": x <= other, ">": x > other, ">=": x >= other}[atom.op]:
+                continue
+        ret.append(x)
+    return tuple(sorted(ret))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    random.seed(0)
+    cpvs = [CPV("a/b-" + x) for x in _versions] + [CPV("a/c-1.0")]
+    return _FakeRepo(tmp_path, cpvs)
+
+
+@pytest.mark.parametrize("s", [
+    "a/b",
+    "=a/b-1.0",
+    "=a/b-1.0-r1",
+    "=a/b-1.1",
+    "~a/b-1.0",
+    "<a/b-1.0",
+    "<=a/b-1.0-r1",
+    ">a/b-1.0",
+    ">=a/b-2.0_alpha",
+    ">a/b-10",
+    "=a/b-1*",
+    "=a/b-1.2*",
+    "=a/b-1.0-r1*",
+    "=a/b-3*",
+    "a/b:1",
+    ">=a/b-1.0:1",
+    "=a/b-1.2*:1/1.2",
+    "<a/b-2:2",
+    "a/b:3",
+])
+def test_match(repo, s):
+    index = RepoIndex(repo, slot_getter=lambda x: _slots[x.fullver])
+    atom = PkgAtom(s)
+    expected = _match_naive(repo.cpvs, atom)
+    assert index.match(atom) == expected
+    assert index.best_match(atom) == (expected[-1] if len(expected) > 0 else None)
+
+
+def test_match_glob_boundary(repo):
+    index = RepoIndex(repo)
+    assert [x.fullver for x in index.match(PkgAtom("=a/b-1.2*"))] == ["1.2", "1.2_p1", "1.2.3"]
+
+
+def test_no_package(repo):
+    index = RepoIndex(repo)
+    assert index.match(PkgAtom("a/d")) == ()
+    assert index.best_match(PkgAtom(">=x/y-1")) is None
+    assert index.match(PkgAtom("a/b::other")) == ()
+    assert len(index.match(PkgAtom("a/b::test"))) == len(_versions)
+
+
+def test_lazy(repo):
+    index = RepoIndex(repo)
+    assert repo.queries == 0
+    index.match(PkgAtom("a/b"))
+    index.best_match(PkgAtom(">a/b-1"))
+    assert repo.queries == 1
+    index.match(PkgAtom("a/c"))
+    assert repo.queries == 2
+    index.clear()
+    index.match(PkgAtom("a/b"))
+    assert repo.queries == 3
+
+
+def test_slot_needs_getter(repo):
+    with pytest.raises(ValueError):
+        RepoIndex(repo).match(PkgAtom("a/b:1"))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import random
+import pytest
+
+# libglep.core.restriction needs the full dependency set
+packages = pytest.importorskip("libglep.core.restriction.packages", exc_type=ImportError)
+from libglep.core.restriction import restriction, values
+
+
+class _Pkg:
+
+    def __init__(self, i, rnd):
+        self.category = rnd.choice(["dev-lang", "sys-apps", "app-misc"])
+        self.package = f"p{i}"
+        self.keywords = tuple(rnd.sample(["amd64", "~amd64", "x86", "~x86", "arm64"], rnd.randint(0, 4)))
+        if i % 7 != 0:
+            # the others lack the attribute
+            self.license = rnd.choice(["GPL-2", "MIT", "BSD", "GPL-3", None])
+
+    def __repr__(self):
+        return self.package
+
+
+@pytest.fixture(scope="module")
+def pkgs():
+    rnd = random.Random(0)
+    return [_Pkg(i, rnd) for i in range(500)]
+
+
+def _restrictions():
+    license_mit = packages.PackageRestriction("license", values.StrExactMatch("MIT"))
+    license_gpl = packages.PackageRestriction("license", values.StrRegex("GPL"), negate=True)
+    category = packages.PackageRestriction("category", values.StrGlobMatch("dev-"))
+    package = packages.PackageRestriction("package", values.StrGlobMatch("7", prefix=False))
+    any_keyword = packages.PackageRestriction("keywords", values.ContainmentMatch2(("amd64", "x86")))
+    all_keywords = packages.PackageRestriction("keywords", values.ContainmentMatch2(("amd64", "~x86"), match_all=True))
+    license_mit_nocase = packages.PackageRestriction("license", values.StrExactMatch("mit", case_sensitive=False))
+    return [
+        license_mit,
+        license_gpl,
+        category,
+        package,
+        any_keyword,
+        all_keywords,
+        license_mit_nocase,
+        packages.AndRestriction(license_mit, any_keyword),
+        packages.OrRestriction(license_gpl, category, negate=True),
+        packages.AndRestriction(packages.OrRestriction(category, package), all_keywords, license_mit_nocase, negate=True),
+        packages.AndRestriction(),
+        packages.OrRestriction(),
+        packages.AlwaysBool(negate=True),
+        restriction.Negate(any_keyword),
+        packages.PackageRestrictionMulti(("license", "category"), values.AnyMatch(values.StrGlobMatch("dev"))),
+    ]
+
+
+@pytest.mark.parametrize("restrict", _restrictions(), ids=str)
+def test_match_many(pkgs, restrict):
+    assert restrict.match_many(pkgs) == [restrict.match(x) for x in pkgs]
+
+
+@pytest.mark.parametrize("restrict", [
+    values.StrExactMatch("MIT"),
+    values.StrExactMatch("mit", case_sensitive=False, negate=True),
+    values.StrRegex("^GPL-[23]$"),
+    values.StrGlobMatch("GPL"),
+    values.StrGlobMatch("2", prefix=False, negate=True),
+    values.AlwaysTrue,
+])
+def test_match_many_values(restrict):
+    vals = ["MIT", "mit", "GPL-2", "GPL-3", "BSD-2", "GPL-2", ""]
+    assert restrict.match_many(vals) == [restrict.match(x) for x in vals]
+
+
+def test_match_many_empty():
+    assert packages.PackageRestriction("license", values.StrExactMatch("MIT")).match_many([]) == []
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import os
+import pytest
+
+# pkgwh needs the full dependency set
+transaction = pytest.importorskip("pkgwh.vartree.transaction", exc_type=ImportError)
+VdbTransaction = transaction.VdbTransaction
+GroupCommit = transaction.GroupCommit
+recover = transaction.recover
+
+
+def _entry(location, category, pf, **files):
+    txn = VdbTransaction(str(location), category, pf)
+    txn.begin()
+    for name, data in files.items():
+        txn.write(name, data)
+    return txn
+
+
+def test_commit(tmp_path):
+    txn = _entry(tmp_path, "a", "b-1", SLOT="0\n", environment=b"\x00")
+    assert os.listdir(tmp_path / "a") == [".tmp.b-1"]
+
+    txn.seal()
+    assert os.listdir(tmp_path / "a") == [".staged.b-1"]
+
+    txn.commit()
+    assert os.listdir(tmp_path / "a") == ["b-1"]
+    assert sorted(os.listdir(txn.install_path)) == ["SLOT", "environment"]
+    assert (tmp_path / "a" / "b-1" / "SLOT").read_text() == "0\n"
+    assert (tmp_path / "a" / "b-1" / "environment").read_bytes() == b"\x00"
+
+
+def test_begin_discards_leftover(tmp_path):
+    _entry(tmp_path, "a", "b-1", SLOT="0\n").seal()
+    txn = _entry(tmp_path, "a", "b-1", CATEGORY="a\n")
+    assert os.listdir(tmp_path / "a") == [".tmp.b-1"]
+    assert os.listdir(txn.tmp_path) == ["CATEGORY"]
+
+
+def test_abort(tmp_path):
+    _entry(tmp_path, "a", "b-1", SLOT="0\n").abort()
+    txn = _entry(tmp_path, "a", "b-2", SLOT="0\n")
+    txn.seal()
+    txn.abort()
+    assert os.listdir(tmp_path / "a") == []
+
+
+def test_group_commit(tmp_path):
+    old = _entry(tmp_path, "a", "old-1", SLOT="0\n")
+    old.seal()
+    old.commit()
+
+    group = GroupCommit(max_pending=10)
+    for i in range(3):
+        txn = _entry(tmp_path, "a", f"b-{i}", SLOT="0\n")
+        txn.seal()
+        group.add_install(txn)
+        # visible right away
+        assert os.path.isdir(txn.install_path)
+    group.add_removal(old.install_path)
+    assert len(group) == 4
+    assert sorted(os.listdir(tmp_path / "a")) == ["b-0", "b-1", "b-2"]
+
+    group.flush()
+    assert len(group) == 0
+
+    # nothing pending
+    group.flush()
+
+
+def test_group_commit_max_pending(tmp_path):
+    group = GroupCommit(max_pending=2)
+    for i in range(3):
+        txn = _entry(tmp_path, "a", f"b-{i}")
+        txn.seal()
+        group.add_install(txn)
+        assert len(group) == [1, 0, 1][i]
+    group.add_removal(str(tmp_path / "a" / "b-1"))
+    assert len(group) == 0
+    assert sorted(os.listdir(tmp_path / "a")) == ["b-0", "b-2"]
+
+
+def test_recover(tmp_path):
+    txn = _entry(tmp_path, "a", "b-1", SLOT="0\n")
+    txn.seal()
+    txn.commit()
+    _entry(tmp_path, "a", "b-2")
+    _entry(tmp_path, "a", "b-3", SLOT="1\n").seal()
+    # interrupted replace of c/d-1 by itself
+    _entry(tmp_path, "c", "d-1", SLOT="0\n").seal()
+    (tmp_path / "c" / "d-1").mkdir()
+    (tmp_path / "c" / "-MERGING-d-1").mkdir()
+    (tmp_path / "c" / ".tmp.file").write_text("")
+    (tmp_path / ".hidden" / ".tmp.x").mkdir(parents=True)
+
+    removed = recover(str(tmp_path))
+    assert sorted(removed) == [str(tmp_path / "a" / ".tmp.b-2"), str(tmp_path / "c" / "-MERGING-d-1")]
+    assert sorted(os.listdir(tmp_path / "a")) == ["b-1", "b-3"]
+    assert (tmp_path / "a" / "b-3" / "SLOT").read_text() == "1\n"
+    assert sorted(os.listdir(tmp_path / "c")) == [".tmp.file", "d-1"]
+    assert os.listdir(tmp_path / "c" / "d-1") == ["SLOT"]
+    assert os.path.isdir(tmp_path / ".hidden" / ".tmp.x")
+
+    assert recover(str(tmp_path)) == []
+
+
+def test_recover_missing(tmp_path):
+    assert recover(str(tmp_path / "nonexistent")) == []